@@ -1,77 +1,299 @@
+import contextvars
+import hashlib
+import io
 import os
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, Response, abort, g, render_template, request, redirect, session, stream_with_context, url_for, jsonify
+from flask.cli import AppGroup
 from flask_sqlalchemy import SQLAlchemy
+import click
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import random
-from sqlalchemy import text
+import time
+from sqlalchemy import insert, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from werkzeug.security import check_password_hash, generate_password_hash
 import json
-import services.housing as housing_service
-import services.gemini as gemini_service
+import services.transactions as transactions
+import services.summary as summary
+import services.importer as importer
+import services.instrumentation as instrumentation
+import services.data_version as data_version
+import services.storage as storage
+import services.migrations as migrations
+import services.jobs as jobs
+import services.budgets as budgets_service
+import services.export as export
+import services.timeseries as timeseries
+import services.search as search
+import services.recurring as recurring
+from services.write_queue import WriteQueue
+from services.lazy import LazyModule
+
+# loaded on first use: they pull in requests (housing, gemini) and numpy (forecast, simulation)
+housing_service = LazyModule('services.housing', on_load=lambda module: _configure_housing(module))
+gemini_service = LazyModule('services.gemini')
+forecast = LazyModule('services.forecast')
+simulation = LazyModule('services.simulation')
 
 load_dotenv()
 
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///finance.db"
+# signs the login session cookie; without SECRET_KEY every restart logs everyone out
+app.secret_key = os.getenv("SECRET_KEY") or os.urandom(32)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL") or "sqlite:///finance.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# "production" turns on WAL, tuned pragmas and a bounded pool (see services/storage.py)
+STORAGE_PROFILE = os.getenv("STORAGE_PROFILE") or "default"
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = storage.engine_options(app.config["SQLALCHEMY_DATABASE_URI"], STORAGE_PROFILE)
 
 db = SQLAlchemy(app)
+with app.app_context():
+    storage.configure_engine(db.engine, STORAGE_PROFILE)
+
+# Opt-in request instrumentation: Server-Timing headers, /debug/metrics and slow-request profiles.
+# The metrics cover every household's traffic, so only the accounts named in METRICS_USERS
+# (comma-separated usernames) can read them.
+METRICS_USERS = frozenset(name.strip() for name in (os.getenv("METRICS_USERS") or "").split(",") if name.strip())
+if os.getenv("INSTRUMENTATION"):
+    instrumentation.init_app(
+        app,
+        slow_ms=float(os.getenv("SLOW_REQUEST_MS") or 500),
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE") or 0.1),
+        profile_dir=os.getenv("PROFILE_DIR"),
+        authorize=lambda: _can_view_metrics(),
+    )
 
 # ------------------ MODELS ------------------
 
+# Every household's rows live in the same tables, keyed by user_id. Each index leads with
+# user_id, so a household's queries are range scans over its own rows only and cost the
+# same whether the instance holds ten households or ten thousand.
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=True)  # NULL until set (migrated "default" account)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def _owner_column():
+    return db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+
+def _category_column(index=False):
+    # deleting a category removes its transactions, budget and summary rows in the database
+    return db.Column(db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), nullable=False, index=index)
+
+
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), unique=True)
+    user_id = _owner_column()
+    name = db.Column(db.String(100))
     type = db.Column(db.String(20))  # expense / income
     is_need = db.Column(db.Boolean, default=True)
-    
 
-class Expense(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'name', name='uq_category_user_name'),)
+
+
+class CategoryNameMixin:
+    # rows reference their category by id; `category` is the name, for templates and JSON
+    @property
+    def category(self):
+        return self.category_ref.name
+
+
+# A category id belongs to one household, so (category_id, date) is household-local as well;
+# it also serves the index lookups behind ON DELETE CASCADE.
+
+class Expense(CategoryNameMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(100))
+    user_id = _owner_column()
+    category_id = _category_column()
     amount = db.Column(db.Float)
     date = db.Column(db.DateTime, default=datetime.utcnow)
+    description = db.Column(db.String(200), nullable=True)  # payee / memo; full-text indexed (services/search.py)
+    category_ref = db.relationship(Category, lazy='joined')
+
+    __table_args__ = (
+        db.Index('ix_expense_category_date', 'category_id', 'date'),
+        db.Index('ix_expense_user_date_id', 'user_id', 'date', 'id'),
+        {'sqlite_autoincrement': True},  # ids are never reused: exports use them as a watermark
+    )
 
-class Income(db.Model):
+class Income(CategoryNameMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(100))
+    user_id = _owner_column()
+    category_id = _category_column()
     amount = db.Column(db.Float)
     date = db.Column(db.DateTime, default=datetime.utcnow)
+    description = db.Column(db.String(200), nullable=True)  # payee / memo; full-text indexed (services/search.py)
+    category_ref = db.relationship(Category, lazy='joined')
 
-class Budget(db.Model):
+    __table_args__ = (
+        db.Index('ix_income_category_date', 'category_id', 'date'),
+        db.Index('ix_income_user_date_id', 'user_id', 'date', 'id'),
+        {'sqlite_autoincrement': True},  # ids are never reused: exports use them as a watermark
+    )
+
+class Budget(CategoryNameMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(100), unique=True)
+    user_id = _owner_column()
+    category_id = _category_column(index=True)
+    # "" = the standing monthly budget; "YYYY-MM" overrides it for that month
+    period = db.Column(db.String(7), nullable=False, default='', server_default='')
     limit = db.Column(db.Float)
+    category_ref = db.relationship(Category, lazy='joined')
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'category_id', 'period', name='uq_budget_user_category_period'),)
 
 
 class UserDetails(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True, index=True)
     location = db.Column(db.String(200), nullable=True)
     radius = db.Column(db.Integer, nullable=True)
     insurance_type = db.Column(db.String(100), nullable=True)
     family_members = db.Column(db.Text, nullable=True)  # JSON list of {name, age, relation}
     pets = db.Column(db.Text, nullable=True)  # JSON list of {type, count, ages}
 
-# ------------------ DEFAULT CATEGORIES ------------------
 
-def insert_default_categories():
-    defaults = [
-        ("Rent", "expense", True),
-        ("Food", "expense", True),
-        ("Utilities", "expense", True),
-        ("Transport", "expense", True),
-        ("Entertainment", "expense", False),
-        ("Salary", "income", True),
-        ("Side Hustle", "income", False),
-    ]
+class CategoryMonthlyTotal(db.Model):
+    # Maintained incrementally by the write routes (see services/summary.py); rebuild with `flask summary rebuild`
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = _owner_column()
+    kind = db.Column(db.String(20), nullable=False)  # expense / income
+    category_id = _category_column(index=True)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'kind', 'category_id', 'month', name='uq_category_monthly_total'),)
+
+
+class RecurringSeries(db.Model):
+    # Expenses grouped by category and amount bucket, with the dates of their latest charges and
+    # the cadence derived from them; maintained incrementally by the write routes (see
+    # services/recurring.py), rebuild with `flask recurring rebuild`
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = _owner_column()
+    category_id = _category_column(index=True)
+    bucket = db.Column(db.Integer, nullable=False)  # round(log(amount) / log(recurring.BUCKET_RATIO))
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    dates = db.Column(db.Text, nullable=False, default='[]')  # JSON list of the latest charge dates, ascending
+    description = db.Column(db.String(200), nullable=True)  # of the latest charge
+    cadence = db.Column(db.String(20), nullable=True)  # weekly / biweekly / monthly / quarterly / yearly; None = not recurring
+    interval_days = db.Column(db.Float, nullable=True)
+    last_date = db.Column(db.Date, nullable=True)
+    next_date = db.Column(db.Date, nullable=True)
 
-    for name, type_, is_need in defaults:
-        exists = Category.query.filter_by(name=name).first()
-        if not exists:
-            db.session.add(Category(name=name, type=type_, is_need=is_need))
+    __table_args__ = (db.UniqueConstraint('user_id', 'category_id', 'bucket', name='uq_recurring_series'),)
+
+
+class DataVersion(db.Model):
+    # per-table (and per-household "<user_id>:<table>") write counter, bumped by every commit
+    # that writes the table (see services/data_version.py)
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+TRANSACTION_MODELS = {"expense": Expense, "income": Income}
+data_version.track_writes(db.session, DataVersion)
+
+# ------------------ DEFAULT CATEGORIES ------------------
+
+DEFAULT_CATEGORIES = (
+    ("Rent", "expense", True),
+    ("Food", "expense", True),
+    ("Utilities", "expense", True),
+    ("Transport", "expense", True),
+    ("Entertainment", "expense", False),
+    ("Salary", "income", True),
+    ("Side Hustle", "income", False),
+)
+
+
+def insert_default_categories(user_id=None):
+    # One INSERT ... SELECT for `user_id` (or every account) that has no categories yet, so
+    # categories a household deleted are not brought back.
+    defaults = " UNION ALL ".join("SELECT ?, ?, ?" for _ in DEFAULT_CATEGORIES)
+    params = [v for row in DEFAULT_CATEGORIES for v in row]
+    only_user = ""
+    if user_id is not None:
+        only_user = "AND u.id = ?"
+        params.append(user_id)
+    db.session.connection().exec_driver_sql(
+        f'WITH d(name, type, is_need) AS ({defaults}) '
+        f'INSERT INTO category (user_id, name, type, is_need) '
+        f'SELECT u.id, d.name, d.type, d.is_need FROM "user" u CROSS JOIN d '
+        f'WHERE NOT EXISTS (SELECT 1 FROM category c WHERE c.user_id = u.id) {only_user} '
+        f'ON CONFLICT DO NOTHING',
+        tuple(params),
+    )
+    data_version.mark(db.session, Category.__tablename__)
     db.session.commit()
 
 
+def migrate_schema():
+    # single-tenant databases: hand every existing row to a "default" account
+    user_id = migrations.add_user_scope(
+        db.session, User,
+        append_tables=[Expense.__table__, Income.__table__, Budget.__table__],
+        rebuild_tables=[Category.__table__, UserDetails.__table__],
+        derived_tables=[CategoryMonthlyTotal.__table__, RecurringSeries.__table__],
+    )
+    if user_id is not None:
+        app.logger.warning("Existing data now belongs to user 'default'; set its password with "
+                           "`flask users set-password default`.")
+    # category names -> category_id foreign keys
+    rewritten = migrations.category_names_to_ids(
+        db.session, Category.__table__,
+        {Expense.__table__: "expense", Income.__table__: "income", Budget.__table__: "expense"},
+        derived_tables=[CategoryMonthlyTotal.__table__, RecurringSeries.__table__],
+        progress=lambda table, rows: app.logger.info("category ids: %s rows rewritten (%s)", f"{rows:,}", table),
+    )
+    if rewritten:
+        app.logger.warning("Rewrote %s rows to reference categories by id.", f"{rewritten:,}")
+    # budget periods (part of the budget's unique key), transaction descriptions
+    migrations.add_columns(db.session, [Budget.__table__, Expense.__table__, Income.__table__])
+    # ids that are never handed out again (the export watermark relies on it)
+    copied = migrations.add_autoincrement(
+        db.session, [Expense.__table__, Income.__table__],
+        progress=lambda table, rows: app.logger.info("autoincrement ids: %s rows copied (%s)", f"{rows:,}", table),
+    )
+    if copied:
+        app.logger.warning("Copied %s rows into tables with AUTOINCREMENT ids.", f"{copied:,}")
+
+
+def _category_id(user_id, name):
+    return db.session.query(Category.id).filter_by(user_id=user_id, name=name).scalar()
+
+
+def ensure_indexes():
+    # create_all() only creates indexes together with new tables, so add any missing ones explicitly
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+
+def ensure_summary():
+    # seed the summary table for databases that predate it
+    if CategoryMonthlyTotal.query.first() is None and (Expense.query.first() or Income.query.first()):
+        summary.rebuild(db.session, CategoryMonthlyTotal, TRANSACTION_MODELS)
+        db.session.commit()
+
+
+def ensure_recurring():
+    # seed the recurring-series table for databases that predate it
+    if RecurringSeries.query.first() is None and Expense.query.first():
+        recurring.rebuild(db.session, RecurringSeries, Expense)
+        db.session.commit()
+
+
 def random_color():
     # return a random HEX color that's not too light
     while True:
@@ -86,177 +308,341 @@ def random_color():
             return c
     
 
+# ------------------ TRANSACTION WRITES ------------------
+
+@storage.immediate()
+def _write_transactions(items):
+    # items: (user_id, kind, category_id, amount, date, description); per household one insert
+    # per table plus one summary upsert and one recurring-series upsert, all in one commit
+    households = {}
+    for user_id, kind, category_id, amount, date, description in items:
+        rows, deltas, changes = households.setdefault(user_id, ({kind: [] for kind in TRANSACTION_MODELS}, {}, {}))
+        rows[kind].append({"user_id": user_id, "category_id": category_id, "amount": amount, "date": date,
+                           "description": description})
+        summary.add_delta(deltas, user_id, kind, category_id, date, amount)
+        if kind == "expense":
+            recurring.add_change(changes, user_id, category_id, date, amount, description)
+    for user_id, (rows, deltas, changes) in households.items():
+        # bump this household's fragment versions, not everyone's
+        db.session.info[data_version.SCOPE] = user_id
+        for kind, batch in rows.items():
+            if batch:
+                db.session.execute(insert(TRANSACTION_MODELS[kind].__table__), batch)
+        summary.apply_deltas(db.session, CategoryMonthlyTotal, deltas)
+        recurring.apply_changes(db.session, RecurringSeries, Expense, changes)
+    db.session.commit()
+
+
+def _flush_transaction_batch(items):
+    with app.app_context():
+        _write_transactions(items)
+
+
+# Group commit for single-transaction inserts; on by default in the production profile
+_transaction_writes = None
+if (os.getenv("WRITE_QUEUE") or ("1" if STORAGE_PROFILE == "production" else "0")) == "1":
+    _transaction_writes = WriteQueue(
+        _flush_transaction_batch,
+        max_batch=int(os.getenv("WRITE_QUEUE_BATCH") or 200),
+        max_delay=float(os.getenv("WRITE_QUEUE_DELAY_MS") or 5) / 1000.0,
+        name="transaction-writes",
+    )
+
+
+def add_transaction(user_id, kind, category_id, amount, date=None, description=None):
+    """Insert one expense/income row (and its summary delta); returns once it is committed.
+
+    Commits the caller's session first, so call it after any other changes of the request."""
+    item = (user_id, kind, category_id, amount, date or datetime.utcnow(), (description or "").strip()[:200] or None)
+    # end the caller's transaction (e.g. the category lookup) first: the writer needs the write
+    # lock, and must not wait on one this request still holds
+    db.session.commit()
+    if _transaction_writes is not None:
+        _transaction_writes.submit(item)
+    else:
+        _write_transactions([item])
+
+
+# ------------------ ACCOUNTS ------------------
+
+# endpoints reachable without logging in; everything else is scoped to session["user_id"]
+PUBLIC_ENDPOINTS = {"login", "register", "static"}
+
+
+def _can_view_metrics():
+    if g.get("user_id") is None or not METRICS_USERS:
+        return False
+    user = db.session.get(User, g.user_id)
+    return user is not None and user.username in METRICS_USERS
+
+
+@app.before_request
+def load_user():
+    g.user_id = session.get("user_id")
+    if g.user_id is not None:
+        db.session.info[data_version.SCOPE] = g.user_id
+        return None
+    if request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    if request.path.startswith(("/api/", "/fragments/")):
+        return jsonify({'error': 'Login required.'}), 401
+    return redirect(url_for("login", next=request.full_path if request.method == "GET" else None))
+
+
+def _safe_next(target):
+    # only follow local redirects after login. Browsers treat "\" like "/" (so "/\evil.example"
+    # is another host) and skip tabs/newlines, which urlsplit() drops as well before parsing
+    if not target or not target.startswith("/") or "\\" in target:
+        return url_for("index")
+    parts = urlsplit(target)
+    return url_for("index") if parts.scheme or parts.netloc else target
+
+
+def _log_in(user):
+    session.clear()
+    session["user_id"] = user.id
+    session["username"] = user.username
+
+
+def create_user(username, password):
+    user = User(username=username, password_hash=generate_password_hash(password) if password else None)
+    db.session.add(user)
+    db.session.flush()
+    db.session.info[data_version.SCOPE] = user.id
+    insert_default_categories(user.id)
+    return user
+
+
+@app.route("/login", methods=["GET", "POST"])
+def login():
+    error = None
+    if request.method == "POST":
+        username = (request.form.get("username") or "").strip()
+        user = User.query.filter_by(username=username).first()
+        if user and user.password_hash and check_password_hash(user.password_hash, request.form.get("password") or ""):
+            _log_in(user)
+            return redirect(_safe_next(request.args.get("next")))
+        error = "Invalid username or password."
+    return render_template("login.html", error=error, mode="login"), 401 if error else 200
+
+
+@app.route("/register", methods=["GET", "POST"])
+@storage.immediate()
+def register():
+    error = None
+    if request.method == "POST":
+        username = (request.form.get("username") or "").strip()
+        password = request.form.get("password") or ""
+        if not username or len(password) < 8:
+            error = "Choose a username and a password of at least 8 characters."
+        elif User.query.filter_by(username=username).first():
+            error = "That username is taken."
+        else:
+            user = create_user(username, password)
+            _log_in(user)
+            return redirect(url_for("index"))
+    return render_template("login.html", error=error, mode="register"), 400 if error else 200
+
+
+@app.route("/logout", methods=["POST", "GET"])
+def logout():
+    session.clear()
+    return redirect(url_for("login"))
+
+
 # ------------------ DASHBOARD ------------------
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-        if "expense_amount" in request.form:
-            db.session.add(
-                Expense(
-                    category=request.form["expense_category"],
-                    amount=float(request.form["expense_amount"]),
-                )
-            )
-            db.session.commit()
-            return redirect(url_for("index", tab="transactions"))
-        elif "income_amount" in request.form:
-            db.session.add(
-                Income(
-                    category=request.form["income_category"],
-                    amount=float(request.form["income_amount"]),
-                )
-            )
-            db.session.commit()
-            return redirect(url_for("index", tab="transactions"))
-
-    expenses = Expense.query.order_by(Expense.date.desc()).all()
-    income = Income.query.order_by(Income.date.desc()).all()
-
-    expense_categories = Category.query.filter_by(type="expense").all()
-    income_categories = Category.query.filter_by(type="income").all()
-
-    # Totals for charts
-    expense_totals = {}
-    for e in expenses:
-        expense_totals[e.category] = expense_totals.get(e.category, 0) + e.amount
-
-    income_totals = {}
-    for i in income:
-        income_totals[i.category] = income_totals.get(i.category, 0) + i.amount
-
-    budgets = {b.category: b.limit for b in Budget.query.all()}
-
-    # Build color arrays for charts based on Category.color
-    def colors_for_labels(labels):
-        # generate a color per label (deterministic from name for stability)
-        cols = []
-        for lbl in labels:
-            # deterministic pseudo-random color based on name hash
-            h = abs(hash(lbl))
-            r = (h & 0xFF0000) >> 16
-            g = (h & 0x00FF00) >> 8
-            b = (h & 0x0000FF)
-            # make sure not too light
-            avg = (r + g + b) / 3
-            if avg > 220:
-                r = r // 2; g = g // 2; b = b // 2
-            cols.append('#%02x%02x%02x' % (r, g, b))
-        return cols
-
-    expense_labels = list(expense_totals.keys())
-    income_labels = list(income_totals.keys())
-    expense_colors = colors_for_labels(expense_labels) if expense_labels else []
-    income_colors = colors_for_labels(income_labels) if income_labels else []
-    budget_labels = list(budgets.keys())
-    budget_colors = colors_for_labels(budget_labels) if budget_labels else []
-
-    # determine which tab should be active on render
+        for kind in TRANSACTION_MODELS:
+            if f"{kind}_amount" in request.form:
+                cid = _category_id(g.user_id, request.form.get(f"{kind}_category"))
+                if cid is not None:
+                    add_transaction(g.user_id, kind, cid, float(request.form[f"{kind}_amount"]),
+                                    description=request.form.get(f"{kind}_description"))
+                return redirect(url_for("index", tab="transactions"))
+
+    # only the active tab is rendered here; main.js fetches the others from /fragments/<tab> on demand
     active_tab = request.args.get("tab", "dashboard")
+    context = {}
+    fragment_etag = None
+    if active_tab in TAB_FRAGMENTS:
+        _, build, tables = TAB_FRAGMENTS[active_tab]
+        fragment_etag = _fragment_etag(active_tab, tables)
+        context = build(g.user_id)
 
-    # build details object from UserDetails table so the full index page can render the tab
-    ud = UserDetails.query.first()
+    return render_template(
+        "index.html",
+        active_tab=active_tab,
+        fragment_etag=fragment_etag,
+        **context
+    )
+
+
+# ------------------ TAB FRAGMENTS ------------------
+
+def colors_for_labels(labels):
+    # generate a color per label (deterministic from name for stability)
+    cols = []
+    for lbl in labels:
+        # deterministic pseudo-random color based on name hash
+        h = abs(hash(lbl))
+        r = (h & 0xFF0000) >> 16
+        g = (h & 0x00FF00) >> 8
+        b = (h & 0x0000FF)
+        # make sure not too light
+        avg = (r + g + b) / 3
+        if avg > 220:
+            r = r // 2; g = g // 2; b = b // 2
+        cols.append('#%02x%02x%02x' % (r, g, b))
+    return cols
+
+
+def _categories_context(user_id):
+    return {
+        "expense_categories": Category.query.filter_by(user_id=user_id, type="expense").all(),
+        "income_categories": Category.query.filter_by(user_id=user_id, type="income").all(),
+    }
+
+
+def _dashboard_context(user_id):
+    # Totals for charts, read from the per-category/per-month summary table
+    expense_totals = summary.category_totals(db.session, CategoryMonthlyTotal, user_id, "expense")
+    income_totals = summary.category_totals(db.session, CategoryMonthlyTotal, user_id, "income")
+    return dict(
+        _categories_context(user_id),
+        expense_totals=expense_totals,
+        income_totals=income_totals,
+        chartExpenseColors=colors_for_labels(list(expense_totals.keys())),
+        chartIncomeColors=colors_for_labels(list(income_totals.keys())),
+    )
+
+
+def _transactions_context(user_id):
+    # only the first page of each list is rendered; main.js fetches the rest from /api/transactions
+    expense_page = transactions.page_transactions(db.session, Expense, user_id=user_id)
+    income_page = transactions.page_transactions(db.session, Income, user_id=user_id)
+    return dict(
+        _categories_context(user_id),
+        expenses=expense_page.items,
+        income=income_page.items,
+        incomes=income_page.items,
+        expenses_cursor=expense_page.next_cursor,
+        income_cursor=income_page.next_cursor,
+    )
+
+
+def _budget_context(user_id):
+    budgets_list = Budget.query.filter_by(user_id=user_id).order_by(Budget.period, Budget.id).all()
+    budgets = _current_budgets(user_id)
+    return {
+        "expense_categories": Category.query.filter_by(user_id=user_id, type="expense").all(),
+        "expense_totals": summary.category_totals(db.session, CategoryMonthlyTotal, user_id, "expense"),
+        "month_expense_totals": summary.category_totals(db.session, CategoryMonthlyTotal, user_id, "expense", month=summary.month_key(None)),
+        "month_forecast": _budget_forecast(user_id, budgets),
+        "recurring": recurring.detected(db.session, RecurringSeries, user_id),
+        "budgets": budgets,
+        "budgets_list": budgets_list,
+        "budget_colors": colors_for_labels(list(budgets.keys())),
+    }
+
+
+def _user_details_context(user_id):
+    # build details object from UserDetails table so the tab can render it
+    ud, fm, pets = _load_household(user_id)
     details = None
     if ud:
-        try:
-            fm = json.loads(ud.family_members) if ud.family_members else []
-        except Exception:
-            fm = []
-        try:
-            pets = json.loads(ud.pets) if ud.pets else []
-        except Exception:
-            pets = []
         details = type('X', (), {})()
         details.location = ud.location
         details.radius = ud.radius
         details.insurance_type = ud.insurance_type
         details.family_members = fm
         details.pets = pets
+    return {"details": details}
 
-    return render_template(
-        "index.html",
-        expenses=expenses,
-        income=income,
-        incomes=income,
-        expense_categories=expense_categories,
-        income_categories=income_categories,
-        expense_totals=expense_totals,
-        income_totals=income_totals,
-        budgets=budgets,
-        budgets_list=Budget.query.all(),
-        chartExpenseColors=expense_colors,
-        chartIncomeColors=income_colors,
-        budget_colors=budget_colors,
-        active_tab=active_tab,
-        details=details
-    )
+
+# tab -> (template, context builder, tables it reads); the tables' write counters make up the ETag
+TAB_FRAGMENTS = {
+    "dashboard": ("tabs/dashboard.html", _dashboard_context, ("category", "category_monthly_total")),
+    "transactions": ("tabs/transactions.html", _transactions_context, ("category", "expense", "income")),
+    "budget": ("tabs/budget.html", _budget_context, ("category", "budget", "category_monthly_total", "recurring_series")),
+    "user-details": ("tabs/user_details.html", _user_details_context, ("user_details",)),
+}
+
+
+def _fragment_etag(tab, tables):
+    # the budget forecast also depends on how far into the month we are
+    extra = (datetime.utcnow().strftime("%Y-%m-%d"),) if tab == "budget" else ()
+    return data_version.etag(db.session, DataVersion, tab, tables, *extra, scope=g.user_id)
+
+
+@app.route("/fragments/<tab>", methods=["GET"])
+def tab_fragment(tab):
+    if tab not in TAB_FRAGMENTS:
+        abort(404)
+    template, build, tables = TAB_FRAGMENTS[tab]
+    etag = _fragment_etag(tab, tables)
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(render_template(template, **build(g.user_id)), mimetype="text/html")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 
 # ------------------ BUDGET CRUD ------------------
 
 
 @app.route("/add-budget", methods=["POST"])
+@storage.immediate()
 def add_budget():
-    category = request.form.get("budget_category")
-    limit = request.form.get("budget_limit")
-    if not category or not limit:
-        return redirect(url_for("index"))
-
-    try:
-        limit_val = float(limit)
-    except ValueError:
-        return redirect(url_for("index"))
-
-    b = Budget.query.filter_by(category=category).first()
-    if b:
-        b.limit = limit_val
-    else:
-        db.session.add(Budget(category=category, limit=limit_val))
+    # budget_period (YYYY-MM) is optional; without it the budget applies to every month
+    items, errors = budgets_service.parse_updates({"items": [{
+        "category": request.form.get("budget_category"),
+        "limit": request.form.get("budget_limit"),
+        "period": request.form.get("budget_period"),
+    }]})
+    if errors:
+        return redirect(url_for("index", tab="budget"))
+    budgets_service.upsert(db.session, Budget, Category, g.user_id, items, create_missing=False)
     db.session.commit()
     return redirect(url_for("index", tab="budget"))
 
 
 @app.route('/add-category', methods=['POST'])
+@storage.immediate()
 def add_category():
     name = request.form.get('category_name')
     type_ = request.form.get('category_type')
     is_need = True if request.form.get('is_need') == 'on' else False
     if not name or not type_:
         return redirect(url_for('index', tab='dashboard'))
-    if Category.query.filter_by(name=name).first():
+    if Category.query.filter_by(user_id=g.user_id, name=name).first():
         return redirect(url_for('index', tab='dashboard'))
-    c = Category(name=name, type=type_, is_need=is_need)
+    c = Category(user_id=g.user_id, name=name, type=type_, is_need=is_need)
     db.session.add(c)
     db.session.commit()
     return redirect(url_for('index', tab='dashboard'))
 
 
 @app.route('/delete-category/<int:id>', methods=['POST'])
+@storage.immediate()
 def delete_category(id):
-    c = Category.query.get_or_404(id)
-    name = c.name
-    # delete any dependent rows that reference this category name
-    try:
-        Expense.query.filter_by(category=name).delete()
-        Income.query.filter_by(category=name).delete()
-        Budget.query.filter_by(category=name).delete()
-    except Exception:
-        # fallback: remove via session for safety
-        for e in Expense.query.filter_by(category=name).all():
-            db.session.delete(e)
-        for i in Income.query.filter_by(category=name).all():
-            db.session.delete(i)
-        for b in Budget.query.filter_by(category=name).all():
-            db.session.delete(b)
-    # finally remove the category itself
+    c = Category.query.filter_by(id=id, user_id=g.user_id).first_or_404()
+    # expenses, incomes, budgets and summary rows go with it (ON DELETE CASCADE on category_id)
     db.session.delete(c)
+    data_version.mark(db.session, Expense.__tablename__, Income.__tablename__, Budget.__tablename__,
+                      CategoryMonthlyTotal.__tablename__, RecurringSeries.__tablename__)
     db.session.commit()
     return redirect(url_for('index', tab='dashboard'))
 
 
 @app.route("/delete-budget/<int:id>", methods=["POST", "GET"])
+@storage.immediate()
 def delete_budget(id):
-    b = Budget.query.get_or_404(id)
+    b = Budget.query.filter_by(id=id, user_id=g.user_id).first_or_404()
     db.session.delete(b)
     db.session.commit()
     return redirect(url_for("index", tab="budget"))
@@ -264,45 +650,324 @@ def delete_budget(id):
 # ------------------ DELETE TRANSACTION ------------------
 
 @app.route("/delete-transaction/<txn_type>/<int:id>", methods=['GET', 'POST'])
+@storage.immediate()
 def delete_transaction(txn_type, id):
-    txn = Expense.query.get_or_404(id) if txn_type == "expense" else Income.query.get_or_404(id)
+    kind = "expense" if txn_type == "expense" else "income"
+    txn = TRANSACTION_MODELS[kind].query.filter_by(id=id, user_id=g.user_id).first_or_404()
+    summary.apply_delta(db.session, CategoryMonthlyTotal, g.user_id, kind, txn.category_id, txn.date, -(txn.amount or 0), count=-1)
     db.session.delete(txn)
+    if kind == "expense":
+        # after the row is gone, so a window refill does not find it again
+        db.session.flush()
+        recurring.apply_change(db.session, RecurringSeries, Expense, g.user_id, txn.category_id, txn.date,
+                               txn.amount, count=-1)
     db.session.commit()
     return redirect(url_for("index", tab="transactions"))
 
+# ------------------ TRANSACTIONS API ------------------
+
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+@app.route('/api/transactions', methods=['GET'])
+def api_transactions():
+    # Query params: type (expense|income), category, start, end (ISO dates, end exclusive), limit, cursor
+    txn_type = request.args.get('type', 'expense')
+    model = TRANSACTION_MODELS.get(txn_type)
+    if model is None:
+        return jsonify({'error': 'type must be "expense" or "income"'}), 400
+    category = request.args.get('category') or None
+    cid = _category_id(g.user_id, category) if category else None
+    if category and cid is None:
+        return jsonify({'items': [], 'next_cursor': None})
+    try:
+        page = transactions.page_transactions(
+            db.session,
+            model,
+            limit=request.args.get('limit', transactions.DEFAULT_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor') or None,
+            category_id=cid,
+            start=_parse_date_arg('start'),
+            end=_parse_date_arg('end'),
+            user_id=g.user_id,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    items = [
+        {
+            'id': t.id,
+            'type': txn_type,
+            'category': t.category,
+            'amount': t.amount,
+            'date': t.date.strftime("%Y-%m-%d") if t.date else None,
+            'description': t.description,
+            'delete_url': url_for('delete_transaction', txn_type=txn_type, id=t.id),
+        }
+        for t in page.items
+    ]
+    return jsonify({'items': items, 'next_cursor': page.next_cursor})
+
+
+# ------------------ SEARCH ------------------
+
+def _parse_amount_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return float(value)
+
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    # Query params: q (words, matched as prefixes), type (expense|income|all), category, min_amount,
+    # max_amount, start, end (ISO dates, end exclusive), sort (rank|date), limit
+    txn_type = request.args.get('type', 'all')
+    if txn_type == 'all':
+        tables = {kind: model.__table__ for kind, model in TRANSACTION_MODELS.items()}
+    elif txn_type in TRANSACTION_MODELS:
+        tables = {txn_type: TRANSACTION_MODELS[txn_type].__table__}
+    else:
+        return jsonify({'error': 'type must be "expense", "income" or "all"'}), 400
+    category = request.args.get('category') or None
+    cid = _category_id(g.user_id, category) if category else None
+    if category and cid is None:
+        return jsonify({'items': []})
+    try:
+        hits = search.search(
+            db.session,
+            tables,
+            Category.__table__,
+            g.user_id,
+            request.args.get('q', ''),
+            category_id=cid,
+            min_amount=_parse_amount_arg('min_amount'),
+            max_amount=_parse_amount_arg('max_amount'),
+            start=_parse_date_arg('start'),
+            end=_parse_date_arg('end'),
+            sort=request.args.get('sort', 'rank'),
+            limit=request.args.get('limit', search.DEFAULT_LIMIT, type=int),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    for hit in hits:
+        hit['date'] = hit['date'].strftime("%Y-%m-%d") if hit['date'] else None
+        hit['delete_url'] = url_for('delete_transaction', txn_type=hit['type'], id=hit['id'])
+    return jsonify({'items': hits})
+
+
+# ------------------ TIME SERIES ------------------
+
+@app.route('/api/timeseries', methods=['GET'])
+def api_timeseries():
+    # Query params: type (expense|income), bucket (auto|day|week|month), start, end (ISO dates, end
+    # exclusive), points (max points per series), categories (series before "Other"), category (repeatable)
+    txn_type = request.args.get('type', 'expense')
+    model = TRANSACTION_MODELS.get(txn_type)
+    if model is None:
+        return jsonify({'error': 'type must be "expense" or "income"'}), 400
+    tables = ("category", model.__tablename__)
+    etag = data_version.etag(db.session, DataVersion, "timeseries", tables, request.query_string.decode(), scope=g.user_id)
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        try:
+            start, end = _parse_date_arg('start'), _parse_date_arg('end')
+            payload = timeseries.series(
+                db.session,
+                model,
+                Category,
+                g.user_id,
+                start=start.date() if start else None,
+                end=end.date() if end else None,
+                bucket=request.args.get('bucket', timeseries.AUTO),
+                points=request.args.get('points', timeseries.DEFAULT_POINTS, type=int),
+                categories=request.args.get('categories', timeseries.DEFAULT_CATEGORIES, type=int),
+                names=request.args.getlist('category') or None,
+                summary_model=CategoryMonthlyTotal,
+                kind=txn_type,
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        payload['type'] = txn_type
+        # compact separators: the arrays are most of the payload
+        resp = Response(json.dumps(payload, separators=(",", ":")), mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+# ------------------ RECURRING ------------------
+
+@app.route('/api/recurring', methods=['GET'])
+def api_recurring():
+    # Query params: days (only series whose next charge is due within that many days),
+    # include_lapsed (1 to include series whose charges stopped)
+    days = request.args.get('days', type=int)
+    include_lapsed = request.args.get('include_lapsed') == '1'
+    tables = ("category", RecurringSeries.__tablename__)
+    today = datetime.utcnow().date()
+    etag = data_version.etag(db.session, DataVersion, "recurring", tables, today.isoformat(),
+                             request.query_string.decode(), scope=g.user_id)
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        series = recurring.detected(db.session, RecurringSeries, g.user_id, today=today, include_lapsed=include_lapsed)
+        if days is not None:
+            horizon = (today + timedelta(days=days)).isoformat()
+            series = [s for s in series if s['next_date'] <= horizon]
+        resp = jsonify({'series': series, 'monthly_cost': recurring.monthly_cost(series)})
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+# ------------------ IMPORT ------------------
+
+@storage.immediate()
+def run_import(user_id, stream, fmt, rules=None, date_format=None, batch_size=importer.DEFAULT_BATCH_SIZE, progress=None):
+    return importer.import_stream(
+        db.session, stream, fmt, TRANSACTION_MODELS, CategoryMonthlyTotal, Category, user_id,
+        rules=rules, date_format=date_format, batch_size=batch_size, progress=progress, series_model=RecurringSeries,
+    )
+
+
+def _import_summary(result):
+    return {
+        'imported': result.rows,
+        'expenses': result.expenses,
+        'incomes': result.incomes,
+        'skipped': result.skipped,
+        'errors': list(result.errors),
+        'seconds': round(result.seconds, 3),
+        'rows_per_sec': round(result.rows_per_sec, 1),
+    }
+
+
+def _import_job(params, user_id):
+    try:
+        with open(params['path'], encoding='utf-8-sig', errors='replace', newline='') as stream:
+            result = run_import(user_id, stream, params['format'], rules=params.get('rules'),
+                                date_format=params.get('date_format'))
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        try:
+            os.remove(params['path'])
+        except OSError:
+            pass
+    return _import_summary(result)
+
+
+@app.route('/api/import', methods=['POST'])
+def api_import():
+    # Multipart upload: file (CSV/OFX), optional format, date_format and category_map (JSON {keyword: category}).
+    # async=1 saves the upload and imports it as a background job (202 with the job id).
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'error': 'No file uploaded.'}), 400
+    fmt = request.form.get('format') or importer.detect_format(upload.filename)
+    try:
+        rules = json.loads(request.form['category_map']) if request.form.get('category_map') else None
+    except ValueError:
+        return jsonify({'error': 'category_map must be a JSON object.'}), 400
+
+    if request.form.get('async'):
+        if fmt not in ('csv', 'ofx'):
+            return jsonify({'error': f"unsupported import format {fmt!r}"}), 400
+        spool = os.path.join(app.instance_path, 'uploads')
+        os.makedirs(spool, exist_ok=True)
+        path = os.path.join(spool, f"{uuid.uuid4().hex}.{fmt}")
+        upload.save(path)
+        return _queue_job('import', {'path': path, 'format': fmt, 'rules': rules,
+                                     'date_format': request.form.get('date_format') or None})
+
+    # werkzeug spools large uploads to disk; wrap the raw stream so it is decoded as it is read
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        result = run_import(g.user_id, stream, fmt, rules=rules, date_format=request.form.get('date_format') or None)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(_import_summary(result))
+
+# ------------------ EXPORT ------------------
+
+@app.route('/api/export/<kind>.csv', methods=['GET'])
+def api_export_csv(kind):
+    # the household's expenses, income or budgets as CSV, streamed in id-ordered chunks
+    if kind in TRANSACTION_MODELS:
+        table, columns = TRANSACTION_MODELS[kind].__table__, export.TRANSACTION_COLUMNS
+    elif kind == 'budget':
+        table, columns = Budget.__table__, export.BUDGET_COLUMNS
+    else:
+        abort(404)
+    body = export.iter_csv(db.session, table, columns, user_id=g.user_id)
+    headers = {'Content-Disposition': f'attachment; filename="{kind}.csv"'}
+    return Response(stream_with_context(body), mimetype='text/csv', headers=headers)
+
 # ------------------ AI ADVISOR ------------------
 
-@app.route("/ai-advisor", methods=["POST"])
-def ai_advisor():
-    expenses = Expense.query.all()
-    totals = {}
+def _budget_forecast(user_id, budgets):
+    # month-end projection per category, budgeted categories first
+    history = forecast.load_history(db.session, CategoryMonthlyTotal, user_id, "expense")
+    rows = forecast.forecast(history, budgets)
+    rows.sort(key=lambda f: (f.budget is None, -f.overspend, -f.projected))
+    return rows
 
-    for e in expenses:
-        totals[e.category] = totals.get(e.category, 0) + e.amount
 
-    advice = [
-        f"Reduce {cat} by 10% → save ${total * 0.1:.2f}/month"
-        for cat, total in totals.items()
-        if total > 500
-    ]
+RECURRING_NOTICE_DAYS = 7  # the advisor lists recurring charges due this soon
 
+
+def _recurring_advice(user_id):
+    series = recurring.detected(db.session, RecurringSeries, user_id)
+    if not series:
+        return []
+    total = sum(recurring.monthly_cost(series).values())
+    advice = [f"Recurring bills and subscriptions: about ${total:.2f}/month ({len(series)} detected)"]
+    soon = (datetime.utcnow().date() + timedelta(days=RECURRING_NOTICE_DAYS)).isoformat()
+    for s in series:
+        if s['next_date'] <= soon:
+            advice.append(f"{s['description'] or s['category']}: ${s['amount']:.2f} {s['cadence']} charge "
+                          f"expected on {s['next_date']}")
+    return advice
+
+
+@app.route("/ai-advisor", methods=["POST"])
+def ai_advisor():
+    budgets = _current_budgets(g.user_id)
+    advice = []
+    for f in _budget_forecast(g.user_id, budgets):
+        if f.overspend > 0:
+            advice.append(
+                f"{f.category}: on track to spend ${f.projected:.2f} this month, "
+                f"${f.overspend:.2f} over the ${f.budget:.2f} budget"
+            )
+        elif f.budget is None and f.expected > 500:
+            advice.append(f"Reduce {f.category} by 10% → save ${f.expected * 0.1:.2f}/month")
+        elif f.trend > 0 and f.rolling_avg > 0 and f.trend / f.rolling_avg >= 0.1:
+            advice.append(f"{f.category} is trending up by about ${f.trend:.2f}/month")
+
+    advice += _recurring_advice(g.user_id)
     if not advice:
         advice = ["Your spending looks healthy 👍"]
 
     return render_template("tabs/ai_advisor.html", advice=advice)
 
 
-@app.route('/api/housing-search', methods=['POST'])
-def housing_search_api():
-    # Expects JSON POST with: location, radius, min_beds, min_baths, min_sqft
-    data = request.get_json() or {}
-    location = data.get('location')
-    radius = data.get('radius')
-    min_beds = int(data.get('min_beds', 1) or 1)
-    min_baths = int(data.get('min_baths', 1) or 1)
-    min_sqft = int(data.get('min_sqft', 300) or 300)
-
-    try:
+def _housing_search(params, user_id=None):
+    location = params.get('location')
+    radius = params.get('radius')
+    min_beds = int(params.get('min_beds', 1) or 1)
+    min_baths = int(params.get('min_baths', 1) or 1)
+    min_sqft = int(params.get('min_sqft', 300) or 300)
+    # local listing store first; live upstream search only for markets not ingested yet
+    results = housing_service.local_search(location, radius, min_beds, min_baths, min_sqft)
+    if results is None:
         results = housing_service.search_housing(
             location=location,
             radius=radius,
@@ -310,25 +975,126 @@ def housing_search_api():
             min_baths=min_baths,
             min_sqft=min_sqft,
         )
+    return {'results': results}
+
+
+@app.route('/api/housing-search', methods=['POST'])
+def housing_search_api():
+    # Expects JSON POST with: location, radius, min_beds, min_baths, min_sqft (and optionally async)
+    data = request.get_json() or {}
+    params = {k: data.get(k) for k in ('location', 'radius', 'min_beds', 'min_baths', 'min_sqft')}
+    if data.get('async'):
+        key = f"housing-search:{g.user_id}:" + json.dumps(params, sort_keys=True)
+        return _queue_job('housing-search', params, cache_key=key)
+
+    try:
+        return jsonify(_housing_search(params))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-    return jsonify({'results': results})
 
+@app.route('/api/housing-cache-stats', methods=['GET'])
+def housing_cache_stats_api():
+    return jsonify(housing_service.cache_stats())
+
+
+# The recommendation fans out over a small thread pool: the budget read runs alongside the
+# user-details read, the housing search runs in the background, and the Gemini explanation is
+# a separate step bounded by what is left of ADVISOR_DEADLINE.
+ADVISOR_DEADLINE = float(os.getenv('ADVISOR_DEADLINE') or 15)
+# tables the recommendation reads; their write counters key the cached async results
+ADVISOR_TABLES = ("budget", "category", "category_monthly_total", "recurring_series", "user_details")
+_advisor_pool = ThreadPoolExecutor(max_workers=int(os.getenv('ADVISOR_WORKERS') or 8), thread_name_prefix='advisor')
+
+
+def _in_app_context(fn, *args, **kwargs):
+    with app.app_context():
+        return fn(*args, **kwargs)
+
+
+def _submit(fn, *args, **kwargs):
+    # run in a copy of the caller's context so instrumentation attributes the work to this request
+    return _advisor_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
 
-@app.route('/api/ai-recommend', methods=['POST'])
-def api_ai_recommend():
-    # Build user details, budgets, and expenses
-    ud = UserDetails.query.first()
-    if not ud:
-        return jsonify({'error': 'No user details found. Please fill User Details tab.'}), 400
 
+def _household_markets():
+    # every location a household has saved; the listing refresher keeps these ingested
+    rows = db.session.query(UserDetails.location).filter(UserDetails.location.isnot(None)).distinct()
+    return [(housing_service.normalize_location(location), None) for (location,) in rows]
+
+
+def _configure_housing(module):
+    module.listing_refresher().markets = lambda: _in_app_context(_household_markets)
+
+
+def _current_budgets(user_id):
+    return budgets_service.for_month(db.session, Budget, Category, user_id, summary.month_key(None))
+
+
+def _load_household(user_id):
+    ud = UserDetails.query.filter_by(user_id=user_id).first()
+    if not ud:
+        return None, [], []
     try:
         family = json.loads(ud.family_members) if ud.family_members else []
         pets = json.loads(ud.pets) if ud.pets else []
     except Exception:
         family = []
         pets = []
+    return ud, family, pets
+
+
+def _remaining(deadline):
+    return max(0.0, deadline - time.monotonic())
+
+
+def _await_explanation(future, deadline, needs, best, suggested):
+    try:
+        return future.result(timeout=_remaining(deadline))
+    except FuturesTimeout:
+        # only stops a call that has not started; one under way gives up at the same
+        # deadline, since its retries share the timeout it was given
+        future.cancel()
+        return gemini_service.fallback_explanation(needs, best, suggested)
+
+
+NO_DETAILS = 'No user details found. Please fill User Details tab.'
+
+# paths in the recommendation's savings outlook (0 leaves it out); a fixed seed keeps the
+# outlook the same until the history changes, so cached async results stay consistent
+ADVISOR_SIMULATION_PATHS = int(os.getenv('ADVISOR_SIMULATION_PATHS') or 5000)
+
+
+def _outlook(history, income, suggested):
+    # twelve-month balance bands with current spending versus the suggested budgets
+    try:
+        model = simulation.build_model(history, income, suggested)
+    except ValueError:
+        return None
+    result = simulation.simulate(model, months=12, paths=ADVISOR_SIMULATION_PATHS, seed=0)
+    return {
+        'months': result['months'],
+        'scenarios': {name: {'monthly_net_p50': s['monthly_net']['p50'], 'final': s['final'], 'shortfall': s['shortfall']}
+                      for name, s in result['scenarios'].items()},
+        'budgets': simulation.budget_bands(model, suggested),
+    }
+
+
+def _recommendation(user_id, deadline):
+    """The household's recommendation (needs, best listing, suggested budgets) and the details
+    the explanation is written for, or (None, None) if the household has no user details."""
+    budgets_future = _submit(_in_app_context, _current_budgets, user_id)
+    now = datetime.utcnow()
+    history_future = _submit(_in_app_context, forecast.load_history, db.session, CategoryMonthlyTotal, user_id, "expense", now)
+    income_future = _submit(_in_app_context, forecast.load_history, db.session, CategoryMonthlyTotal, user_id, "income", now)
+
+    # Build user details, budgets, and expenses
+    ud, family, pets = _load_household(user_id)
+    if not ud:
+        budgets_future.cancel()
+        history_future.cancel()
+        income_future.cancel()
+        return None, None
 
     # Simple heuristic to compute minimum needs
     total_people = len(family) if family else 1
@@ -345,34 +1111,52 @@ def api_ai_recommend():
     # Find cheapest listing meeting criteria
     location = ud.location
     radius = ud.radius
-    listings = housing_service.search_housing(location=location, radius=radius, min_beds=min_beds, min_baths=min_baths, min_sqft=min_sqft, max_results=20)
-    # filter usable listings
-    candidates = [l for l in listings if (l.get('beds') is None or int(l.get('beds') or 0) >= min_beds) and (l.get('sqft') is None or int(l.get('sqft') or 0) >= min_sqft)]
-    # parse price safely
     def price_of(it):
         try:
             return float(it.get('price') or 0)
         except Exception:
             return 0
-    if candidates:
-        candidates.sort(key=price_of)
-        best = candidates[0]
+    # the local listing store answers with one index-backed query, already filtered and sorted by price
+    local = housing_service.local_search(location, radius, min_beds, min_baths, min_sqft, max_results=1)
+    if local is not None:
+        best = local[0] if local else None
     else:
-        best = listings[0] if listings else None
+        # market not ingested yet (a refresh is queued): ask upstream this once
+        housing_future = _submit(housing_service.search_housing, location=location, radius=radius, min_beds=min_beds, min_baths=min_baths, min_sqft=min_sqft, max_results=20)
+        try:
+            listings = housing_future.result(timeout=_remaining(deadline))
+        except FuturesTimeout:
+            listings = []
+        # filter usable listings
+        candidates = [l for l in listings if (l.get('beds') is None or int(l.get('beds') or 0) >= min_beds) and (l.get('sqft') is None or int(l.get('sqft') or 0) >= min_sqft)]
+        if candidates:
+            candidates.sort(key=price_of)
+            best = candidates[0]
+        else:
+            best = listings[0] if listings else None
 
     # Build suggested budgets: update Rent to listing price, and compute basic minima for food/utilities/transport
-    current_budgets = {b.category: b.limit for b in Budget.query.all()}
+    current_budgets = budgets_future.result()
+    # forecast full-month spend from history; the fixed minima below are the floor when there is none
+    expected = {f.category: f.expected for f in forecast.forecast(history_future.result(), {})}
     suggested = {}
     if best and price_of(best) > 0:
         suggested['Rent'] = price_of(best)
     # basic per-person food baseline
     food_per_person = 200
+    # a budget cannot go below the recurring charges already committed in that category
+    committed = recurring.monthly_cost(recurring.detected(db.session, RecurringSeries, user_id))
     if 'Food' in current_budgets:
-        suggested['Food'] = max(current_budgets.get('Food', 0) * 0.5, food_per_person * total_people)
+        suggested['Food'] = max(current_budgets.get('Food', 0) * 0.5, food_per_person * total_people, expected.get('Food', 0))
     if 'Utilities' in current_budgets:
-        suggested['Utilities'] = max(50, 0.12 * min_sqft)
+        suggested['Utilities'] = max(50, 0.12 * min_sqft, expected.get('Utilities', 0))
     if 'Transport' in current_budgets:
-        suggested['Transport'] = max(50, 50 * total_people)
+        suggested['Transport'] = max(50, 50 * total_people, expected.get('Transport', 0))
+
+    for k in list(suggested.keys()):
+        # (rent is the exception: the suggested listing replaces the current one)
+        if k in committed and k != 'Rent':
+            suggested[k] = max(suggested[k], committed[k])
 
     # Ensure numeric values
     for k in list(suggested.keys()):
@@ -381,53 +1165,180 @@ def api_ai_recommend():
         except Exception:
             suggested[k] = 0.0
 
-    # Compose explanation via Gemini when available
-    details_obj = {'location': ud.location, 'radius': ud.radius, 'family': family, 'pets': pets}
-    explanation = gemini_service.compose_explanation(needs, best, suggested, details_obj)
-
-    return jsonify({
+    recommendation = {
         'needs': needs,
         'best_listing': best,
         'suggested_budgets': suggested,
-        'explanation': explanation
-    })
+        'recurring': {'monthly_cost': committed, 'monthly_total': round(sum(committed.values()), 2)},
+    }
+    if ADVISOR_SIMULATION_PATHS:
+        recommendation['outlook'] = _outlook(history_future.result(), income_future.result(), suggested)
+
+    details_obj = {'location': ud.location, 'radius': ud.radius, 'family': family, 'pets': pets}
+    return recommendation, details_obj
+
+
+@app.route('/api/ai-recommend', methods=['POST'])
+def api_ai_recommend():
+    # Optional JSON body: {"stream": true} returns NDJSON, the recommendation line first and
+    # the explanation line once it is ready (closing the connection before the explanation has
+    # started skips it; a Gemini call already under way runs until it answers or the deadline).
+    # {"explain": false} skips the explanation; the browser streams it from /api/ai-explain/stream.
+    # {"async": true} queues the work and answers 202 with a job id to poll at /api/jobs/<id>.
+    options = request.get_json(silent=True) or {}
+    if options.get('async'):
+        explain = options.get('explain') is not False
+        key = f"ai-recommend:{g.user_id}:{int(explain)}:" + data_version.etag(
+            db.session, DataVersion, "ai-recommend", ADVISOR_TABLES, datetime.utcnow().strftime("%Y-%m-%d"), scope=g.user_id)
+        return _queue_job('ai-recommend', {'explain': explain}, cache_key=key)
+
+    deadline = time.monotonic() + ADVISOR_DEADLINE
+    stream = bool(options.get('stream'))
+    recommendation, details_obj = _recommendation(g.user_id, deadline)
+    if recommendation is None:
+        return jsonify({'error': NO_DETAILS}), 400
+
+    if options.get('explain') is False:
+        return jsonify(recommendation)
+
+    # Compose explanation via Gemini when available, within whatever is left of the deadline
+    needs, best, suggested = recommendation['needs'], recommendation['best_listing'], recommendation['suggested_budgets']
+    explain_future = _submit(gemini_service.compose_explanation, needs, best, suggested, details_obj,
+                              timeout=_remaining(deadline) or None)
+
+    if not stream:
+        explanation = _await_explanation(explain_future, deadline, needs, best, suggested)
+        return jsonify(dict(recommendation, explanation=explanation))
+
+    def generate():
+        try:
+            yield json.dumps(dict(recommendation, type='recommendation')) + '\n'
+            explanation = _await_explanation(explain_future, deadline, needs, best, suggested)
+            yield json.dumps({'type': 'explanation', 'explanation': explanation}) + '\n'
+        finally:
+            # client went away (or we are done): don't start a Gemini call nobody will read
+            explain_future.cancel()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+def _sse(data, event=None):
+    msg = f"event: {event}\n" if event else ""
+    return msg + f"data: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/ai-explain/stream', methods=['POST'])
+def api_ai_explain_stream():
+    # JSON body: the recommendation returned by /api/ai-recommend (needs, best_listing, suggested_budgets).
+    # Streams the explanation as server-sent events: {"text": chunk} per chunk, then a "done" event.
+    data = request.get_json(silent=True) or {}
+    needs = data.get('needs') or {}
+    best = data.get('best_listing')
+    try:
+        suggested = {k: float(v) for k, v in (data.get('suggested_budgets') or {}).items()}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'suggested_budgets must map categories to numbers.'}), 400
+    ud, family, pets = _load_household(g.user_id)
+    details_obj = {'location': ud.location, 'radius': ud.radius, 'family': family, 'pets': pets} if ud else {}
+
+    def generate():
+        # send something immediately so the browser sees the first byte before Gemini answers
+        yield ": stream open\n\n"
+        for chunk in gemini_service.stream_explanation(needs, best, suggested, details_obj, timeout=ADVISOR_DEADLINE):
+            yield _sse({'text': chunk})
+        yield _sse({}, event='done')
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/api/explanation-cache-stats', methods=['GET'])
+def explanation_cache_stats_api():
+    return jsonify(gemini_service.explanation_cache().stats())
+
+
+# Large simulations run on a process pool of SIMULATION_WORKERS processes (default: one per core).
+SIMULATION_WORKERS = int(os.getenv('SIMULATION_WORKERS') or os.cpu_count() or 1)
+SIMULATION_PARAMS = ('months', 'paths', 'seed', 'goals', 'starting_balance', 'suggested_budgets')
+
+
+def _simulate(params, user_id):
+    now = datetime.utcnow()
+    suggested = params.get('suggested_budgets') or {}
+    if not isinstance(suggested, dict):
+        raise ValueError('suggested_budgets must map categories to numbers.')
+    suggested = {k: float(v) for k, v in suggested.items()}
+    history = forecast.load_history(db.session, CategoryMonthlyTotal, user_id, "expense", now)
+    income = forecast.load_history(db.session, CategoryMonthlyTotal, user_id, "income", now)
+    model = simulation.build_model(history, income, suggested)
+    months, paths, seed = params.get('months'), params.get('paths'), params.get('seed')
+    result = simulation.simulate(
+        model,
+        months=simulation.DEFAULT_MONTHS if months is None else int(months),
+        paths=simulation.DEFAULT_PATHS if paths is None else int(paths),
+        seed=None if seed is None else int(seed),
+        goals=[float(goal) for goal in params.get('goals') or []],
+        starting_balance=float(params.get('starting_balance') or 0),
+        workers=SIMULATION_WORKERS,
+    )
+    result['budgets'] = simulation.budget_bands(model, suggested)
+    return result
+
+
+@app.route('/api/simulate', methods=['POST'])
+def api_simulate():
+    # JSON body, all optional: months, paths, seed (repeatable runs), goals (savings amounts),
+    # starting_balance, suggested_budgets ({category: limit}, e.g. from /api/ai-recommend).
+    # Returns goal-reach probabilities and balance bands for current spending and, with
+    # suggested_budgets, for the suggested budgets. {"async": true} queues it as a job.
+    data = request.get_json(silent=True) or {}
+    params = {k: data.get(k) for k in SIMULATION_PARAMS}
+    if data.get('async'):
+        key = None
+        if params['seed'] is not None:
+            # only a seeded run has one answer to cache
+            key = f"simulate:{g.user_id}:" + json.dumps(params, sort_keys=True) + ":" + data_version.etag(
+                db.session, DataVersion, "simulate", ("category", "category_monthly_total"),
+                datetime.utcnow().strftime("%Y-%m"), scope=g.user_id)
+        return _queue_job('simulate', params, cache_key=key)
+    try:
+        return jsonify(_simulate(params, g.user_id))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
 
 
 @app.route('/api/apply-budget-updates', methods=['POST'])
+@storage.immediate()
 def api_apply_budget_updates():
-    data = request.get_json() or {}
-    updates = data.get('updates') or {}
-    if not updates:
-        return jsonify({'success': False, 'error': 'No updates provided.'}), 400
+    # JSON body: {"items": [{"category", "limit", "period" (YYYY-MM, optional)}, ...]} or the older
+    # {"updates": {category: limit}}. The whole payload is validated first (400 with per-item
+    # errors, nothing written), then applied in one transaction; unknown categories are created.
+    items, errors = budgets_service.parse_updates(request.get_json(silent=True))
+    if errors:
+        return jsonify({'success': False, 'error': errors[0]['error'] if errors[0]['index'] is None else 'Invalid items.',
+                        'errors': errors}), 400
     try:
-        for cat, val in updates.items():
-            try:
-                valf = float(val)
-            except Exception:
-                valf = 0.0
-            b = Budget.query.filter_by(category=cat).first()
-            if b:
-                b.limit = valf
-            else:
-                db.session.add(Budget(category=cat, limit=valf))
+        results = budgets_service.upsert(db.session, Budget, Category, g.user_id, items)
         db.session.commit()
-        return jsonify({'success': True})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, 'results': results})
 
 
 @app.route('/user-details', methods=['GET', 'POST'])
+@storage.immediate()
 def user_details():
     # Save POST then redirect back to index(tab=user-details); GET redirects to index too
     if request.method == 'POST':
-        ud = UserDetails.query.first()
+        ud = UserDetails.query.filter_by(user_id=g.user_id).first()
         location = request.form.get('location')
         radius = request.form.get('radius')
         insurance_type = request.form.get('insurance_type')
         family_members = request.form.get('family_members')
         pets = request.form.get('pets')
         if not ud:
-            ud = UserDetails()
+            ud = UserDetails(user_id=g.user_id)
             db.session.add(ud)
         ud.location = location
         try:
@@ -438,14 +1349,359 @@ def user_details():
         ud.family_members = family_members if family_members else '[]'
         ud.pets = pets if pets else '[]'
         db.session.commit()
+        housing_service.prefetch_market(location)
         return redirect(url_for('index', tab='user-details'))
 
     return redirect(url_for('index', tab='user-details'))
 
+# ------------------ BACKGROUND JOBS ------------------
+
+# Slow work can run on an in-process worker pool instead of the request thread; job records
+# (status, result, error) persist in JOBS_DB_PATH and are polled at /api/jobs/<id>.
+job_queue = jobs.JobQueue(
+    os.getenv('JOBS_DB_PATH') or jobs.DEFAULT_PATH,
+    workers=int(os.getenv('JOB_WORKERS') or 4),
+    result_ttl=float(os.getenv('JOB_RESULT_TTL') or 300),
+)
+
+
+def _job_handler(fn):
+    # workers have no request: give each job an app context and the household's write scope
+    def run(params, user_id):
+        with app.app_context():
+            db.session.info[data_version.SCOPE] = user_id
+            return fn(params, user_id)
+    return run
+
+
+def _recommend_job(params, user_id):
+    recommendation, details_obj = _recommendation(user_id, time.monotonic() + ADVISOR_DEADLINE)
+    if recommendation is None:
+        raise ValueError(NO_DETAILS)
+    if params.get('explain', True):
+        recommendation['explanation'] = gemini_service.compose_explanation(
+            recommendation['needs'], recommendation['best_listing'], recommendation['suggested_budgets'], details_obj,
+            timeout=ADVISOR_DEADLINE)
+    return recommendation
+
+
+job_queue.register('ai-recommend', _job_handler(_recommend_job))
+job_queue.register('housing-search', _job_handler(_housing_search))
+job_queue.register('import', _job_handler(_import_job))
+job_queue.register('simulate', _job_handler(_simulate))
+
+
+def _job_json(job):
+    out = {k: job[k] for k in ('id', 'kind', 'status', 'created_at', 'started_at', 'finished_at')}
+    if job['status'] == jobs.DONE:
+        out['result'] = job['result']
+    elif job['status'] == jobs.FAILED:
+        out['error'] = job['error']
+    return out
+
+
+def _queue_job(kind, params, cache_key=None):
+    job_id = job_queue.submit(kind, params, user_id=g.user_id, cache_key=cache_key)
+    status_url = url_for('job_status', job_id=job_id)
+    resp = jsonify({'job_id': job_id, 'status': job_queue.get(job_id)['status'], 'status_url': status_url})
+    resp.status_code = 202
+    resp.headers['Location'] = status_url
+    return resp
+
+
+@app.route('/api/jobs', methods=['GET'])
+def jobs_list():
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    return jsonify({'jobs': [_job_json(j) for j in job_queue.recent(g.user_id, limit)]})
+
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def job_stats_api():
+    # the household's own job counts and the pool's load, nothing about other households' work
+    return jsonify(job_queue.stats(g.user_id, scoped=True))
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    # ?wait=N long-polls up to N seconds (max 30) for the job to finish
+    wait = max(0.0, min(request.args.get('wait', 0.0, type=float), 30.0))  # max() also turns NaN into 0
+    job = job_queue.get(job_id, user_id=g.user_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    if wait > 0 and job['status'] not in (jobs.DONE, jobs.FAILED):
+        job = job_queue.wait(job_id, wait)
+    return jsonify(_job_json(job))
+
+# ------------------ SUMMARY CLI ------------------
+
+summary_cli = AppGroup('summary', help='Maintain the per-category/per-month summary table.')
+
+
+@summary_cli.command('verify')
+def summary_verify_command():
+    """Report any drift between the summary table and the raw transactions."""
+    drift = summary.verify(db.session, CategoryMonthlyTotal, TRANSACTION_MODELS)
+    for line in drift:
+        click.echo(line)
+    click.echo(f"{len(drift)} drifted rows")
+    if drift:
+        raise SystemExit(1)
+
+
+@summary_cli.command('rebuild')
+def summary_rebuild_command():
+    """Recompute the summary table from the raw transactions."""
+    drift = summary.verify(db.session, CategoryMonthlyTotal, TRANSACTION_MODELS)
+    written = summary.rebuild(db.session, CategoryMonthlyTotal, TRANSACTION_MODELS)
+    db.session.commit()
+    click.echo(f"Fixed {len(drift)} drifted rows; summary now has {written} rows")
+
+
+app.cli.add_command(summary_cli)
+
+# ------------------ RECURRING CLI ------------------
+
+recurring_cli = AppGroup('recurring', help='Maintain the recurring-charge series.')
+
+
+@recurring_cli.command('verify')
+def recurring_verify_command():
+    """Report any drift between the series table and the raw expenses."""
+    drift = recurring.verify(db.session, RecurringSeries, Expense)
+    for line in drift:
+        click.echo(line)
+    click.echo(f"{len(drift)} drifted series")
+    if drift:
+        raise SystemExit(1)
+
+
+@recurring_cli.command('rebuild')
+def recurring_rebuild_command():
+    """Recompute the series table from the raw expenses."""
+    drift = recurring.verify(db.session, RecurringSeries, Expense)
+    written = recurring.rebuild(db.session, RecurringSeries, Expense)
+    db.session.commit()
+    click.echo(f"Fixed {len(drift)} drifted series; {written} series now")
+
+
+app.cli.add_command(recurring_cli)
+
+# ------------------ IMPORT CLI ------------------
+
+@app.cli.command('import-transactions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ofx']), default=None, help='Defaults to the file extension.')
+@click.option('--date-format', default=None, help='strptime format for CSV dates, e.g. %d/%m/%Y.')
+@click.option('--category-map', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='JSON file mapping description keywords to category names.')
+@click.option('--batch-size', default=importer.DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--user', 'username', required=True, help='Account the transactions belong to.')
+def import_transactions_command(path, fmt, date_format, category_map, batch_size, username):
+    """Stream a CSV/OFX bank export into the database."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.BadParameter(f"no such user {username!r}", param_hint='--user')
+    db.session.info[data_version.SCOPE] = user.id
+    rules = None
+    if category_map:
+        with open(category_map, encoding='utf-8') as f:
+            rules = json.load(f)
+
+    def progress(rows, elapsed):
+        rate = rows / elapsed if elapsed > 0 else 0
+        click.echo(f"  {rows:,} rows  {elapsed:.1f}s  {rate:,.0f} rows/s")
+
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as f:
+        result = run_import(user.id, f, fmt or importer.detect_format(path), rules=rules, date_format=date_format,
+                            batch_size=batch_size, progress=progress)
+    click.echo(
+        f"Imported {result.rows:,} rows ({result.expenses:,} expenses, {result.incomes:,} income, "
+        f"{result.skipped:,} skipped) in {result.seconds:.1f}s — {result.rows_per_sec:,.0f} rows/s"
+    )
+    for reason in result.errors:
+        click.echo(f"  skipped {reason}")
+
+# ------------------ EXPORT CLI ------------------
+
+EXPORT_DIR = os.getenv('EXPORT_DIR') or os.path.join(app.instance_path, 'exports')
+export_cli = AppGroup('export', help='Columnar snapshots of the transaction history for reporting.')
+
+
+def _export_user(username):
+    if username is None:
+        return None
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.BadParameter(f"no such user {username!r}", param_hint='--user')
+    return user.id
+
+
+@export_cli.command('snapshot')
+@click.option('--out', default=EXPORT_DIR, show_default=True, type=click.Path(file_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(sorted(export.FORMATS)), default='parquet', show_default=True)
+@click.option('--full', is_flag=True, help='Rewrite the snapshot instead of appending rows added since the last run.')
+@click.option('--user', 'username', default=None, help='Export one account only (default: every household).')
+@click.option('--chunk-size', default=export.DEFAULT_CHUNK_SIZE, show_default=True)
+def export_snapshot_command(out, fmt, full, username, chunk_size):
+    """Export expenses, income and budgets, partitioned by month."""
+    tables = {name: model.__table__ for name, model in TRANSACTION_MODELS.items()}
+    try:
+        result = export.export_snapshot(
+            db.session, out, tables, Budget.__table__, fmt=fmt, full=full, user_id=_export_user(username),
+            chunk_size=chunk_size, progress=lambda table, rows: click.echo(f"  {table}: {rows:,} rows"),
+        )
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    counts = ", ".join(f"{rows:,} {table}" for table, rows in result.rows.items())
+    click.echo(f"{'Full' if result.full else 'Incremental'} {fmt} export to {out}: {counts} "
+               f"({result.parts} files) in {result.seconds:.1f}s")
+
+
+@export_cli.command('report')
+@click.option('--snapshot', 'path', default=EXPORT_DIR, show_default=True, type=click.Path(file_okay=False))
+@click.option('--kind', type=click.Choice(sorted(TRANSACTION_MODELS)), default='expense', show_default=True)
+@click.option('--user', 'username', default=None, help='One account only.')
+@click.option('--months', default=12, show_default=True, help='Most recent months to show.')
+def export_report_command(path, kind, username, months):
+    """Monthly totals per category, computed from a snapshot instead of the live database."""
+    try:
+        snap = export.Snapshot(path)
+        totals = snap.monthly_totals(kind, user_id=_export_user(username)).to_pylist()
+    except (FileNotFoundError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    shown = sorted({row['month'] for row in totals}, reverse=True)[:months]
+    for month in shown:
+        rows = [r for r in totals if r['month'] == month]
+        click.echo(f"{month}  {sum(r['total'] for r in rows):>12,.2f}")
+        for r in rows:
+            click.echo(f"  {r['category']:<24}{r['total']:>12,.2f}{r['count']:>8,}")
+
+
+app.cli.add_command(export_cli)
+
+# ------------------ LISTINGS CLI ------------------
+
+listings_cli = AppGroup('listings', help='Maintain the local housing listing store.')
+
+
+@listings_cli.command('refresh')
+@click.option('--location', 'locations', multiple=True, help='Market to refresh; defaults to every known market.')
+def listings_refresh_command(locations):
+    """Re-fetch markets from upstream into the local store (suitable for cron)."""
+    if not housing_service.local_store_enabled():
+        raise click.ClickException("RENTCAST_API_KEY and RENTCAST_BASE_URL must be set")
+    if not locations:
+        known = {m['location'] for m in housing_service.listing_store().markets()}
+        locations = sorted(known | {loc for loc, _ in _household_markets() if loc})
+    for location in locations:
+        count = housing_service.refresh_market(location)
+        click.echo(f"{location}: {count:,} listings")
+
+
+@listings_cli.command('stats')
+def listings_stats_command():
+    """Show how many markets and listings the local store holds."""
+    click.echo(json.dumps(housing_service.listing_store().stats(), indent=2))
+
+
+app.cli.add_command(listings_cli)
+
+# ------------------ USERS CLI ------------------
+
+users_cli = AppGroup('users', help='Manage login accounts.')
+
+
+@users_cli.command('create')
+@click.argument('username')
+@click.password_option()
+def users_create_command(username, password):
+    """Create an account (with the default categories)."""
+    if User.query.filter_by(username=username).first():
+        raise click.ClickException(f"user {username!r} already exists")
+    user = create_user(username, password)
+    db.session.commit()
+    click.echo(f"Created user {username} (id {user.id})")
+
+
+@users_cli.command('set-password')
+@click.argument('username')
+@click.password_option()
+def users_set_password_command(username, password):
+    """Set or reset an account's password."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"no such user {username!r}")
+    user.password_hash = generate_password_hash(password)
+    db.session.commit()
+    click.echo(f"Password updated for {username}")
+
+
+app.cli.add_command(users_cli)
+
 # ------------------ INIT ------------------
 
-if __name__ == "__main__":
-    with app.app_context():
+def schema_revision():
+    # fingerprint of the models' DDL: any model change makes init_db() run its steps again
+    dialect = db.engine.dialect
+    ddl = []
+    for table in db.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl += [str(CreateIndex(ix).compile(dialect=dialect)) for ix in sorted(table.indexes, key=lambda ix: ix.name)]
+    for model in TRANSACTION_MODELS.values():
+        ddl += search.schema(model.__tablename__)
+    return int(hashlib.sha1("\n".join(ddl).encode("utf-8")).hexdigest()[:7], 16)
+
+
+def _stored_revision():
+    revision = db.session.execute(text("PRAGMA user_version")).scalar()
+    db.session.rollback()  # end the read so a later read sees another worker's commit
+    return revision
+
+
+def init_db():
+    """Create or upgrade the schema and seed default categories, once per schema revision.
+
+    The revision that was applied is kept in SQLite's `PRAGMA user_version`, so on an
+    initialized database this is a single read. Workers starting together serialize on
+    storage.init_lock(); the first does the work and the others find it done.
+    Returns True if anything ran.
+    """
+    revision = schema_revision()
+    if _stored_revision() == revision:
+        return False
+    with storage.init_lock(db.engine):
+        if _stored_revision() == revision:
+            return False
         db.create_all()
+        migrate_schema()
+        ensure_indexes()
+        ensure_summary()
+        ensure_recurring()
+        search.ensure_index(db.session, [model.__tablename__ for model in TRANSACTION_MODELS.values()])
         insert_default_categories()
-    app.run(debug=True)
+        db.session.execute(text(f"PRAGMA user_version = {int(revision)}"))
+        db.session.commit()
+    return True
+
+
+def create_app():
+    """Application factory: `gunicorn 'app:create_app()'`, `flask --app 'app:create_app()' run`.
+
+    Returns the app with the database initialized (see init_db()). Importing the module does
+    not touch the database, and the slow service modules are loaded on first use.
+    """
+    with app.app_context():
+        init_db()
+    return app
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create/upgrade the schema and seed default categories (no-op when up to date)."""
+    started = time.perf_counter()
+    ran = init_db()
+    click.echo(f"{'Initialized' if ran else 'Already up to date'} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    create_app().run(debug=True)
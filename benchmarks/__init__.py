@@ -0,0 +1,8 @@
+"""Benchmarks for the Flask endpoints.
+
+    python -m benchmarks.run --sizes 10000,100000,1000000 --out bench.json
+    python -m benchmarks.run --sizes 100000 --compare bench.json
+
+`datagen` builds synthetic databases, `stub_server` stands in for Rentcast and Gemini, and
+`run` drives the endpoints through `app.test_client()` and writes a JSON report.
+"""
@@ -0,0 +1,173 @@
+"""Synthetic finance.db generator.
+
+    python -m benchmarks.datagen OUT.db --transactions 1000000 --categories 40 --months 60
+    python -m benchmarks.datagen OUT.db --transactions 10000000 --users 1000
+
+Rows are spread over `months` months ending now, with a per-category base amount, a mild
+trend and a December bump so the forecast has something to find, and a merchant-style
+description for the search index. With --users, every
+household gets its own categories, budgets and details, and rows are dealt round-robin
+between households (interleaved on disk, as they would be on a shared instance). Accounts
+are named user1..userN with password BENCH_PASSWORD. The schema comes from the app's
+models, so the app module is imported with DATABASE_URL pointing at the output file.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+CHUNK = 50_000
+INCOME_SHARE = 0.1  # fraction of rows that are income
+BENCH_PASSWORD = "benchmark"
+MERCHANTS = ("Whole Foods Market", "Trader Joe's", "Starbucks", "Shell", "Chevron", "Amazon Marketplace", "Target",
+             "Costco Wholesale", "Netflix", "Spotify", "Uber Trip", "Lyft Ride", "City Utilities", "Comcast Xfinity",
+             "Home Depot", "CVS Pharmacy", "Walgreens", "Chipotle", "Delta Air Lines", "Marriott Hotels")
+CITIES = ("Austin TX", "Seattle WA", "Denver CO", "Boston MA", "Chicago IL", "Online")
+
+
+def _sqlite_url(path: str) -> str:
+    return "sqlite:///" + os.path.abspath(path)
+
+
+def _category_names(n: int):
+    base = ["Rent", "Food", "Utilities", "Transport", "Entertainment"]
+    return base[:n] + [f"Category {i}" for i in range(len(base), n)]
+
+
+def _rows(n: int, categories, months: int, rng: random.Random, now: datetime):
+    # yields (table, category, amount, date) tuples
+    bases = {c: rng.uniform(5, 120) for c in categories}
+    span = months * 30 * 86400
+    start = now - timedelta(seconds=span)
+    for _ in range(n):
+        when = start + timedelta(seconds=rng.random() * span)
+        if rng.random() < INCOME_SHARE:
+            yield "income", rng.choice(("Salary", "Side Hustle")), round(rng.uniform(200, 3000), 2), when
+            continue
+        cat = rng.choice(categories)
+        progress = (when - start).total_seconds() / span
+        amount = bases[cat] * (0.8 + 0.4 * progress) * (1.4 if when.month == 12 else 1.0) * rng.uniform(0.5, 1.5)
+        yield "expense", cat, round(amount, 2), when
+
+
+def _description(rng: random.Random) -> str:
+    # store numbers give the index a realistic number of distinct terms
+    return f"{rng.choice(MERCHANTS)} #{rng.randint(1, 9999)} {rng.choice(CITIES)}"
+
+
+def generate(path: str, transactions: int, categories: int = 20, months: int = 36, seed: int = 1,
+             quiet: bool = False, users: int = 1) -> dict:
+    """Create (or replace) a database at `path` with `transactions` rows and return its stats."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ["DATABASE_URL"] = _sqlite_url(path)
+    from app import app, db, CategoryMonthlyTotal, TRANSACTION_MODELS, Budget, Category, User, UserDetails, ensure_indexes, insert_default_categories
+    from werkzeug.security import generate_password_hash
+    import services.search as search
+    import services.summary as summary
+
+    if app.config["SQLALCHEMY_DATABASE_URI"] != _sqlite_url(path):
+        raise RuntimeError("app was already imported with another DATABASE_URL; run datagen in a fresh process")
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    names = _category_names(categories)
+    with app.app_context():
+        db.create_all()
+        # hashing is deliberately slow, so every account shares one hash
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        db.session.execute(User.__table__.insert(), [
+            {"id": uid, "username": f"user{uid}", "password_hash": password_hash} for uid in range(1, users + 1)
+        ])
+        db.session.commit()
+        insert_default_categories()  # one statement for every account
+        extra, budgets, details = [], [], []
+        for uid in range(1, users + 1):
+            defaults = {name for (name,) in db.session.query(Category.name).filter_by(user_id=uid)}
+            extra += [{"user_id": uid, "name": name, "type": "expense", "is_need": rng.random() < 0.5}
+                      for name in names if name not in defaults]
+            budgets += [{"user_id": uid, "category": name, "limit": round(rng.uniform(100, 1500), 2)}
+                        for name in names[: max(1, len(names) // 2)]]
+            details.append({"user_id": uid, "location": "Austin, TX", "radius": 10, "insurance_type": "PPO",
+                            "family_members": '[{"name": "A", "age": 35, "relation": "self"}, '
+                                              '{"name": "B", "age": 8, "relation": "child"}]',
+                            "pets": '[{"type": "dog", "count": 1}]'})
+        for model, rows in ((Category, extra), (UserDetails, details)):
+            if rows:
+                db.session.execute(model.__table__.insert(), rows)
+        category_ids = {(uid, name): cid for cid, uid, name in db.session.query(Category.id, Category.user_id, Category.name)}
+        for row in budgets:
+            row["category_id"] = category_ids[(row["user_id"], row.pop("category"))]
+        db.session.execute(Budget.__table__.insert(), budgets)
+        db.session.commit()
+
+    # bulk load through sqlite3 directly; indexes are created afterwards, which is much faster
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for table in ("expense", "income"):
+        for (name,) in conn.execute(f"SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = '{table}' AND sql IS NOT NULL").fetchall():
+            conn.execute(f"DROP INDEX {name}")
+    batch = {"expense": [], "income": []}
+    now = datetime.utcnow()
+    written = 0
+
+    def flush():
+        for table, rows in batch.items():
+            if rows:
+                conn.executemany(f"INSERT INTO {table} (user_id, category_id, amount, date, description) VALUES (?, ?, ?, ?, ?)", rows)
+                rows.clear()
+        conn.commit()
+
+    words = random.Random(seed + 1)  # separate stream, so a seed's amounts and dates stay the same
+    for table, cat, amount, when in _rows(transactions, names, months, rng, now):
+        uid = written % users + 1
+        batch[table].append((uid, category_ids[(uid, cat)], amount, when.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                             _description(words)))
+        written += 1
+        if written % CHUNK == 0:
+            flush()
+            if not quiet:
+                print(f"  {written:,} / {transactions:,} rows", file=sys.stderr)
+    flush()
+    conn.close()
+
+    with app.app_context():
+        ensure_indexes()
+        search.ensure_index(db.session, [model.__tablename__ for model in TRANSACTION_MODELS.values()])
+        summary_rows = summary.rebuild(db.session, CategoryMonthlyTotal, TRANSACTION_MODELS)
+        db.session.commit()
+        db.engine.dispose()
+
+    return {
+        "path": path,
+        "transactions": transactions,
+        "users": users,
+        "categories": categories,
+        "months": months,
+        "summary_rows": summary_rows,
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out")
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=1, help="Households sharing the instance.")
+    args = parser.parse_args(argv)
+    stats = generate(args.out, args.transactions, args.categories, args.months, args.seed, users=args.users)
+    print(f"Wrote {stats['transactions']:,} transactions for {stats['users']:,} users "
+          f"({stats['bytes'] / 1e6:.1f} MB) to {stats['path']} "
+          f"in {stats['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Endpoint benchmark runner.
+
+For every dataset size a synthetic database is generated (and reused on later runs), then a
+fresh worker process imports the app against it and drives each endpoint through
+`app.test_client()`, with Rentcast and Gemini pointed at a local stub server. Per endpoint
+it records p50/p95/p99 latency, SQL statements per request and the worker's peak RSS.
+The housing and explanation caches stay warm across iterations as they would in production;
+`meta.stub_calls` in the report shows how many upstream calls were actually made.
+
+    python -m benchmarks.run --sizes 10000,100000 --out bench.json
+    python -m benchmarks.run --sizes 10000,100000 --compare bench.json --threshold 1.2
+
+With --compare, p95 latencies and query counts are checked against an earlier report and the
+exit status is 1 if any endpoint regressed by more than --threshold.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.stub_server import StubServer
+
+ENDPOINTS = [
+    # (name, method, path, json body)
+    ("index", "GET", "/", None),
+    ("budget_tab", "GET", "/?tab=budget", None),
+    ("transactions_fragment", "GET", "/fragments/transactions", None),
+    ("timeseries", "GET", "/api/timeseries?type=expense", None),
+    ("timeseries_daily", "GET", "/api/timeseries?type=expense&bucket=day", None),
+    ("search", "GET", "/api/search?q=star", None),
+    ("search_filtered", "GET", "/api/search?q=whole+foods&min_amount=20&start=2020-01-01&sort=date", None),
+    ("recurring", "GET", "/api/recurring", None),
+    ("ai_advisor", "POST", "/ai-advisor", None),
+    ("ai_recommend", "POST", "/api/ai-recommend", {}),
+    ("apply_budget_updates", "POST", "/api/apply-budget-updates", {"updates": {"Food": 450.0, "Utilities": 180.0}}),
+    # 500 categories x (standing + one month); created on the first request, updated afterwards
+    ("apply_budget_updates_bulk", "POST", "/api/apply-budget-updates", {"items": [
+        {"category": f"Bulk {i:03d}", "limit": 100.0 + i, "period": period}
+        for i in range(500) for period in ("", "2030-01")
+    ]}),
+]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100.0) - 1))
+    return ordered[rank]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def log_in(client, user_id=1):
+    """Put `user_id` in the test client's session cookie, as a successful /login would."""
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+        sess["username"] = f"user{user_id}"
+
+
+# ------------------ WORKER (runs in a fresh process per dataset) ------------------
+
+def run_worker(iterations, warmup):
+    from sqlalchemy import event
+    from app import app, db
+
+    with app.app_context():
+        engine = db.engine
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    client = app.test_client()
+    log_in(client, int(os.getenv("BENCH_USER_ID") or 1))
+    results = {}
+    for name, method, path, body in ENDPOINTS:
+        kwargs = {"json": body} if body is not None else {}
+        for _ in range(warmup):
+            client.open(path, method=method, **kwargs)
+        timings, queries, statuses = [], [], {}
+        for _ in range(iterations):
+            before = statements[0]
+            started = time.perf_counter()
+            resp = client.open(path, method=method, **kwargs)
+            resp.get_data()
+            timings.append((time.perf_counter() - started) * 1000.0)
+            queries.append(statements[0] - before)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        results[name] = {
+            "requests": iterations,
+            "status": {str(k): v for k, v in statuses.items()},
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "max_ms": round(max(timings), 3),
+            "queries_per_request": round(sum(queries) / len(queries), 2),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    json.dump(results, sys.stdout)
+
+
+# ------------------ DRIVER ------------------
+
+def _dataset(size, args):
+    path = os.path.join(args.data_dir, f"finance-{size}-{args.categories}c-{args.months}m.db")
+    if os.path.exists(path) and not args.regenerate:
+        return path, None
+    cmd = [sys.executable, "-m", "benchmarks.datagen", path, "--transactions", str(size),
+           "--categories", str(args.categories), "--months", str(args.months), "--seed", str(args.seed)]
+    started = time.perf_counter()
+    subprocess.run(cmd, check=True, cwd=args.root)
+    return path, round(time.perf_counter() - started, 2)
+
+
+def _bench_size(size, args, stub):
+    path, generated_in = _dataset(size, args)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   DATABASE_URL="sqlite:///" + os.path.abspath(path),
+                   RENTCAST_API_KEY="bench", RENTCAST_BASE_URL=stub.url,
+                   GEMINI_API_KEY="bench", GEMINI_ENDPOINT=stub.url + "/generate",
+                   EXPLANATION_CACHE_PATH=os.path.join(tmp, "explanations.db"))
+        env.pop("GEMINI_STREAM_ENDPOINT", None)
+        cmd = [sys.executable, "-m", "benchmarks.run", "--worker",
+               "--iterations", str(args.iterations), "--warmup", str(args.warmup)]
+        out = subprocess.run(cmd, check=True, cwd=args.root, env=env, capture_output=True, text=True)
+    return {
+        "transactions": size,
+        "categories": args.categories,
+        "months": args.months,
+        "db_bytes": os.path.getsize(path),
+        "generated_in_s": generated_in,
+        "endpoints": json.loads(out.stdout),
+    }
+
+
+def compare(report, baseline, threshold):
+    """Return regression messages for endpoints whose p95 or query count grew past `threshold`."""
+    base = {(r["transactions"], name): ep for r in baseline["results"] for name, ep in r["endpoints"].items()}
+    problems = []
+    for r in report["results"]:
+        for name, ep in r["endpoints"].items():
+            old = base.get((r["transactions"], name))
+            if not old:
+                continue
+            for metric in ("p95_ms", "queries_per_request"):
+                if old[metric] > 0 and ep[metric] / old[metric] > threshold:
+                    problems.append(f"{name} @ {r['transactions']:,}: {metric} {old[metric]} -> {ep[metric]}")
+    return problems
+
+
+def _print_table(report):
+    print(f"{'size':>10}  {'endpoint':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'rss MB':>9}")
+    for r in report["results"]:
+        for name, ep in r["endpoints"].items():
+            print(f"{r['transactions']:>10,}  {name:<22}{ep['p50_ms']:>9.2f}{ep['p95_ms']:>9.2f}"
+                  f"{ep['p99_ms']:>9.2f}{ep['queries_per_request']:>9.1f}{ep['peak_rss_mb']:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Flask endpoints against synthetic datasets.")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated transaction counts.")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub upstream latency in seconds.")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "finance-bench"))
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild datasets even if they exist.")
+    parser.add_argument("--out", help="Write the JSON report here.")
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.iterations, args.warmup)
+        return
+
+    args.root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(args.data_dir, exist_ok=True)
+    sizes = [int(s.replace("_", "")) for s in args.sizes.split(",") if s.strip()]
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "stub_latency_s": args.latency,
+        },
+        "results": [],
+    }
+    with StubServer(latency=args.latency) as stub:
+        for size in sizes:
+            print(f"benchmarking {size:,} transactions...", file=sys.stderr)
+            report["results"].append(_bench_size(size, args, stub))
+        report["meta"]["stub_calls"] = stub.calls
+
+    _print_table(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.threshold)
+        for line in problems:
+            print("REGRESSION " + line)
+        if problems:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Monte Carlo simulation throughput versus worker processes.
+
+Builds a synthetic household history (--categories expense categories plus income over
+--history months) and runs the same seeded simulation with each worker count, reporting
+paths/sec, the speedup over one worker (which runs in-process, with no pool) and the
+parallel efficiency. Each worker count gets one untimed run first so pool startup is not
+counted. Because chunks are seeded independently of where they run, every worker count
+must return the same result; the run fails if one does not.
+
+    python -m benchmarks.simulation --paths 100000 --months 60 --workers 1,2,4,8 --out simulation.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.run import percentile
+from services import simulation
+from services.forecast import History
+
+
+def _model(categories, history, seed):
+    rng = np.random.default_rng(seed)
+    # per-category monthly spend around a category-specific mean; income covers ~90% of it
+    means = rng.uniform(50, 1500, size=(categories, 1))
+    expenses = History([f"Category {i + 1}" for i in range(categories)], 0,
+                       rng.gamma(4.0, means / 4.0, size=(categories, history + 1)))
+    income = History(["Salary"], 0, rng.normal(means.sum() * 1.1, means.sum() * 0.05, size=(1, history + 1)))
+    suggested = {expenses.categories[0]: float(means[0, 0]) * 0.8, "Rent": 1200.0}
+    return simulation.build_model(expenses, income, suggested), suggested
+
+
+def _run(model, args, workers):
+    return simulation.simulate(model, months=args.months, paths=args.paths, seed=args.seed,
+                               goals=args.goals, workers=workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure simulation paths/sec per worker count.")
+    parser.add_argument("--paths", type=int, default=simulation.MAX_PATHS)
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--history", type=int, default=simulation.HISTORY_WINDOW, help="Complete months of history.")
+    parser.add_argument("--workers", default=None, help="Comma-separated worker counts (default: 1, 2, 4, ... up to the cores).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per worker count.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--goals", type=float, nargs="*", default=[5000.0, 20000.0])
+    parser.add_argument("--out", help="Write the JSON report here.")
+    args = parser.parse_args(argv)
+
+    if args.paths < simulation.PARALLEL_MIN_PATHS:
+        print(f"note: fewer than {simulation.PARALLEL_MIN_PATHS} paths always run in-process", file=sys.stderr)
+    cores = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(w) for w in args.workers.split(",")]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= cores:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != cores:
+            counts.append(cores)
+
+    model, suggested = _model(args.categories, args.history, args.seed)
+    reference = None
+    rows = []
+    for workers in counts:
+        print(f"{workers} worker(s)...", file=sys.stderr)
+        result = _run(model, args, workers)  # warm-up: starts the pool
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = _run(model, args, workers)
+            times.append(time.perf_counter() - started)
+        if reference is None:
+            reference = result
+        seconds = percentile(times, 50)
+        rows.append({
+            "workers": workers,
+            "seconds_p50": round(seconds, 4),
+            "seconds_min": round(min(times), 4),
+            "paths_per_sec": round(args.paths / seconds),
+            "identical": result == reference,
+        })
+    base = rows[0]["paths_per_sec"]
+    for row in rows:
+        row["speedup"] = round(row["paths_per_sec"] / base, 2)
+        row["efficiency"] = round(row["speedup"] / row["workers"], 2)
+
+    report = {
+        "cores": cores,
+        "paths": args.paths,
+        "months": args.months,
+        "categories": args.categories,
+        "history_months": args.history,
+        "seed": args.seed,
+        "runs": rows,
+        "goals": {name: s["goals"] for name, s in reference["scenarios"].items()},
+        "suggested_budgets": suggested,
+    }
+    print(f"{args.paths} paths x {args.months} months, {args.categories} categories, {cores} core(s)")
+    print(f"{'workers':>8}{'seconds':>10}{'paths/sec':>12}{'speedup':>10}{'efficiency':>12}  identical")
+    for row in rows:
+        print(f"{row['workers']:>8}{row['seconds_p50']:>10.3f}{row['paths_per_sec']:>12}{row['speedup']:>10.2f}"
+              f"{row['efficiency']:>12.2f}  {'yes' if row['identical'] else 'NO'}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if not all(row["identical"] for row in rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Process startup benchmark.
+
+Every sample is a fresh interpreter, as a newly started (or respawned) worker would be. It
+records the time to `import app`, the time `create_app()` spends initializing the database
+("cold": a new, empty file; "warm": one that is already at the current schema revision),
+the latency of the first dashboard request, peak RSS after the import and after that
+request, and whether `requests` / `numpy` have been loaded at each point.
+
+    python -m benchmarks.startup --samples 5 --workers 4 --out startup.json
+
+--workers starts that many processes together against one new database and checks that
+exactly one of them ran the initialization.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.run import _peak_rss_mb, log_in, percentile
+
+HEAVY_MODULES = ("requests", "numpy")
+
+
+# ------------------ WORKER (runs in a fresh process per sample) ------------------
+
+def run_worker(start_at=None):
+    if start_at:
+        time.sleep(max(0.0, start_at - time.time()))
+    started = time.perf_counter()
+    import app as app_module
+    import_ms = (time.perf_counter() - started) * 1000.0
+    loaded_at_import = [m for m in HEAVY_MODULES if m in sys.modules]
+    rss_import = _peak_rss_mb()
+
+    started = time.perf_counter()
+    with app_module.app.app_context():
+        ran = app_module.init_db()  # what create_app() does
+    init_ms = (time.perf_counter() - started) * 1000.0
+
+    app = app_module.app
+    first_request_ms = None
+    if not start_at:
+        with app.app_context():
+            user = app_module.User.query.order_by(app_module.User.id).first()
+            if user is None:
+                user = app_module.create_user(f"startup{os.getpid()}", "bench-password")
+                app_module.db.session.commit()
+            user_id = user.id
+        client = app.test_client()
+        log_in(client, user_id)
+        started = time.perf_counter()
+        resp = client.get("/")
+        resp.get_data()
+        first_request_ms = (time.perf_counter() - started) * 1000.0
+        if resp.status_code != 200:
+            raise SystemExit(f"GET / returned {resp.status_code}")
+    json.dump({
+        "import_ms": round(import_ms, 2),
+        "init_ms": round(init_ms, 2),
+        "init_ran": ran,
+        "first_request_ms": round(first_request_ms, 2) if first_request_ms is not None else None,
+        "rss_after_import_mb": rss_import,
+        "rss_after_request_mb": _peak_rss_mb(),
+        "loaded_at_import": loaded_at_import,
+        "loaded_after_request": [m for m in HEAVY_MODULES if m in sys.modules],
+    }, sys.stdout)
+
+
+# ------------------ DRIVER ------------------
+
+def _worker_cmd(extra=()):
+    return [sys.executable, "-m", "benchmarks.startup", "--worker", *extra]
+
+
+def _env(path):
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.abspath(path), LISTINGS_REFRESH_INTERVAL="0")
+    env.pop("INSTRUMENTATION", None)
+    return env
+
+
+def _remove(path):
+    for suffix in ("", "-wal", "-shm", ".init-lock"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _sample(path, root):
+    out = subprocess.run(_worker_cmd(), check=True, cwd=root, env=_env(path), capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+
+def _summarize(samples):
+    summary = {}
+    for key in ("import_ms", "init_ms", "first_request_ms", "rss_after_import_mb", "rss_after_request_mb"):
+        values = [s[key] for s in samples if s[key] is not None]
+        if values:
+            summary[key] = {"p50": round(percentile(values, 50), 2), "max": round(max(values), 2)}
+    summary["loaded_at_import"] = sorted({m for s in samples for m in s["loaded_at_import"]})
+    summary["loaded_after_request"] = sorted({m for s in samples for m in s["loaded_after_request"]})
+    return summary
+
+
+def _concurrent(workers, data_dir, root):
+    path = os.path.join(data_dir, f"startup-concurrent-{os.getpid()}.db")
+    _remove(path)
+    start_at = f"{time.time() + 2.0:.3f}"  # after every interpreter has started
+    procs = [subprocess.Popen(_worker_cmd(("--start-at", start_at)), cwd=root, env=_env(path),
+                              stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    results = []
+    try:
+        for proc in procs:
+            out, _ = proc.communicate()
+            if proc.returncode != 0:
+                raise SystemExit(f"worker exited with {proc.returncode}")
+            results.append(json.loads(out))
+    finally:
+        _remove(path)
+    return {
+        "workers": workers,
+        "initialized_by": sum(1 for r in results if r["init_ran"]),
+        "init_ms": sorted(r["init_ms"] for r in results),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure worker startup: import, database init, first request.")
+    parser.add_argument("--samples", type=int, default=5, help="Fresh processes per scenario.")
+    parser.add_argument("--workers", type=int, default=4, help="Processes started together for the concurrency check (0 to skip).")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "finance-bench"))
+    parser.add_argument("--out", help="Write the JSON report here.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.start_at)
+        return
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(args.data_dir, exist_ok=True)
+    cold, warm = [], []
+    for i in range(args.samples):
+        print(f"sample {i + 1}/{args.samples}...", file=sys.stderr)
+        path = os.path.join(args.data_dir, f"startup-{os.getpid()}-{i}.db")
+        _remove(path)
+        try:
+            cold.append(_sample(path, root))
+            warm.append(_sample(path, root))
+        finally:
+            _remove(path)
+    report = {"samples": args.samples, "cold": _summarize(cold), "warm": _summarize(warm)}
+    if args.workers:
+        report["concurrent"] = _concurrent(args.workers, args.data_dir, root)
+
+    print(f"{'scenario':<10}{'import ms':>11}{'init ms':>10}{'1st req ms':>12}{'rss import':>12}{'rss req':>10}  loaded after request")
+    for name in ("cold", "warm"):
+        s = report[name]
+        print(f"{name:<10}{s['import_ms']['p50']:>11.1f}{s['init_ms']['p50']:>10.1f}{s['first_request_ms']['p50']:>12.1f}"
+              f"{s['rss_after_import_mb']['p50']:>12.1f}{s['rss_after_request_mb']['p50']:>10.1f}  "
+              f"{', '.join(s['loaded_after_request']) or '-'}")
+    if args.workers:
+        c = report["concurrent"]
+        print(f"{c['workers']} workers started together: initialization ran {c['initialized_by']} time(s)")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if report["cold"]["loaded_at_import"]:
+        print(f"loaded at import: {', '.join(report['cold']['loaded_at_import'])}", file=sys.stderr)
+    if args.workers and report["concurrent"]["initialized_by"] != 1:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Concurrency stress test for the storage profiles.
+
+Runs `--processes` worker processes against a copy of a synthetic database. Each worker
+runs `--writers` threads that add expenses (POST /) and `--readers` threads that page
+transactions and load the budget fragment, all for `--seconds`. Reports throughput,
+latency percentiles and error counts ("database is locked" shows up as 500s) per profile.
+
+    python -m benchmarks.stress --writers 8 --readers 8 --processes 2 --profiles default,production
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.run import log_in, percentile
+
+READ_PATHS = ("/api/transactions?type=expense", "/fragments/budget")
+
+
+# ------------------ WORKER ------------------
+
+def run_worker(writers, readers, seconds, start_at):
+    import app as appmod
+
+    appmod.app.logger.disabled = True  # failures are counted; don't print a traceback for each
+    stop_at = start_at + seconds
+    results = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+
+    def loop(kind, n):
+        client = appmod.app.test_client()
+        log_in(client)
+        latencies, failed, i = [], 0, 0
+        while time.time() < start_at:
+            time.sleep(0.001)
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                if kind == "write":
+                    resp = client.post("/", data={"expense_category": "Food", "expense_amount": f"{1 + (n + i) % 50}.25"})
+                    ok = resp.status_code == 302
+                else:
+                    resp = client.get(READ_PATHS[i % len(READ_PATHS)])
+                    ok = resp.status_code == 200
+            except Exception:
+                ok = False
+            i += 1
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000.0)
+            else:
+                failed += 1
+        with lock:
+            results[kind].extend(latencies)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=loop, args=("write", n)) for n in range(writers)]
+    threads += [threading.Thread(target=loop, args=("read", n)) for n in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue = appmod._transaction_writes
+    json.dump({"latencies": results, "errors": errors,
+               "write_queue": queue.stats() if queue is not None else None}, sys.stdout)
+
+
+# ------------------ DRIVER ------------------
+
+def _summarize(kind, latencies, errors, seconds):
+    out = {"ok": len(latencies), "errors": errors, "per_sec": round(len(latencies) / seconds, 1)}
+    if latencies:
+        out.update(p50_ms=round(percentile(latencies, 50), 2), p95_ms=round(percentile(latencies, 95), 2),
+                   p99_ms=round(percentile(latencies, 99), 2))
+    return out
+
+
+def run_profile(profile, base_db, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        shutil.copy(base_db, path)
+        env = dict(os.environ, DATABASE_URL="sqlite:///" + path, STORAGE_PROFILE=profile)
+        env.pop("INSTRUMENTATION", None)
+        start_at = time.time() + 3.0  # give every process time to import the app
+        cmd = [sys.executable, "-m", "benchmarks.stress", "--worker", "--writers", str(args.writers),
+               "--readers", str(args.readers), "--seconds", str(args.seconds), "--start-at", str(start_at)]
+        procs = [subprocess.Popen(cmd, cwd=args.root, env=env, stdout=subprocess.PIPE, text=True)
+                 for _ in range(args.processes)]
+        outputs = [json.loads(p.communicate()[0]) for p in procs]
+
+    merged = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    batches = items = 0
+    for out in outputs:
+        for kind in merged:
+            merged[kind].extend(out["latencies"][kind])
+            errors[kind] += out["errors"][kind]
+        if out["write_queue"]:
+            batches += out["write_queue"]["batches"]
+            items += out["write_queue"]["items"]
+    return {
+        "profile": profile,
+        "writes": _summarize("write", merged["write"], errors["write"], args.seconds),
+        "reads": _summarize("read", merged["read"], errors["read"], args.seconds),
+        "avg_write_batch": round(items / batches, 2) if batches else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent readers/writers against the storage profiles.")
+    parser.add_argument("--profiles", default="default,production")
+    parser.add_argument("--writers", type=int, default=8, help="Writer threads per process.")
+    parser.add_argument("--readers", type=int, default=8, help="Reader threads per process.")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--size", type=int, default=100_000, help="Transactions in the starting database.")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "finance-bench"))
+    parser.add_argument("--out", help="Write the JSON report here.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.writers, args.readers, args.seconds, args.start_at)
+        return
+
+    args.root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(args.data_dir, exist_ok=True)
+    base_db = os.path.join(args.data_dir, f"stress-{args.size}.db")
+    if not os.path.exists(base_db):
+        subprocess.run([sys.executable, "-m", "benchmarks.datagen", base_db, "--transactions", str(args.size)],
+                       check=True, cwd=args.root)
+
+    report = []
+    for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        print(f"{profile}: {args.processes} processes x ({args.writers} writers + {args.readers} readers) "
+              f"for {args.seconds:g}s...", file=sys.stderr)
+        report.append(run_profile(profile, base_db, args))
+
+    print(f"{'profile':<12}{'writes/s':>10}{'w p95 ms':>10}{'w errors':>10}{'reads/s':>10}{'r p95 ms':>10}{'r errors':>10}{'batch':>8}")
+    for r in report:
+        w, rd = r["writes"], r["reads"]
+        print(f"{r['profile']:<12}{w['per_sec']:>10}{w.get('p95_ms', '-'):>10}{w['errors']:>10}"
+              f"{rd['per_sec']:>10}{rd.get('p95_ms', '-'):>10}{rd['errors']:>10}{r['avg_write_batch'] or '-':>8}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"writers": args.writers, "readers": args.readers, "processes": args.processes,
+                       "seconds": args.seconds, "size": args.size, "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
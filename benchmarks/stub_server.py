@@ -0,0 +1,142 @@
+"""Local stand-in for the Rentcast and Gemini APIs.
+
+`GET /search` returns listings in the Rentcast shape, `GET /geocode` a Nominatim-style hit
+at the listings' centre and `POST /generate` a Gemini completion, each after a fixed `latency` so upstream cost shows up in the numbers without
+touching the network. Setting `status` to an error code (e.g. 503) makes every endpoint
+answer with that status instead, to exercise retries and the circuit breaker.
+
+`POST /stream` is the streaming Gemini endpoint: one SSE `data:` event per entry of `chunks`,
+`chunk_interval` seconds apart, over chunked transfer encoding. With `fail_after` it drops
+the connection mid-body after that many events; a client that goes away mid-stream is
+counted in `disconnects`.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+STREAM_CHUNKS = ("Stub explanation: ", "the listing ", "meets the ", "minimum needs.")
+CENTER = (30.27, -97.74)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        time.sleep(self.server.latency)
+        self.server.calls[urlsplit(self.path).path] = self.server.calls.get(urlsplit(self.path).path, 0) + 1
+        if self.server.status != 200:
+            body = json.dumps({"error": "stub failure"}).encode("utf-8")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/geocode":
+            self._reply([{"lat": str(CENTER[0]), "lon": str(CENTER[1]), "display_name": "Stub City"}])
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        limit = int((query.get("limit") or ["10"])[0])
+        beds = int((query.get("min_beds") or ["1"])[0])
+        # prices are not monotonic in i and listings are scattered ~20 miles around the centre,
+        # so the cheapest match depends on the radius and the minimums
+        self._reply({"listings": [
+            {"id": f"stub-{i}", "price": 900 + (i * 7919) % 2400, "bedrooms": beds + i % 4, "bathrooms": 1 + i % 3,
+             "size": 500 + (i * 37) % 1500, "address": f"{200 + i} Stub St", "url": f"http://stub/listing/{i}",
+             "latitude": CENTER[0] + ((i * 613) % 600 - 300) / 1000.0,
+             "longitude": CENTER[1] + ((i * 421) % 700 - 350) / 1000.0}
+            for i in range(limit)
+        ]})
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _stream(self):
+        server = self.server
+        time.sleep(server.latency)
+        server.calls["/stream"] = server.calls.get("/stream", 0) + 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, text in enumerate(server.chunks):
+                if server.fail_after is not None and i >= server.fail_after:
+                    # promise a chunk that never arrives, then hang up
+                    self.wfile.write(b"100\r\ndata: {")
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                event = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+                if i == len(server.chunks) - 1:
+                    event["usageMetadata"] = {"promptTokenCount": 120, "candidatesTokenCount": len(server.chunks)}
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                time.sleep(server.chunk_interval)
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            server.disconnects += 1
+            self.close_connection = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if urlsplit(self.path).path == "/stream" and self.server.status == 200:
+            self._stream()
+            return
+        self._reply({
+            "candidates": [{"content": "Stub explanation: the listing meets the minimum needs."}],
+            "usageMetadata": {"promptTokenCount": 120, "candidatesTokenCount": 40},
+        })
+
+
+class StubServer:
+    def __init__(self, latency: float = 0.05, status: int = 200, chunks=STREAM_CHUNKS, chunk_interval: float = 0.0,
+                 fail_after: Optional[int] = None):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.status = status
+        self.httpd.chunks = list(chunks)
+        self.httpd.chunk_interval = chunk_interval
+        self.httpd.fail_after = fail_after
+        self.httpd.disconnects = 0
+        self.httpd.calls = {}
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def calls(self):
+        return dict(self.httpd.calls)
+
+    @property
+    def status(self) -> int:
+        return self.httpd.status
+
+    @status.setter
+    def status(self, value: int) -> None:
+        self.httpd.status = value
+
+    @property
+    def disconnects(self) -> int:
+        return self.httpd.disconnects
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
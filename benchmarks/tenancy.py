@@ -0,0 +1,170 @@
+"""Per-household latency versus instance size.
+
+Generates one database per household count, each with the same number of transactions
+per household (so the largest instance holds households x rows-per-user rows in total),
+then measures the per-household endpoints for a sample of households spread across the
+id range. Because every query is scoped by a (user_id, ...) index, per-household latency
+should stay flat as the instance grows; the report shows each endpoint's p95 per instance
+size and the ratio between the largest and the smallest instance.
+
+    python -m benchmarks.tenancy --households 10,100,1000 --rows-per-user 2000 --out tenancy.json
+
+The exit status is 1 if any endpoint's p95 ratio exceeds --threshold.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.run import log_in, percentile
+
+ENDPOINTS = [
+    # (name, method, path)
+    ("transactions_page", "GET", "/api/transactions?type=expense&limit=50"),
+    ("transactions_by_category", "GET", "/api/transactions?type=expense&category=Food&limit=50"),
+    ("transactions_fragment", "GET", "/fragments/transactions"),
+    ("dashboard_fragment", "GET", "/fragments/dashboard"),
+    ("budget_fragment", "GET", "/fragments/budget"),
+    ("ai_advisor", "POST", "/ai-advisor"),
+]
+
+
+# ------------------ WORKER ------------------
+
+def _sample_users(households, n):
+    # evenly spaced ids, so the first, middle and last households are all measured
+    n = max(1, min(n, households))
+    return sorted({1 + (households - 1) * i // max(1, n - 1) for i in range(n)})
+
+
+def run_worker(households, sample, iterations, warmup):
+    from sqlalchemy import event
+    from app import app, db
+
+    with app.app_context():
+        engine = db.engine
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    users = _sample_users(households, sample)
+    timings = {name: [] for name, _, _ in ENDPOINTS}
+    queries = {name: [] for name, _, _ in ENDPOINTS}
+    errors = {name: 0 for name, _, _ in ENDPOINTS}
+    for user_id in users:
+        client = app.test_client()
+        log_in(client, user_id)
+        for name, method, path in ENDPOINTS:
+            for _ in range(warmup):
+                client.open(path, method=method)
+            for _ in range(iterations):
+                before = statements[0]
+                started = time.perf_counter()
+                resp = client.open(path, method=method)
+                resp.get_data()
+                timings[name].append((time.perf_counter() - started) * 1000.0)
+                queries[name].append(statements[0] - before)
+                if resp.status_code != 200:
+                    errors[name] += 1
+    json.dump({
+        name: {
+            "requests": len(timings[name]),
+            "errors": errors[name],
+            "p50_ms": round(percentile(timings[name], 50), 3),
+            "p95_ms": round(percentile(timings[name], 95), 3),
+            "queries_per_request": round(sum(queries[name]) / len(queries[name]), 2),
+        }
+        for name, _, _ in ENDPOINTS
+    } | {"_sampled_users": users}, sys.stdout)
+
+
+# ------------------ DRIVER ------------------
+
+def _dataset(households, args):
+    path = os.path.join(args.data_dir, f"tenancy-{households}u-{args.rows_per_user}r-{args.categories}c.db")
+    if os.path.exists(path) and not args.regenerate:
+        return path
+    cmd = [sys.executable, "-m", "benchmarks.datagen", path, "--users", str(households),
+           "--transactions", str(households * args.rows_per_user), "--categories", str(args.categories),
+           "--months", str(args.months), "--seed", str(args.seed)]
+    subprocess.run(cmd, check=True, cwd=args.root)
+    return path
+
+
+def _bench(households, args):
+    path = _dataset(households, args)
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.abspath(path))
+    env.pop("INSTRUMENTATION", None)
+    cmd = [sys.executable, "-m", "benchmarks.tenancy", "--worker", "--households", str(households),
+           "--sample-users", str(args.sample_users), "--iterations", str(args.iterations), "--warmup", str(args.warmup)]
+    out = subprocess.run(cmd, check=True, cwd=args.root, env=env, capture_output=True, text=True)
+    endpoints = json.loads(out.stdout)
+    return {
+        "households": households,
+        "transactions": households * args.rows_per_user,
+        "db_bytes": os.path.getsize(path),
+        "sampled_users": endpoints.pop("_sampled_users"),
+        "endpoints": endpoints,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-household latency as the instance grows.")
+    parser.add_argument("--households", default="10,100,1000", help="Comma-separated household counts.")
+    parser.add_argument("--rows-per-user", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=12)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sample-users", type=int, default=10, help="Households measured per instance.")
+    parser.add_argument("--iterations", type=int, default=20, help="Requests per endpoint per household.")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "finance-bench"))
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--out", help="Write the JSON report here.")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="Fail if largest/smallest instance p95 exceeds this ratio.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    sizes = sorted(int(h) for h in args.households.split(",") if h.strip())
+
+    if args.worker:
+        run_worker(sizes[0], args.sample_users, args.iterations, args.warmup)
+        return
+
+    args.root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for households in sizes:
+        print(f"{households:,} households x {args.rows_per_user:,} rows...", file=sys.stderr)
+        results.append(_bench(households, args))
+
+    smallest, largest = results[0], results[-1]
+    header = f"{'endpoint':<26}" + "".join(f"{r['transactions']:>14,}" for r in results) + f"{'ratio':>8}{'q/req':>7}"
+    print("p95 ms by total instance rows")
+    print(header)
+    ratios, failed = {}, []
+    for name, _, _ in ENDPOINTS:
+        p95s = [r["endpoints"][name]["p95_ms"] for r in results]
+        ratio = round(largest["endpoints"][name]["p95_ms"] / max(smallest["endpoints"][name]["p95_ms"], 1e-6), 2)
+        ratios[name] = ratio
+        if ratio > args.threshold:
+            failed.append(name)
+        print(f"{name:<26}" + "".join(f"{p:>14.2f}" for p in p95s)
+              + f"{ratio:>8.2f}{largest['endpoints'][name]['queries_per_request']:>7}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"rows_per_user": args.rows_per_user, "categories": args.categories, "months": args.months,
+                       "results": results, "p95_ratio": ratios, "threshold": args.threshold}, f, indent=2)
+    if failed:
+        print(f"p95 grew by more than {args.threshold}x with instance size: {', '.join(failed)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
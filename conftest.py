@@ -0,0 +1,19 @@
+"""Test settings: the app is configured from the environment when it is first imported, so
+point every database it opens at a scratch directory (never instance/) and turn off the
+external services and optional subsystems before any test module imports it."""
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="finance-tests-")
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_scratch, "finance.db")
+os.environ["JOBS_DB_PATH"] = os.path.join(_scratch, "jobs.db")
+os.environ["EXPLANATION_CACHE_PATH"] = os.path.join(_scratch, "explanations.db")
+os.environ["LISTINGS_DB_PATH"] = os.path.join(_scratch, "listings.db")
+os.environ["EXPORT_DIR"] = os.path.join(_scratch, "exports")
+os.environ["LISTINGS_REFRESH_INTERVAL"] = "0"
+os.environ["SECRET_KEY"] = "test"
+for name in ("STORAGE_PROFILE", "WRITE_QUEUE", "INSTRUMENTATION", "PROFILE_SAMPLE_RATE", "PROFILE_DIR",
+             "GEMINI_API_KEY", "GEMINI_ENDPOINT", "GEMINI_STREAM_ENDPOINT",
+             "RENTCAST_API_KEY", "RENTCAST_KEY", "RENTCAST_BASE_URL"):
+    os.environ.pop(name, None)
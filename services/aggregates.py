@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+
+
+def monthly_rollup(session, model, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   user_id: Optional[int] = None):
+    """Query yielding (user_id, month 'YYYY-MM', category_id, SUM(amount), COUNT(*)) rows, oldest month first."""
+    month = func.strftime('%Y-%m', model.date)
+    q = session.query(model.user_id, month, model.category_id, func.sum(model.amount), func.count(model.id))
+    if user_id is not None:
+        q = q.filter(model.user_id == user_id)
+    if start is not None:
+        q = q.filter(model.date >= start)
+    if end is not None:
+        q = q.filter(model.date < end)
+    return q.group_by(model.user_id, month, model.category_id).order_by(model.user_id, month, model.category_id)
@@ -0,0 +1,158 @@
+"""Batch budget updates.
+
+A payload is validated as a whole before anything is written, then applied with one
+`INSERT ... ON CONFLICT (user_id, category_id, period) DO UPDATE` per chunk of
+`chunk_size` rows, all in the caller's transaction. Category names are resolved with one
+query for the whole batch; unknown names are created (as expense categories) with one more.
+
+A budget's `period` is "" for the standing monthly budget or "YYYY-MM" for a single month,
+which overrides the standing one for that month (see `for_month()`).
+"""
+import math
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+DEFAULT_CHUNK_SIZE = 500  # 4 bound parameters per row, well under SQLite's variable limit
+MAX_ITEMS = 10_000
+STANDING = ""
+
+_PERIOD = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+class BudgetItem(NamedTuple):
+    category: str
+    limit: float
+    period: str
+
+
+def _item_error(raw: Any) -> Tuple[Optional[BudgetItem], Optional[str]]:
+    if not isinstance(raw, dict):
+        return None, "must be an object with category and limit"
+    category = raw.get("category")
+    if not isinstance(category, str) or not category.strip():
+        return None, "category is required"
+    if len(category.strip()) > 100:
+        return None, "category is longer than 100 characters"
+    limit = raw.get("limit")
+    if isinstance(limit, bool):
+        return None, "limit must be a number"
+    try:
+        limit = float(limit)
+    except (TypeError, ValueError):
+        return None, "limit must be a number"
+    if not math.isfinite(limit) or limit < 0:
+        return None, "limit must be a non-negative number"
+    period = raw.get("period") or STANDING
+    if period != STANDING and (not isinstance(period, str) or not _PERIOD.match(period)):
+        return None, "period must be YYYY-MM (or empty for every month)"
+    return BudgetItem(category.strip(), limit, period), None
+
+
+def parse_updates(payload: Any) -> Tuple[List[BudgetItem], List[Dict[str, Any]]]:
+    """Validate a request body; returns (items, errors) and items is empty whenever errors is not.
+
+    Accepts {"items": [{"category", "limit", "period"?}, ...]} or the older
+    {"updates": {category: limit}} (standing budgets).
+    """
+    if not isinstance(payload, dict):
+        return [], [{"index": None, "error": "Body must be a JSON object."}]
+    raw_items = payload.get("items")
+    if raw_items is None and isinstance(payload.get("updates"), dict):
+        raw_items = [{"category": k, "limit": v} for k, v in payload["updates"].items()]
+    if not isinstance(raw_items, list) or not raw_items:
+        return [], [{"index": None, "error": "No updates provided."}]
+    if len(raw_items) > MAX_ITEMS:
+        return [], [{"index": None, "error": f"At most {MAX_ITEMS} items per request."}]
+
+    items, errors, seen = [], [], {}
+    for i, raw in enumerate(raw_items):
+        item, error = _item_error(raw)
+        if item is not None:
+            first = seen.setdefault((item.category, item.period), i)
+            if first != i:
+                error = f"duplicates item {first}"
+        if error:
+            errors.append({"index": i, "error": error})
+        else:
+            items.append(item)
+    return ([] if errors else items), errors
+
+
+def upsert(session, budget_model, category_model, user_id: int, items: List[BudgetItem],
+           create_missing: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+    """Write `items` for household `user_id` (without committing); one result per item, in order.
+
+    Each result is {"category", "period", "limit", "id", "status"} with status "created",
+    "updated" or "unknown_category" (when `create_missing` is off).
+    """
+    categories = category_model.__table__
+    budgets = budget_model.__table__
+    names = sorted({it.category for it in items})
+
+    def resolve():
+        ids = {}
+        for start in range(0, len(names), chunk_size):
+            chunk = names[start:start + chunk_size]
+            ids.update(session.execute(
+                select(categories.c.name, categories.c.id)
+                .where(categories.c.user_id == user_id, categories.c.name.in_(chunk))
+            ).all())
+        return ids
+
+    ids = resolve()
+    missing = [n for n in names if n not in ids]
+    if missing and create_missing:
+        # suggestions and bulk edits can name categories the household has since deleted
+        session.execute(
+            sqlite_insert(categories).on_conflict_do_nothing(index_elements=["user_id", "name"]),
+            [{"user_id": user_id, "name": n, "type": "expense", "is_need": True} for n in missing],
+        )
+        ids = resolve()
+
+    rows = [{"user_id": user_id, "category_id": ids[it.category], "period": it.period, "limit": it.limit}
+            for it in items if it.category in ids]
+    keys = [(r["category_id"], r["period"]) for r in rows]
+    existing = set()
+    for start in range(0, len(keys), chunk_size):
+        chunk_ids = {cid for cid, _ in keys[start:start + chunk_size]}
+        existing.update(session.execute(
+            select(budgets.c.category_id, budgets.c.period)
+            .where(budgets.c.user_id == user_id, budgets.c.category_id.in_(chunk_ids))
+        ).all())
+
+    # one compiled (and cached) statement; SQLAlchemy sends each chunk as a single multi-row
+    # INSERT ... RETURNING ("insertmanyvalues")
+    stmt = sqlite_insert(budgets)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "category_id", "period"], set_={"limit": stmt.excluded.limit},
+    ).returning(budgets.c.id, budgets.c.category_id, budgets.c.period)
+    written = {}
+    for start in range(0, len(rows), chunk_size):
+        result = session.execute(stmt, rows[start:start + chunk_size])
+        written.update(((cid, period), bid) for bid, cid, period in result)
+
+    results = []
+    for it in items:
+        result = {"category": it.category, "period": it.period, "limit": it.limit}
+        cid = ids.get(it.category)
+        if cid is None:
+            result.update(id=None, status="unknown_category")
+        else:
+            result.update(id=written[(cid, it.period)],
+                          status="updated" if (cid, it.period) in existing else "created")
+        results.append(result)
+    return results
+
+
+def for_month(session, budget_model, category_model, user_id: int, month: str) -> Dict[str, float]:
+    """{category name: limit} in effect for `month` (YYYY-MM): the month's own budget, else the standing one."""
+    rows = session.execute(
+        select(category_model.name, budget_model.limit)
+        .join(category_model, category_model.id == budget_model.category_id)
+        .where(budget_model.user_id == user_id, budget_model.period.in_((STANDING, month)))
+        .order_by(budget_model.period)  # "" sorts first, so the month's own row wins
+    ).all()
+    return dict(rows)
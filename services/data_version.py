@@ -0,0 +1,83 @@
+"""Per-table write counters used to build ETags for the tab fragments.
+
+`track_writes()` hooks the session so every commit that inserted, updated or deleted rows
+bumps the counter of each table it touched, in the same transaction. A fragment's ETag is
+derived from the counters of the tables it reads, so it changes exactly when one of them
+does (in any process sharing the database). Writes that bypass the session's ORM/Core
+execution (raw DBAPI executemany) must call `mark()` themselves.
+
+Counters are kept per household: while `session.info[SCOPE]` holds a user id, writes bump
+"<user_id>:<table>" rather than "<table>", so one household's writes do not invalidate every
+other household's fragments. Unscoped writes (maintenance commands, migrations) bump the
+plain table counter, which is part of every household's ETag.
+"""
+import hashlib
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+_PENDING = "data_version_tables"
+SCOPE = "data_scope"
+
+
+def _scoped(scope: Optional[int], table: str) -> str:
+    return table if scope is None else f"{scope}:{table}"
+
+
+def mark(session, *tables: str, scope: Optional[int] = None) -> None:
+    """Record that the current transaction wrote to `tables` (for household `scope`, default the session's)."""
+    if scope is None:
+        scope = session.info.get(SCOPE)
+    session.info.setdefault(_PENDING, set()).update(_scoped(scope, t) for t in tables)
+
+
+def track_writes(session, version_model) -> None:
+    """Install the session hooks; `session` may be a scoped_session or sessionmaker."""
+    version_table = version_model.__table__
+
+    @event.listens_for(session, "after_flush")
+    def _after_flush(sess, flush_context):
+        touched = {obj.__table__.name for obj in (*sess.new, *sess.dirty, *sess.deleted) if hasattr(obj, "__table__")}
+        if touched:
+            mark(sess, *touched)
+
+    @event.listens_for(session, "do_orm_execute")
+    def _on_execute(state):
+        if state.is_insert or state.is_update or state.is_delete:
+            table = getattr(state.statement, "table", None)
+            if table is not None and table.name != version_table.name:
+                mark(state.session, table.name)
+
+    @event.listens_for(session, "before_commit")
+    def _before_commit(sess):
+        sess.flush()
+        tables = sess.info.pop(_PENDING, None)
+        tables = sorted(tables - {version_table.name}) if tables else []
+        if not tables:
+            return
+        stmt = sqlite_insert(version_table)
+        stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"version": version_table.c.version + 1})
+        sess.execute(stmt, [{"name": name, "version": 1} for name in tables])
+        sess.info.pop(_PENDING, None)
+
+    @event.listens_for(session, "after_rollback")
+    def _after_rollback(sess):
+        sess.info.pop(_PENDING, None)
+
+
+def versions(session, version_model, tables: Iterable[str]) -> Dict[str, int]:
+    t = version_model.__table__
+    names = list(tables)
+    found = dict(session.execute(select(t.c.name, t.c.version).where(t.c.name.in_(names))).all())
+    return {name: found.get(name, 0) for name in names}
+
+
+def etag(session, version_model, name: str, tables: Iterable[str], *extra, scope: Optional[int] = None) -> str:
+    """Opaque tag for fragment `name` built from its tables' counters (plus any `extra` inputs)."""
+    tables = list(tables)
+    if scope is not None:
+        tables += [_scoped(scope, t) for t in tables]
+    current = versions(session, version_model, tables)
+    raw = "|".join([name, *(f"{t}={v}" for t, v in sorted(current.items())), *map(str, extra)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
@@ -0,0 +1,147 @@
+"""Persistent cache of generated advisor explanations.
+
+Entries live in a small SQLite file (EXPLANATION_CACHE_PATH, default instance/explanations.db)
+so they survive restarts. Keys are a hash of the normalized recommendation inputs; entries
+expire after a TTL and the least recently used ones are evicted beyond `max_entries`.
+Each entry records the upstream latency and token counts it cost, and hits add those to
+running "saved" totals.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "explanations.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS explanation_cache (
+    key TEXT PRIMARY KEY,
+    explanation TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_explanation_cache_last_used ON explanation_cache (last_used);
+CREATE TABLE IF NOT EXISTS explanation_cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    upstream_ms REAL NOT NULL DEFAULT 0,
+    upstream_tokens INTEGER NOT NULL DEFAULT 0,
+    saved_ms REAL NOT NULL DEFAULT 0,
+    saved_tokens INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO explanation_cache_stats (id) VALUES (1);
+"""
+
+
+def _normalize(value: Any) -> Any:
+    # numbers compare as rounded floats so 1500, 1500.0 and 1500.0000001 hash alike;
+    # dict ordering is handled by sort_keys
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(float(value), 2)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(needs: Dict[str, Any], listing: Optional[Dict], suggested_budgets: Dict[str, float], details: Dict[str, Any]) -> str:
+    payload = _normalize({"needs": needs, "listing": listing, "suggested": suggested_budgets, "details": details})
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    def __init__(self, path: str = DEFAULT_PATH, max_entries: int = 1000, ttl: float = 7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT explanation, created_at, latency_ms, prompt_tokens + output_tokens FROM explanation_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None or row[1] + self.ttl <= now:
+                    if row is not None:
+                        conn.execute("DELETE FROM explanation_cache WHERE key = ?", (key,))
+                    conn.execute("UPDATE explanation_cache_stats SET misses = misses + 1 WHERE id = 1")
+                    return None
+                explanation, _, latency_ms, tokens = row
+                conn.execute("UPDATE explanation_cache SET hits = hits + 1, last_used = ? WHERE key = ?", (now, key))
+                conn.execute(
+                    "UPDATE explanation_cache_stats SET hits = hits + 1, saved_ms = saved_ms + ?, saved_tokens = saved_tokens + ? WHERE id = 1",
+                    (latency_ms, tokens),
+                )
+                return explanation
+        finally:
+            conn.close()
+
+    def put(self, key: str, explanation: str, latency_ms: float, prompt_tokens: int, output_tokens: int) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO explanation_cache (key, explanation, created_at, last_used, hits, latency_ms, prompt_tokens, output_tokens) "
+                    "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                    (key, explanation, now, now, latency_ms, prompt_tokens, output_tokens),
+                )
+                conn.execute(
+                    "UPDATE explanation_cache_stats SET upstream_ms = upstream_ms + ?, upstream_tokens = upstream_tokens + ? WHERE id = 1",
+                    (latency_ms, prompt_tokens + output_tokens),
+                )
+                conn.execute("DELETE FROM explanation_cache WHERE created_at <= ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM explanation_cache WHERE key IN ("
+                    "SELECT key FROM explanation_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            hits, misses, upstream_ms, upstream_tokens, saved_ms, saved_tokens = conn.execute(
+                "SELECT hits, misses, upstream_ms, upstream_tokens, saved_ms, saved_tokens FROM explanation_cache_stats WHERE id = 1"
+            ).fetchone()
+            entries = conn.execute("SELECT COUNT(*) FROM explanation_cache").fetchone()[0]
+        finally:
+            conn.close()
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "upstream_ms": round(upstream_ms, 1),
+            "upstream_tokens": upstream_tokens,
+            "saved_ms": round(saved_ms, 1),
+            "saved_tokens": saved_tokens,
+        }
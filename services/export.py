@@ -0,0 +1,345 @@
+"""Columnar exports of the transaction history, for reporting off the live database.
+
+`export_snapshot()` streams the transaction tables out of SQLite in id order, `chunk_size`
+rows per query, into one directory per table partitioned by month:
+
+    <out>/_manifest.json
+    <out>/expense/month=2026-01/part-00003.parquet
+    <out>/budget/budget.parquet             (small; rewritten on every run)
+
+Formats are Parquet, Arrow IPC ("arrow", memory-mappable) and CSV. Parquet and Arrow need
+pyarrow; CSV does not. Each run after the first is incremental: the manifest records the
+highest id exported per table (the watermark) and the next run only appends rows above it,
+as new part files; the transaction tables use AUTOINCREMENT ids, so a new row always lands
+above it, even after the newest row was deleted. Rows edited or deleted after they were
+exported stay as they were in the snapshot until a `full` run rewrites it, as does a snapshot
+written with other columns than TRANSACTION_COLUMNS.
+
+`Snapshot` opens an export read-only: Arrow files are memory-mapped (zero-copy) and Parquet
+files are read through a memory map, so reports run against the files rather than the
+database.
+"""
+import csv
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import select, tuple_
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+MANIFEST = "_manifest.json"
+DEFAULT_CHUNK_SIZE = 50_000
+
+TRANSACTION_COLUMNS = (("id", "int64"), ("user_id", "int64"), ("category_id", "int64"), ("category", "string"),
+                       ("amount", "float64"), ("date", "timestamp"), ("description", "string"))
+BUDGET_COLUMNS = (("id", "int64"), ("user_id", "int64"), ("category_id", "int64"), ("category", "string"),
+                  ("period", "string"), ("limit", "float64"))
+
+
+class ExportResult(NamedTuple):
+    rows: Dict[str, int]  # rows written this run, per table
+    parts: int
+    seconds: float
+    full: bool
+
+
+def _pyarrow(fmt: str):
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError(f"{fmt} files need pyarrow (pip install pyarrow); csv exports work without it") from None
+    return pyarrow
+
+
+def _schema(pa, columns):
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(), "timestamp": pa.timestamp("us")}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+# ------------------ READING FROM SQLITE ------------------
+
+def _category_table(table):
+    return next(iter(table.c.category_id.foreign_keys)).column.table
+
+
+def _select(table, columns, user_id: Optional[int]):
+    cat = _category_table(table)
+    cols = [cat.c.name.label("category") if name == "category" else table.c[name] for name, _ in columns]
+    stmt = select(*cols).select_from(table.join(cat, cat.c.id == table.c.category_id))
+    if user_id is not None:
+        stmt = stmt.where(table.c.user_id == user_id)
+    return stmt
+
+
+def iter_chunks(session, table, columns, user_id: Optional[int] = None, after_id: int = 0,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """Rows of `table` (as `columns`, category resolved to its name) with id > `after_id`, in id
+    order, one list of at most `chunk_size` rows per query (keyset pagination on the primary key)."""
+    base = _select(table, columns, user_id).order_by(table.c.id).limit(chunk_size)
+    last = after_id
+    while True:
+        rows = session.execute(base.where(table.c.id > last)).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+def iter_chunks_by_date(session, table, columns, user_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """One household's rows oldest first, keyset-paginated on (date, id) so each chunk is a
+    range scan of the (user_id, date, id) index; id order would re-sort the household per chunk."""
+    date_at = [name for name, _ in columns].index("date")
+    base = _select(table, columns, user_id).order_by(table.c.date, table.c.id).limit(chunk_size)
+    last = None
+    while True:
+        stmt = base if last is None else base.where(tuple_(table.c.date, table.c.id) > last)
+        rows = session.execute(stmt).all()
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1][date_at], rows[-1][0])
+        if len(rows) < chunk_size:
+            return
+
+
+def iter_csv(session, table, columns, user_id: int, chunk_size: int = 5000) -> Iterator[str]:
+    """One household's rows of `table` as CSV text in chunks (header first), for streaming an
+    HTTP response; transactions come oldest first."""
+    buf = _LineBuffer()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _ in columns])
+    yield buf.drain()
+    if "date" in table.c:
+        chunks = iter_chunks_by_date(session, table, columns, user_id, chunk_size)
+    else:
+        chunks = iter_chunks(session, table, columns, user_id=user_id, chunk_size=chunk_size)
+    for rows in chunks:
+        writer.writerows(_csv_row(r) for r in rows)
+        yield buf.drain()
+
+
+class _LineBuffer:
+    def __init__(self):
+        self._parts: List[str] = []
+
+    def write(self, s: str) -> None:
+        self._parts.append(s)
+
+    def drain(self) -> str:
+        out, self._parts = "".join(self._parts), []
+        return out
+
+
+def _csv_row(row) -> list:
+    return [v.isoformat(sep=" ") if isinstance(v, datetime) else v for v in row]
+
+
+# ------------------ PART WRITERS ------------------
+
+class _PartWriter:
+    """One output file, written under a temporary name and renamed into place on close()."""
+
+    def __init__(self, path: str, fmt: str, columns):
+        self.path = path
+        self.rows = 0
+        self._tmp = path + ".tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fmt = fmt
+        self._names = [name for name, _ in columns]
+        if fmt == "csv":
+            self._file = open(self._tmp, "w", encoding="utf-8", newline="")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self._names)
+            return
+        pa = self._pa = _pyarrow(fmt)
+        self._arrow_schema = _schema(pa, columns)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self._tmp, self._arrow_schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(self._tmp, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self._arrow_schema)
+
+    def write(self, rows: List[tuple]) -> None:
+        self.rows += len(rows)
+        if self._fmt == "csv":
+            self._csv.writerows(_csv_row(r) for r in rows)
+            return
+        arrays = [self._pa.array([r[i] for r in rows], type=field.type) for i, field in enumerate(self._arrow_schema)]
+        self._writer.write_batch(self._pa.record_batch(arrays, schema=self._arrow_schema))
+
+    def close(self) -> None:
+        if self._fmt == "csv":
+            self._file.close()
+        else:
+            self._writer.close()
+            if self._fmt == "arrow":
+                self._sink.close()
+        os.replace(self._tmp, self.path)
+
+
+# ------------------ SNAPSHOT EXPORT ------------------
+
+def _load_manifest(out_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_manifest(out_dir: str, manifest: dict) -> None:
+    # written last and atomically: parts of an interrupted run are not referenced (and are
+    # overwritten by the retry, which reuses the run number)
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export_snapshot(session, out_dir: str, transaction_tables: Dict[str, object], budget_table=None,
+                    fmt: str = "parquet", full: bool = False, user_id: Optional[int] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    progress: Optional[Callable[[str, int], None]] = None) -> ExportResult:
+    """Export (or append to) the snapshot in `out_dir`; see the module docstring.
+
+    `transaction_tables` maps names to tables with the TRANSACTION_COLUMNS (category as category_id).
+    With `user_id`, only that household's rows are exported (a snapshot keeps the scope it was
+    created with). Falls back to a full export when there is no snapshot yet, or when it was
+    written with other columns.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported export format {fmt!r}")
+    if fmt != "csv":
+        _pyarrow(fmt)
+    started = time.perf_counter()
+    manifest = _load_manifest(out_dir)
+    if manifest is not None and not full and (manifest["format"], manifest["user_id"]) != (fmt, user_id):
+        raise ValueError(f"the snapshot in {out_dir} is {manifest['format']} for user {manifest['user_id']}; "
+                         f"run a full export to replace it")
+    columns = [name for name, _ in TRANSACTION_COLUMNS]
+    if manifest is None or full or manifest.get("columns") != columns:
+        for name in (manifest or {}).get("tables", {}):
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+        manifest = {"format": fmt, "user_id": user_id, "columns": columns, "runs": 0, "tables": {}}
+        full = True
+    run = manifest["runs"] + 1
+    ext = FORMATS[fmt]
+    written, parts = {}, 0
+    date_at = columns.index("date")
+
+    for name, table in transaction_tables.items():
+        entry = manifest["tables"].setdefault(name, {"watermark": 0, "rows": 0, "parts": []})
+        writers: Dict[str, _PartWriter] = {}
+        rows_written = 0
+        try:
+            for rows in iter_chunks(session, table, TRANSACTION_COLUMNS, user_id, entry["watermark"], chunk_size):
+                by_month: Dict[str, List[tuple]] = {}
+                for r in rows:
+                    when = r[date_at]
+                    by_month.setdefault(when.strftime("%Y-%m") if when else "unknown", []).append(r)
+                for month, month_rows in by_month.items():
+                    writer = writers.get(month)
+                    if writer is None:
+                        path = os.path.join(out_dir, name, f"month={month}", f"part-{run:05d}{ext}")
+                        writer = writers[month] = _PartWriter(path, fmt, TRANSACTION_COLUMNS)
+                    writer.write(month_rows)
+                entry["watermark"] = rows[-1][0]
+                rows_written += len(rows)
+                if progress:
+                    progress(name, rows_written)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        for month, writer in sorted(writers.items()):
+            entry["parts"].append({"month": month, "path": os.path.relpath(writer.path, out_dir), "rows": writer.rows})
+        entry["rows"] += rows_written
+        written[name] = rows_written
+        parts += len(writers)
+
+    if budget_table is not None:
+        writer = _PartWriter(os.path.join(out_dir, budget_table.name, f"{budget_table.name}{ext}"), fmt, BUDGET_COLUMNS)
+        try:
+            for rows in iter_chunks(session, budget_table, BUDGET_COLUMNS, user_id, chunk_size=chunk_size):
+                writer.write(rows)
+        finally:
+            writer.close()
+        manifest["tables"][budget_table.name] = {
+            "rows": writer.rows, "parts": [{"month": None, "path": os.path.relpath(writer.path, out_dir), "rows": writer.rows}],
+        }
+        written[budget_table.name] = writer.rows
+        parts += 1
+
+    manifest["runs"] = run
+    manifest["exported_at"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    _save_manifest(out_dir, manifest)
+    return ExportResult(written, parts, time.perf_counter() - started, full)
+
+
+# ------------------ SNAPSHOT READS ------------------
+
+class Snapshot:
+    """Read-only access to an export directory (needs pyarrow)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        manifest = _load_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"no export snapshot in {path}")
+        self.manifest = manifest
+        self.format = manifest["format"]
+        self._pa = _pyarrow(self.format)
+
+    def tables(self) -> List[str]:
+        return sorted(self.manifest["tables"])
+
+    def months(self, table: str) -> List[str]:
+        return sorted({p["month"] for p in self.manifest["tables"][table]["parts"] if p["month"]})
+
+    def _read_part(self, path: str, columns):
+        pa = self._pa
+        if self.format == "arrow":
+            return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_table(path, memory_map=True)
+        import pyarrow.csv as pcsv
+        schema = _schema(pa, columns)
+        return pcsv.read_csv(path, convert_options=pcsv.ConvertOptions(column_types=schema))
+
+    def read(self, table: str, months: Optional[Iterable[str]] = None, user_id: Optional[int] = None):
+        """`table` as one Arrow table (with a `month` column for transaction tables)."""
+        import pyarrow.compute as pc
+        pa = self._pa
+        columns = BUDGET_COLUMNS if table == "budget" else TRANSACTION_COLUMNS
+        wanted = set(months) if months is not None else None
+        pieces = []
+        for part in self.manifest["tables"][table]["parts"]:
+            if wanted is not None and part["month"] not in wanted:
+                continue
+            t = self._read_part(os.path.join(self.path, part["path"]), columns)
+            if part["month"] is not None:
+                t = t.append_column("month", pa.array([part["month"]] * t.num_rows, type=pa.string()))
+            pieces.append(t)
+        if not pieces:
+            schema = _schema(pa, columns)
+            if table != "budget":
+                schema = schema.append(pa.field("month", pa.string()))
+            return schema.empty_table()
+        result = pa.concat_tables(pieces)
+        if user_id is not None:
+            result = result.filter(pc.equal(result["user_id"], user_id))
+        return result
+
+    def monthly_totals(self, table: str, user_id: Optional[int] = None):
+        """Arrow table of (month, category, total, count), newest month first."""
+        t = self.read(table, user_id=user_id)
+        grouped = t.group_by(["month", "category"]).aggregate([("amount", "sum"), ("amount", "count")])
+        grouped = grouped.select(["month", "category", "amount_sum", "amount_count"])
+        grouped = grouped.rename_columns(["month", "category", "total", "count"])
+        return grouped.sort_by([("month", "descending"), ("total", "descending")])
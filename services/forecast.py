@@ -0,0 +1,139 @@
+"""Vectorized per-category spending forecasts.
+
+History is loaded with one query over the per-category/per-month summary table into a dense
+(categories x months) matrix, and every statistic is computed for all categories at once,
+so runtime depends on the number of categories and months, not on the number of transactions.
+"""
+import calendar
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+ROLLING_WINDOW = 3  # months in the rolling average
+TREND_WINDOW = 12  # months used to fit the linear trend
+RUN_RATE_MIN_DAYS = 7  # days into the month before a category without history is extrapolated
+
+
+class History(NamedTuple):
+    categories: List[str]
+    first_month: int  # absolute month index (year * 12 + month - 1) of column 0
+    totals: np.ndarray  # shape (len(categories), n_months); last column is the current month
+
+
+class CategoryForecast(NamedTuple):
+    category: str
+    spent: float  # so far this month
+    rolling_avg: float  # mean of the last ROLLING_WINDOW complete months
+    trend: float  # least-squares slope, $/month
+    seasonal: float  # multiplicative factor for this calendar month (1.0 = no seasonality)
+    expected: float  # model estimate for a full month
+    projected: float  # projected month-end total
+    budget: Optional[float]
+    overspend: float  # projected - budget when positive
+
+
+def _month_index(key: str) -> int:
+    year, month = key.split('-')
+    return int(year) * 12 + int(month) - 1
+
+
+def load_history(session, summary_model, user_id: int, kind: str = 'expense', today: Optional[datetime] = None) -> History:
+    """Load one household's per-category monthly totals as a dense matrix ending at the current month."""
+    today = today or datetime.utcnow()
+    current = today.year * 12 + today.month - 1
+    t = summary_model.__table__
+    c = next(iter(t.c.category_id.foreign_keys)).column.table
+    rows = session.execute(
+        select(c.c.name, t.c.month, t.c.total).select_from(t.join(c, t.c.category_id == c.c.id))
+        .where(t.c.user_id == user_id, t.c.kind == kind)).all()
+    if not rows:
+        return History([], current, np.zeros((0, 1)))
+
+    cats = np.array([r[0] for r in rows], dtype=object)
+    months = np.fromiter((_month_index(r[1]) for r in rows), dtype=np.int64, count=len(rows))
+    totals = np.fromiter((r[2] or 0.0 for r in rows), dtype=np.float64, count=len(rows))
+
+    categories, cat_idx = np.unique(cats, return_inverse=True)
+    first = min(int(months.min()), current)
+    keep = months <= current  # ignore future-dated rows
+    matrix = np.zeros((len(categories), current - first + 1))
+    np.add.at(matrix, (cat_idx[keep], months[keep] - first), totals[keep])
+    return History([str(c) for c in categories], first, matrix)
+
+
+def _trend(complete: np.ndarray) -> np.ndarray:
+    # slope of an ordinary least-squares line through the last TREND_WINDOW months, per row
+    window = complete[:, -TREND_WINDOW:]
+    n = window.shape[1]
+    if n < 2:
+        return np.zeros(window.shape[0])
+    x = np.arange(n, dtype=np.float64)
+    x -= x.mean()
+    y = window - window.mean(axis=1, keepdims=True)
+    return (y @ x) / (x @ x)
+
+
+def _seasonality(complete: np.ndarray, first_month: int, calendar_month: int) -> np.ndarray:
+    # ratio of the average for this calendar month to the overall monthly average; needs
+    # at least two prior years of that month to be meaningful, otherwise 1.0
+    n = complete.shape[1]
+    if n == 0:
+        return np.ones(complete.shape[0])
+    month_of_year = (np.arange(n) + first_month) % 12
+    same = month_of_year == calendar_month
+    if same.sum() < 2:
+        return np.ones(complete.shape[0])
+    overall = complete.mean(axis=1)
+    seasonal = np.divide(complete[:, same].mean(axis=1), overall, out=np.ones_like(overall), where=overall > 0)
+    return np.clip(seasonal, 0.5, 2.0)
+
+
+def forecast(history: History, budgets: Dict[str, float], today: Optional[datetime] = None) -> List[CategoryForecast]:
+    """Project month-end spend for every category (plus budgeted categories with no history)."""
+    today = today or datetime.utcnow()
+    days = calendar.monthrange(today.year, today.month)[1]
+    elapsed = min(1.0, (today.day - 1 + today.hour / 24.0) / days)
+
+    complete = history.totals[:, :-1]
+    spent = history.totals[:, -1]
+    if complete.shape[1]:
+        rolling = complete[:, -ROLLING_WINDOW:].mean(axis=1)
+    else:
+        rolling = np.zeros(len(history.categories))
+    trend = _trend(complete)
+    seasonal = _seasonality(complete, history.first_month, today.month - 1)
+    if complete.shape[1]:
+        # next point on the trend line, scaled by seasonality
+        expected = np.maximum(0.0, rolling + trend) * seasonal
+        projected = spent + (1.0 - elapsed) * expected
+    elif elapsed * days >= RUN_RATE_MIN_DAYS:
+        # no complete month yet: extrapolate this month's run rate
+        expected = projected = spent / elapsed
+    else:
+        # too early for a run rate (rent paid on the 1st would project to ~30x itself), so
+        # count only what has been spent so far
+        expected = projected = spent.copy()
+    budget_arr = np.array([budgets.get(c, np.nan) for c in history.categories], dtype=np.float64)
+    overspend = np.where(np.isnan(budget_arr), 0.0, np.maximum(0.0, projected - np.nan_to_num(budget_arr)))
+
+    out = [
+        CategoryForecast(
+            category=cat,
+            spent=float(spent[i]),
+            rolling_avg=float(rolling[i]),
+            trend=float(trend[i]),
+            seasonal=float(seasonal[i]),
+            expected=float(expected[i]),
+            projected=float(projected[i]),
+            budget=None if np.isnan(budget_arr[i]) else float(budget_arr[i]),
+            overspend=float(overspend[i]),
+        )
+        for i, cat in enumerate(history.categories)
+    ]
+    known = set(history.categories)
+    for cat, limit in budgets.items():
+        if cat not in known:
+            out.append(CategoryForecast(cat, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, float(limit), 0.0))
+    return out
@@ -1,45 +1,153 @@
+import json
 import os
-import requests
-from typing import Dict, Any, Optional
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from services.explain_cache import DEFAULT_PATH as EXPLANATION_CACHE_DEFAULT_PATH, ExplanationCache, cache_key
+from services.http_client import get_client
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_ENDPOINT = os.getenv("GEMINI_ENDPOINT") or "https://generativelanguage.googleapis.com/v1beta2/models/text-bison-001:generate"
+# Optional server-sent-events endpoint (e.g. a ...:streamGenerateContent?alt=sse URL); when unset, streaming
+# callers get the whole completion as a single chunk.
+GEMINI_STREAM_ENDPOINT = os.getenv("GEMINI_STREAM_ENDPOINT")
+
+_explanations: Optional[ExplanationCache] = None
+_explanations_lock = threading.Lock()
+
+
+def explanation_cache() -> ExplanationCache:
+    global _explanations
+    if _explanations is None:
+        with _explanations_lock:
+            if _explanations is None:
+                _explanations = ExplanationCache(
+                    path=os.getenv("EXPLANATION_CACHE_PATH") or EXPLANATION_CACHE_DEFAULT_PATH,
+                    max_entries=int(os.getenv("EXPLANATION_CACHE_SIZE") or 1000),
+                    ttl=float(os.getenv("EXPLANATION_CACHE_TTL") or 7 * 86400),
+                )
+    return _explanations
+
+
+def _cache_get(key: str) -> Optional[str]:
+    # the cache is an optimization; a locked or unwritable file must not break the advisor
+    try:
+        return explanation_cache().get(key)
+    except sqlite3.Error:
+        return None
+
+
+def _cache_put(key: str, text: str, started: float, usage: Dict[str, int]) -> None:
+    try:
+        explanation_cache().put(key, text, (time.perf_counter() - started) * 1000.0,
+                                usage.get("prompt_tokens", 0), usage.get("output_tokens", 0))
+    except sqlite3.Error:
+        pass
+
+
+def _request_body(prompt: str) -> Dict[str, Any]:
+    return {
+        "prompt": {"text": prompt},
+        "temperature": 0.2,
+        "maxOutputTokens": 512
+    }
+
+
+def _extract_text(data: Any) -> Optional[str]:
+    # attempt to extract generated text from several possible shapes
+    if isinstance(data, dict):
+        # common field: 'candidates' -> [{'content': '...'}]
+        cands = data.get('candidates') or data.get('outputs') or []
+        if isinstance(cands, list) and len(cands) > 0:
+            first = cands[0]
+            if isinstance(first, dict):
+                content = first.get('content')
+                # generateContent shape: {'content': {'parts': [{'text': '...'}]}}
+                if isinstance(content, dict):
+                    parts = content.get('parts') or []
+                    return "".join(p.get('text', '') for p in parts if isinstance(p, dict)) or None
+                return content or first.get('text') or None
+        # fallback to 'output' or direct 'text'
+        if 'output' in data and isinstance(data['output'], str):
+            return data['output']
+        if 'text' in data and isinstance(data['text'], str):
+            return data['text']
+    return None
+
+
+def _extract_usage(data: Any, prompt: str, text: str) -> Dict[str, int]:
+    meta = data.get('usageMetadata') if isinstance(data, dict) else None
+    if isinstance(meta, dict) and 'promptTokenCount' in meta:
+        return {"prompt_tokens": int(meta.get('promptTokenCount') or 0),
+                "output_tokens": int(meta.get('candidatesTokenCount') or 0)}
+    # older endpoints don't report usage; ~4 characters per token is the usual estimate
+    return {"prompt_tokens": len(prompt) // 4, "output_tokens": len(text) // 4}
 
 
-def _call_gemini(prompt: str, timeout: int = 10) -> Optional[str]:
+def _timeouts(timeout: Optional[float]) -> Dict[str, Any]:
+    # `timeout` is the whole call's budget, retries included: it caps the read timeout and sets
+    # the deadline every attempt shares; the connect timeout stays short
+    if not timeout:
+        return {}
+    client = get_client()
+    return {"timeout": (client.timeout[0], timeout), "deadline": time.monotonic() + timeout}
+
+
+def _generate(prompt: str, timeout: Optional[float] = None) -> Optional[Tuple[str, Dict[str, int]]]:
+    """Return (text, token usage) for `prompt`, or None when Gemini is unavailable or fails."""
     if not GEMINI_API_KEY:
         return None
     try:
-        body = {
-            "prompt": {"text": prompt},
-            "temperature": 0.2,
-            "maxOutputTokens": 512
-        }
         params = {"key": GEMINI_API_KEY}
-        resp = requests.post(GEMINI_ENDPOINT, params=params, json=body, timeout=timeout)
+        resp = get_client().post(GEMINI_ENDPOINT, params=params, json=_request_body(prompt), **_timeouts(timeout))
         resp.raise_for_status()
         data = resp.json()
-        # attempt to extract generated text from several possible shapes
-        if isinstance(data, dict):
-            # common field: 'candidates' -> [{'content': '...'}]
-            cands = data.get('candidates') or data.get('outputs') or []
-            if isinstance(cands, list) and len(cands) > 0:
-                first = cands[0]
-                if isinstance(first, dict):
-                    return first.get('content') or first.get('text') or None
-            # fallback to 'output' or direct 'text'
-            if 'output' in data and isinstance(data['output'], str):
-                return data['output']
-            if 'text' in data and isinstance(data['text'], str):
-                return data['text']
-        return None
+        text = _extract_text(data)
+        if not text:
+            return None
+        return text, _extract_usage(data, prompt, text)
     except Exception:
         return None
 
 
-def compose_explanation(needs: Dict[str, Any], listing: Optional[Dict], suggested_budgets: Dict[str, float], details: Dict[str, Any]) -> str:
+def _stream_gemini(prompt: str, timeout: Optional[float] = None, usage: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Yield text chunks from GEMINI_STREAM_ENDPOINT as its SSE `data:` events arrive.
+
+    Stops quietly on any error, so callers should check whether anything was yielded. If
+    `usage` is given it receives the last reported token usage and `complete=True` once the
+    stream ended normally.
+    """
+    if not GEMINI_API_KEY or not GEMINI_STREAM_ENDPOINT:
+        return
+    try:
+        params = {"key": GEMINI_API_KEY}
+        resp = get_client().post(GEMINI_STREAM_ENDPOINT, params=params, json=_request_body(prompt),
+                                 stream=True, **_timeouts(timeout))
+        with resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                data = json.loads(payload)
+                if usage is not None and isinstance(data, dict) and 'usageMetadata' in data:
+                    usage.update(_extract_usage(data, prompt, ""))
+                text = _extract_text(data)
+                if text:
+                    yield text
+        if usage is not None:
+            usage["complete"] = True
+    except Exception:
+        return
+
+
+def _build_prompt(needs: Dict[str, Any], listing: Optional[Dict], suggested_budgets: Dict[str, float], details: Dict[str, Any]) -> str:
     # Build a short prompt asking Gemini to explain the recommendation.
-    prompt = (
+    return (
         "You are a helpful financial assistant. Given the family's needs and a housing listing, "
         "write a brief, user-facing explanation describing why this listing meets the minimum requirements, "
         "and list proposed per-category budget adjustments in one short paragraph.\n\n"
@@ -49,9 +157,59 @@ def compose_explanation(needs: Dict[str, Any], listing: Optional[Dict], suggeste
         f"Suggested budgets: {suggested_budgets}.\n"
         "Keep it concise and actionable."
     )
-    gen = _call_gemini(prompt)
-    if gen:
-        return gen
+
+
+def compose_explanation(needs: Dict[str, Any], listing: Optional[Dict], suggested_budgets: Dict[str, float], details: Dict[str, Any],
+                        timeout: Optional[float] = None) -> str:
+    # Only real Gemini completions are cached; without a key the fallback is cheaper than a lookup.
+    key = cache_key(needs, listing, suggested_budgets, details) if GEMINI_API_KEY else None
+    if key:
+        cached = _cache_get(key)
+        if cached:
+            return cached
+    prompt = _build_prompt(needs, listing, suggested_budgets, details)
+    started = time.perf_counter()
+    result = _generate(prompt, timeout=timeout)
+    if result:
+        text, usage = result
+        if key:
+            _cache_put(key, text, started, usage)
+        return text
+    return fallback_explanation(needs, listing, suggested_budgets)
+
+
+def stream_explanation(needs: Dict[str, Any], listing: Optional[Dict], suggested_budgets: Dict[str, float], details: Dict[str, Any],
+                       timeout: Optional[float] = None) -> Iterator[str]:
+    """Like compose_explanation(), but yields the text incrementally as Gemini produces it.
+
+    A cached explanation is yielded whole; a fully streamed one is added to the cache.
+    """
+    if not (GEMINI_API_KEY and GEMINI_STREAM_ENDPOINT):
+        yield compose_explanation(needs, listing, suggested_budgets, details, timeout=timeout)
+        return
+    key = cache_key(needs, listing, suggested_budgets, details)
+    cached = _cache_get(key)
+    if cached:
+        yield cached
+        return
+    prompt = _build_prompt(needs, listing, suggested_budgets, details)
+    started = time.perf_counter()
+    usage: Dict[str, Any] = {}
+    chunks = []
+    for chunk in _stream_gemini(prompt, timeout=timeout, usage=usage):
+        chunks.append(chunk)
+        yield chunk
+    if not chunks:
+        yield fallback_explanation(needs, listing, suggested_budgets)
+        return
+    if usage.get("complete"):
+        text = "".join(chunks)
+        if "prompt_tokens" not in usage:
+            usage.update(_extract_usage(None, prompt, text))
+        _cache_put(key, text, started, usage)
+
+
+def fallback_explanation(needs: Dict[str, Any], listing: Optional[Dict], suggested_budgets: Dict[str, float]) -> str:
     # Fallback simple explanation
     expl = "Recommendation:\n"
     if listing:
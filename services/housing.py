@@ -1,10 +1,38 @@
 import os
-import requests
-from typing import List, Dict, Optional
+import threading
+from typing import List, Dict, Optional, Tuple
+
+from services.cache import TTLCache
+from services.http_client import get_client
+from services.listing_store import DEFAULT_PATH as LISTINGS_DEFAULT_PATH, ListingRefresher, ListingStore
 
 RENTCAST_API_KEY = os.getenv("RENTCAST_API_KEY") or os.getenv("RENTCAST_KEY")
 RENTCAST_BASE_URL = os.getenv("RENTCAST_BASE_URL")
 
+# Identical searches within the TTL are answered from memory; concurrent identical searches share one upstream call.
+_cache = TTLCache(
+    maxsize=int(os.getenv("HOUSING_CACHE_SIZE") or 256),
+    ttl=float(os.getenv("HOUSING_CACHE_TTL") or 600),
+)
+
+# Local listing store: each market is fetched in bulk (LISTINGS_FETCH_LIMIT listings within
+# LISTINGS_FETCH_RADIUS miles) and refreshed every LISTINGS_REFRESH_INTERVAL seconds (0 disables
+# the background refresh; `flask listings refresh` can run from cron instead).
+LISTINGS_FETCH_LIMIT = int(os.getenv("LISTINGS_FETCH_LIMIT") or 500)
+LISTINGS_FETCH_RADIUS = float(os.getenv("LISTINGS_FETCH_RADIUS") or 25)
+LISTINGS_DEFAULT_RADIUS = float(os.getenv("LISTINGS_DEFAULT_RADIUS") or 10)
+LISTINGS_REFRESH_INTERVAL = float(os.getenv("LISTINGS_REFRESH_INTERVAL") or 6 * 3600)
+
+# A market's searches start from its geocoded location. GEOCODER_URL is a Nominatim-compatible
+# search endpoint (GET ?q=...&format=json&limit=1 -> [{"lat": ..., "lon": ...}]); without it
+# the median of the market's listings stands in for the location.
+GEOCODER_URL = os.getenv("GEOCODER_URL")
+_geocode_cache = TTLCache(maxsize=1024, ttl=float(os.getenv("GEOCODER_CACHE_TTL") or 7 * 24 * 3600))
+
+_store: Optional[ListingStore] = None
+_refresher: Optional[ListingRefresher] = None
+_store_lock = threading.Lock()
+
 
 def _mock_results(location: Optional[str], max_results: int = 5) -> List[Dict]:
     # Small mocked dataset for local development when no Rentcast URL is configured.
@@ -29,10 +57,51 @@ def search_housing(location: Optional[str], radius: Optional[int] = None, min_be
     - Read `RENTCAST_API_KEY` and `RENTCAST_BASE_URL` from environment; do NOT hardcode keys.
     - If `RENTCAST_BASE_URL` is provided, performs a GET request to `{base}/search` with query params.
     - Otherwise returns a small mocked list suitable for demo/testing.
+    - Upstream results are cached per normalized parameter set (see `cache_stats()`).
     """
     if not RENTCAST_API_KEY or not RENTCAST_BASE_URL:
         return _mock_results(location, max_results=max_results)
 
+    key = _cache_key(location, radius, min_beds, min_baths, min_sqft, max_results)
+    try:
+        listings = _cache.get_or_compute(
+            key, lambda: tuple(_fetch_listings(location, radius, min_beds, min_baths, min_sqft, max_results))
+        )
+        return list(listings)
+    except Exception:
+        # On any error, return a mock result rather than failing the entire request (errors are not cached).
+        return _mock_results(location, max_results=max_results)
+
+
+def _as_int(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_float(value) -> Optional[float]:
+    # upstream prices arrive as 1450, "1450" or "$1,450"
+    if isinstance(value, str):
+        value = value.replace("$", "").replace(",", "").strip()
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_location(location: Optional[str]) -> Optional[str]:
+    # so "Austin,  TX" and "austin, tx" share a cache entry and a market
+    return " ".join((location or "").split()).lower() or None
+
+
+def _cache_key(location: Optional[str], radius, min_beds, min_baths, min_sqft, max_results) -> Tuple:
+    loc = normalize_location(location)
+    return (loc, _as_int(radius), _as_int(min_beds), _as_int(min_baths), _as_int(min_sqft), _as_int(max_results) or 10)
+
+
+def _fetch_listings(location: Optional[str], radius: Optional[int], min_beds: int, min_baths: int,
+                    min_sqft: int, max_results: int) -> List[Dict]:
     params = {
         "q": location,
         "radius": radius,
@@ -47,25 +116,120 @@ def search_housing(location: Optional[str], radius: Optional[int] = None, min_be
         "Accept": "application/json",
     }
 
-    try:
-        url = RENTCAST_BASE_URL.rstrip("/") + "/search"
-        resp = requests.get(url, params={k: v for k, v in params.items() if v is not None}, headers=headers, timeout=10)
+    url = RENTCAST_BASE_URL.rstrip("/") + "/search"
+    resp = get_client().get(url, params={k: v for k, v in params.items() if v is not None}, headers=headers)
+    resp.raise_for_status()
+    data = resp.json()
+
+    # Try common field names; gracefully degrade to raw items if structure differs.
+    items = data.get("listings") or data.get("results") or (data if isinstance(data, list) else [])
+    out = []
+    for it in items[:max_results]:
+        out.append({
+            "price": it.get("price") or it.get("rent"),
+            "beds": it.get("beds") or it.get("bedrooms"),
+            "baths": it.get("baths") or it.get("bathrooms"),
+            "sqft": it.get("sqft") or it.get("size"),
+            "address": it.get("address") or it.get("location") or it.get("display_address"),
+            "url": it.get("url") or it.get("detail_url") or it.get("listing_url"),
+            "lat": _as_float(it.get("latitude") or it.get("lat")),
+            "lon": _as_float(it.get("longitude") or it.get("lng") or it.get("lon")),
+            "id": it.get("id"),
+        })
+    return out
+
+
+def cache_stats() -> Dict:
+    """Hit/miss/coalesced counters for the housing search cache, plus the local listing store."""
+    stats = _cache.stats()
+    if _store is not None:
+        stats["local_store"] = dict(_store.stats(), refreshes=_refresher.refreshes, refresh_failures=_refresher.failures)
+    return stats
+
+
+# ------------------ LOCAL LISTING STORE ------------------
+
+def local_store_enabled() -> bool:
+    # the mock dataset has nothing worth indexing
+    return bool(RENTCAST_API_KEY and RENTCAST_BASE_URL)
+
+
+def listing_store() -> ListingStore:
+    global _store, _refresher
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ListingStore(os.getenv("LISTINGS_DB_PATH") or LISTINGS_DEFAULT_PATH)
+                _refresher = ListingRefresher(store, refresh_market, interval=LISTINGS_REFRESH_INTERVAL)
+                _store = store
+    return _store
+
+
+def listing_refresher() -> ListingRefresher:
+    listing_store()
+    return _refresher
+
+
+def geocode(location: Optional[str]) -> Optional[Tuple[float, float]]:
+    """(lat, lon) of `location` from GEOCODER_URL, or None if it is not set or finds nothing.
+
+    Results (including "not found") are cached per normalized location; errors propagate.
+    """
+    market = normalize_location(location)
+    if not GEOCODER_URL or not market:
+        return None
+
+    def fetch():
+        resp = get_client().get(GEOCODER_URL, params={"q": market, "format": "json", "limit": 1},
+                                headers={"Accept": "application/json", "User-Agent": "finance-advisor"})
         resp.raise_for_status()
-        data = resp.json()
-
-        # Try common field names; gracefully degrade to raw items if structure differs.
-        items = data.get("listings") or data.get("results") or (data if isinstance(data, list) else [])
-        out = []
-        for it in items[:max_results]:
-            out.append({
-                "price": it.get("price") or it.get("rent"),
-                "beds": it.get("beds") or it.get("bedrooms"),
-                "baths": it.get("baths") or it.get("bathrooms"),
-                "sqft": it.get("sqft") or it.get("size"),
-                "address": it.get("address") or it.get("location") or it.get("display_address"),
-                "url": it.get("url") or it.get("detail_url") or it.get("listing_url"),
-            })
-        return out
-    except Exception:
-        # On any error, return a mock result rather than failing the entire request.
-        return _mock_results(location, max_results=max_results)
+        hits = resp.json()
+        if not hits:
+            return None
+        return float(hits[0]["lat"]), float(hits[0]["lon"])
+
+    return _geocode_cache.get_or_compute(market, fetch)
+
+
+def refresh_market(location: str, radius: Optional[float] = None) -> int:
+    """Fetch every listing in `location` from upstream and replace the market in the local store."""
+    market = normalize_location(location)
+    radius = radius or LISTINGS_FETCH_RADIUS
+    center = geocode(market)
+    fetched = _fetch_listings(location, int(radius), 0, 0, 0, LISTINGS_FETCH_LIMIT)
+    rows = []
+    for it in fetched:
+        key = it.get("id") or it.get("url") or it.get("address")
+        if not key:
+            continue
+        rows.append(dict(it, source_key=str(key), price=_as_float(it.get("price")), beds=_as_int(it.get("beds")),
+                         baths=_as_float(it.get("baths")), sqft=_as_int(it.get("sqft"))))
+    return listing_store().replace_market(market, rows, radius=radius, center=center)
+
+
+def prefetch_market(location: Optional[str]) -> None:
+    """Queue a background ingest of `location` if the local store does not have it yet."""
+    market = normalize_location(location)
+    if market and local_store_enabled() and listing_store().market(market) is None:
+        _refresher.schedule(market, None)
+
+
+def local_search(location: Optional[str], radius: Optional[float] = None, min_beds: int = 1, min_baths: int = 1,
+                 min_sqft: int = 300, max_results: int = 10) -> Optional[List[Dict]]:
+    """Cheapest listings in the local store within `radius` miles that meet the minimums.
+
+    Returns None when the market has not been ingested yet (a refresh is queued), so the
+    caller can fall back to search_housing(); otherwise no network call is made.
+    """
+    market = normalize_location(location)
+    if not market or not local_store_enabled():
+        return None
+    store = listing_store()
+    _refresher.ensure_started()
+    info = store.market(market)
+    if info is None or info["lat"] is None:
+        _refresher.schedule(market, None)
+        return None
+    radius = float(radius) if radius else LISTINGS_DEFAULT_RADIUS
+    return store.cheapest(info["lat"], info["lon"], radius, _as_int(min_beds) or 0, _as_float(min_baths) or 0,
+                          _as_int(min_sqft) or 0, limit=max_results)
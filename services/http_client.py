@@ -0,0 +1,219 @@
+"""Shared HTTP client for the external services (Rentcast, Gemini).
+
+One pooled, keep-alive `requests.Session` per process with:
+- per-host connection pools (HTTP_POOL_SIZE default, HTTP_POOL_SIZES="host=size,..." overrides),
+- separate connect/read timeouts (HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT),
+- bounded exponential backoff with full jitter on connection errors and 429/5xx,
+- a per-host circuit breaker, so a slow or failing upstream fails fast instead of holding
+  a Flask worker for the full timeout on every request.
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.instrumentation import record as record_timing
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _parse_pool_sizes(spec: Optional[str]) -> Dict[str, int]:
+    sizes = {}
+    for part in (spec or "").split(","):
+        host, _, size = part.strip().partition("=")
+        if host and size.isdigit():
+            sizes[host.lower()] = int(size)
+    return sizes
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failed requests; after `reset_timeout`
+    seconds one trial request is let through (half-open) and its outcome closes or re-opens it."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self._clock() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._clock() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self._clock()
+
+
+class HttpClient:
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 10.0, max_retries: int = 2,
+                 backoff_base: float = 0.2, backoff_cap: float = 2.0, pool_size: int = 10,
+                 pool_sizes: Optional[Dict[str, int]] = None, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.pool_size = pool_size
+        self.pool_sizes = pool_sizes or {}
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._mounted = set()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _prepare_host(self, url: str) -> Tuple[str, CircuitBreaker]:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        prefix = f"{parts.scheme}://{parts.netloc}/"
+        with self._lock:
+            if prefix not in self._mounted:
+                size = self.pool_sizes.get(host, self.pool_size)
+                # retries are handled in request() so backoff and the breaker see every attempt
+                self.session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=0))
+                self._mounted.add(prefix)
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return host, breaker
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _retry_delay(self, attempt: int, deadline: Optional[float]) -> Optional[float]:
+        # seconds to back off before the next attempt, or None when there is no next attempt
+        if attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def request(self, method: str, url: str, timeout=None, deadline: Optional[float] = None,
+                **kwargs) -> requests.Response:
+        """Send a request through the shared pool; raises CircuitOpenError while the host is tripped.
+
+        Returns the final response (which may still be an error status after retries are
+        exhausted) or raises the last error. With `deadline` (a time.monotonic() value) every
+        attempt shares one budget: each attempt's timeouts are cut to the time left, no retry
+        starts that would begin after it, and requests.Timeout is raised if it has already
+        passed. The breaker sees the request once, retries included: an error status after
+        the last retry or any exception counts as one failure.
+        """
+        host, breaker = self._prepare_host(url)
+        timeout = timeout or self.timeout
+        if deadline is not None and deadline <= time.monotonic():
+            raise requests.Timeout(f"deadline passed before {method} {host}")
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open for {host}")
+        try:
+            for attempt in range(self.max_retries + 1):
+                attempt_timeout = timeout
+                if deadline is not None:
+                    left = max(deadline - time.monotonic(), 0.001)
+                    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+                    attempt_timeout = (min(connect, left), min(read, left))
+                started = time.perf_counter()
+                try:
+                    resp = self.session.request(method, url, timeout=attempt_timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    record_timing("http", (time.perf_counter() - started) * 1000.0)
+                    delay = self._retry_delay(attempt, deadline)
+                    if delay is None:
+                        raise
+                else:
+                    record_timing("http", (time.perf_counter() - started) * 1000.0)
+                    if resp.status_code not in RETRY_STATUSES:
+                        breaker.record_success()
+                        return resp
+                    delay = self._retry_delay(attempt, deadline)
+                    if delay is None:
+                        breaker.record_failure()
+                        return resp
+                    resp.close()
+                time.sleep(delay)
+        except BaseException:
+            # whatever went wrong (InvalidURL, ChunkedEncodingError, ...), a half-open trial
+            # must end, or the breaker would never let another call through
+            breaker.record_failure()
+            raise
+        raise AssertionError("unreachable")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def breaker_states(self) -> Dict[str, Dict]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {host: {"state": b.state, "failures": b.failures} for host, b in breakers.items()}
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Process-wide client, configured from the environment on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient(
+                    connect_timeout=_env_float("HTTP_CONNECT_TIMEOUT", 3.05),
+                    read_timeout=_env_float("HTTP_READ_TIMEOUT", 10.0),
+                    max_retries=int(_env_float("HTTP_MAX_RETRIES", 2)),
+                    backoff_base=_env_float("HTTP_BACKOFF_BASE", 0.2),
+                    backoff_cap=_env_float("HTTP_BACKOFF_CAP", 2.0),
+                    pool_size=int(_env_float("HTTP_POOL_SIZE", 10)),
+                    pool_sizes=_parse_pool_sizes(os.getenv("HTTP_POOL_SIZES")),
+                    failure_threshold=int(_env_float("HTTP_BREAKER_THRESHOLD", 5)),
+                    reset_timeout=_env_float("HTTP_BREAKER_RESET", 30.0),
+                )
+    return _client
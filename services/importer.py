@@ -0,0 +1,398 @@
+"""Streaming CSV/OFX import of bank exports into Expense/Income.
+
+Parsers are generators over a text stream, so only the current batch of rows is ever held
+in memory. Rows are written with a few multi-row INSERTs and one commit per batch.
+"""
+import csv
+import re
+import time
+from itertools import chain
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, TextIO, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import services.data_version as data_version
+import services.recurring as recurring
+import services.summary as summary
+
+DEFAULT_BATCH_SIZE = 5000
+IMPORT_CACHE_KIB = 256 * 1024
+DEFAULT_EXPENSE_CATEGORY = "Uncategorized"
+DEFAULT_INCOME_CATEGORY = "Other Income"
+MAX_DESCRIPTION = 200  # the description column's length
+ROWS_PER_STATEMENT = 1000  # 5 bound parameters per row, well under SQLite's variable limit
+MAX_REPORTED_SKIPS = 20  # skip reasons kept in an ImportResult
+
+CSV_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y", "%m/%d/%y", "%d.%m.%Y", "%Y/%m/%d")
+
+# header aliases seen in common bank exports, compared lower-cased
+DATE_COLUMNS = ("date", "posted date", "transaction date", "posting date")
+AMOUNT_COLUMNS = ("amount", "transaction amount", "value")
+DEBIT_COLUMNS = ("debit", "withdrawal", "withdrawals")
+CREDIT_COLUMNS = ("credit", "deposit", "deposits")
+CATEGORY_COLUMNS = ("category", "type of transaction")
+TYPE_COLUMNS = ("type", "transaction type")
+DESCRIPTION_COLUMNS = ("description", "payee", "merchant", "name", "memo")
+
+
+class ImportRow(NamedTuple):
+    kind: str  # expense / income
+    date: datetime
+    amount: float  # always positive; `kind` carries the sign
+    category: Optional[str]
+    description: Optional[str]
+
+
+class ImportResult(NamedTuple):
+    rows: int
+    expenses: int
+    incomes: int
+    skipped: int
+    seconds: float
+    errors: Tuple[str, ...] = ()  # why rows were skipped (the first MAX_REPORTED_SKIPS)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+
+def detect_format(filename: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ofx", ".qfx")):
+        return "ofx"
+    return "csv"
+
+
+def _parse_amount(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    s = value.strip().replace(",", "").replace("$", "")
+    if not s:
+        return None
+    if s.startswith("(") and s.endswith(")"):
+        s = "-" + s[1:-1]
+    return float(s)
+
+
+class _DateParser:
+    """strptime is the hot spot of a large import; bank exports repeat the same date on many
+    rows, so memoize by raw string and try the last format that worked first."""
+
+    MAX_CACHED = 50_000
+
+    def __init__(self, date_format: Optional[str] = None):
+        self.formats = [date_format] if date_format else list(CSV_DATE_FORMATS)
+        self.cache: Dict[str, datetime] = {}
+
+    def __call__(self, value: str) -> datetime:
+        cached = self.cache.get(value)
+        if cached is not None:
+            return cached
+        parsed = self._parse(value.strip())
+        if len(self.cache) >= self.MAX_CACHED:
+            self.cache.clear()
+        self.cache[value] = parsed
+        return parsed
+
+    def _parse(self, value: str) -> datetime:
+        for i, fmt in enumerate(self.formats):
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if i:
+                self.formats.insert(0, self.formats.pop(i))
+            return parsed
+        return datetime.fromisoformat(value)
+
+
+def _pick(columns: Dict[str, int], aliases) -> Optional[int]:
+    for alias in aliases:
+        if alias in columns:
+            return columns[alias]
+    return None
+
+
+def iter_csv_rows(stream: TextIO, date_format: Optional[str] = None,
+                  on_skip: Optional[Callable[[int, str], None]] = None) -> Iterator[ImportRow]:
+    """Yield ImportRows from a CSV export with a header row.
+
+    Signed amounts are negative for expenses; separate debit/credit columns are also accepted.
+    An explicit type column ("expense"/"income"/"debit"/"credit") overrides the sign.
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None) or []
+    # plain csv.reader with column positions; DictReader builds a dict per row
+    columns = {name.strip().lower(): pos for pos, name in enumerate(header)}
+    date_col = _pick(columns, DATE_COLUMNS)
+    amount_col = _pick(columns, AMOUNT_COLUMNS)
+    debit_col = _pick(columns, DEBIT_COLUMNS)
+    credit_col = _pick(columns, CREDIT_COLUMNS)
+    category_col = _pick(columns, CATEGORY_COLUMNS)
+    type_col = _pick(columns, TYPE_COLUMNS)
+    desc_col = _pick(columns, DESCRIPTION_COLUMNS)
+    parse_date = _DateParser(date_format)
+    if date_col is None or (amount_col is None and debit_col is None and credit_col is None):
+        raise ValueError("CSV needs a date column and an amount (or debit/credit) column")
+
+    def field(rec, pos):
+        if pos is None or pos >= len(rec):
+            return None
+        return rec[pos].strip() or None
+
+    for line_no, rec in enumerate(reader, start=2):
+        if not rec:
+            continue
+        try:
+            date = parse_date(rec[date_col])
+            if amount_col is not None:
+                amount = _parse_amount(field(rec, amount_col))
+            else:
+                debit = _parse_amount(field(rec, debit_col))
+                credit = _parse_amount(field(rec, credit_col))
+                amount = (credit or 0.0) - abs(debit or 0.0)
+            if amount is None:
+                raise ValueError("missing amount")
+            kind = "expense" if amount < 0 else "income"
+            declared = (field(rec, type_col) or "").lower()
+            if declared in ("expense", "debit"):
+                kind = "expense"
+            elif declared in ("income", "credit"):
+                kind = "income"
+            yield ImportRow(kind, date, abs(amount), field(rec, category_col), field(rec, desc_col))
+        except (ValueError, TypeError, IndexError) as e:
+            if on_skip:
+                on_skip(line_no, str(e))
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _parse_ofx_date(value: str) -> datetime:
+    # YYYYMMDD[HHMMSS[.XXX]][[gmt offset:tz name]]
+    digits = re.match(r"\d+", value.strip())
+    if not digits:
+        raise ValueError(f"bad OFX date {value!r}")
+    d = digits.group(0)
+    if len(d) >= 14:
+        return datetime.strptime(d[:14], "%Y%m%d%H%M%S")
+    return datetime.strptime(d[:8], "%Y%m%d")
+
+
+def iter_ofx_rows(stream: TextIO, on_skip: Optional[Callable[[int, str], None]] = None) -> Iterator[ImportRow]:
+    """Yield ImportRows from the <STMTTRN> records of an OFX/QFX file (SGML or XML flavour).
+
+    The file is tokenized line by line, so only the current transaction is buffered.
+    """
+    current: Optional[Dict[str, str]] = None
+    count = 0
+    for line in stream:
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing and current is not None:
+                    count += 1
+                    try:
+                        amount = _parse_amount(current.get("TRNAMT"))
+                        if amount is None:
+                            raise ValueError("missing TRNAMT")
+                        yield ImportRow(
+                            kind="expense" if amount < 0 else "income",
+                            date=_parse_ofx_date(current.get("DTPOSTED", "")),
+                            amount=abs(amount),
+                            category=None,
+                            description=current.get("NAME") or current.get("MEMO"),
+                        )
+                    except (ValueError, TypeError) as e:
+                        if on_skip:
+                            on_skip(count, str(e))
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+class CategoryMapper:
+    """Resolve an import row to an app category name.
+
+    Order: explicit category column matched against existing names (case-insensitive),
+    then `rules` ({keyword: category}) matched against the description, then the default.
+    """
+
+    def __init__(self, known: Iterable[str], rules: Optional[Dict[str, str]] = None,
+                 default_expense: str = DEFAULT_EXPENSE_CATEGORY, default_income: str = DEFAULT_INCOME_CATEGORY):
+        self.known = {name.lower(): name for name in known}
+        self.rules = [(k.lower(), v) for k, v in (rules or {}).items()]
+        self.defaults = {"expense": default_expense, "income": default_income}
+
+    def __call__(self, row: ImportRow) -> str:
+        if row.category:
+            return self.known.get(row.category.lower(), row.category)
+        if row.description:
+            desc = row.description.lower()
+            for keyword, category in self.rules:
+                if keyword in desc:
+                    return category
+        return self.defaults[row.kind]
+
+
+def import_rows(session, rows: Iterable[ImportRow], models: Dict[str, object], summary_model, category_model,
+                user_id: int, mapper: CategoryMapper, batch_size: int = DEFAULT_BATCH_SIZE,
+                progress: Optional[Callable[[int, float], None]] = None, series_model=None,
+                on_skip: Optional[Callable[[ImportRow, str], None]] = None) -> ImportResult:
+    """Insert `rows` for household `user_id` in batches of `batch_size`, committing once per batch.
+
+    Each batch is a few multi-row INSERTs per table plus one summary upsert (and, with
+    `series_model`, one recurring-series upsert), so the per-row cost is a parameter tuple
+    rather than an ORM object and a round-trip. Category names are resolved
+    to ids once per distinct name; names the household does not have yet are created as they
+    first appear (with the type of that row), so the rows can reference them. A row whose
+    category is of the other type (income mapped to "Food") is skipped and reported to `on_skip`.
+    """
+    tables = {kind: model.__table__ for kind, model in models.items()}
+    conn = session.connection()
+    # bypass per-row SQLAlchemy parameter processing; dates go through the column's own
+    # bind processor once per distinct value so the stored format matches ORM-written rows.
+    # Rows go in as multi-row INSERTs: the full-text index's triggers run inside the statement,
+    # and FTS5 writes out its pending terms at every statement, so per-row statements cost ~5x.
+    def insert_sql(table_name: str, n: int) -> str:
+        return (f"INSERT INTO {table_name} (user_id, category_id, amount, date, description) VALUES "
+                + ", ".join(["(?, ?, ?, ?, ?)"] * n))
+
+    full_sql = {kind: insert_sql(table.name, ROWS_PER_STATEMENT) for kind, table in tables.items()}
+    bind_date = next(iter(tables.values())).c.date.type.bind_processor(conn.dialect) or str
+    date_cache: Dict[datetime, Tuple[str, str]] = {}
+    categories = category_model.__table__
+    category_ids: Dict[str, Tuple[int, str]] = {
+        name: (cid, kind) for name, cid, kind in session.execute(
+            select(categories.c.name, categories.c.id, categories.c.type).where(categories.c.user_id == user_id))}
+
+    def category_id(name: str, kind: str) -> Optional[int]:
+        # None if the household's `name` category is not a `kind` category
+        found = category_ids.get(name)
+        if found is None:
+            stmt = sqlite_insert(categories).on_conflict_do_nothing(index_elements=["user_id", "name"])
+            session.execute(stmt, {"user_id": user_id, "name": name, "type": kind, "is_need": False})
+            found = category_ids[name] = tuple(session.execute(
+                select(categories.c.id, categories.c.type)
+                .where(categories.c.user_id == user_id, categories.c.name == name)).one())
+        cid, category_kind = found
+        return cid if category_kind == kind else None
+
+    started = time.perf_counter()
+    counts = {"expense": 0, "income": 0}
+    skipped = 0
+    pending: Dict[str, list] = {kind: [] for kind in tables}
+    deltas: summary.Deltas = {}
+    changes: recurring.Changes = {}
+    buffered = 0
+    # a larger page cache keeps the (category_id, date) / (user_id, date, id) index pages hot
+    # while a batch is written. The connection goes back to the pool at every commit, so each
+    # batch widens the cache of the connection it runs on and puts it back before committing.
+    widened: list = []
+
+    def widen_cache():
+        raw = session.connection().connection.dbapi_connection
+        widened.append((raw, raw.execute("PRAGMA cache_size").fetchone()[0]))
+        raw.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KIB}")
+
+    def restore_cache():
+        while widened:
+            raw, previous = widened.pop()
+            raw.execute(f"PRAGMA cache_size = {previous}")
+
+    def flush():
+        for kind, batch in pending.items():
+            if batch:
+                conn = session.connection()
+                for start in range(0, len(batch), ROWS_PER_STATEMENT):
+                    chunk = batch[start:start + ROWS_PER_STATEMENT]
+                    sql = full_sql[kind] if len(chunk) == ROWS_PER_STATEMENT else insert_sql(tables[kind].name, len(chunk))
+                    conn.exec_driver_sql(sql, tuple(chain.from_iterable(chunk)))
+                data_version.mark(session, tables[kind].name, scope=user_id)
+                counts[kind] += len(batch)
+                batch.clear()
+        summary.apply_deltas(session, summary_model, deltas)
+        deltas.clear()
+        if series_model is not None:
+            recurring.apply_changes(session, series_model, models["expense"], changes)
+            changes.clear()
+        restore_cache()
+        session.commit()
+        if progress:
+            progress(counts["expense"] + counts["income"], time.perf_counter() - started)
+
+    try:
+        for row in rows:
+            if not widened:
+                widen_cache()
+            name = mapper(row)
+            category = category_id(name, row.kind)
+            if category is None:
+                skipped += 1
+                if on_skip:
+                    on_skip(row, f"{name!r} is not an {row.kind} category")
+                continue
+            stored = date_cache.get(row.date)
+            if stored is None:
+                if len(date_cache) >= _DateParser.MAX_CACHED:
+                    date_cache.clear()
+                stored = date_cache[row.date] = (bind_date(row.date), summary.month_key(row.date))
+            description = (row.description or "")[:MAX_DESCRIPTION] or None
+            pending[row.kind].append((user_id, category, row.amount, stored[0], description))
+            key = (user_id, row.kind, category, stored[1])
+            total, n = deltas.get(key, (0.0, 0))
+            deltas[key] = (total + row.amount, n + 1)
+            if series_model is not None and row.kind == "expense":
+                recurring.add_change(changes, user_id, category, row.date, row.amount, description)
+            buffered += 1
+            if buffered >= batch_size:
+                flush()
+                buffered = 0
+        flush()
+    finally:
+        restore_cache()
+
+    total = counts["expense"] + counts["income"]
+    return ImportResult(total, counts["expense"], counts["income"], skipped, time.perf_counter() - started)
+
+
+def import_stream(session, stream: TextIO, fmt: str, models: Dict[str, object], summary_model, category_model,
+                  user_id: int, rules: Optional[Dict[str, str]] = None, date_format: Optional[str] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE,
+                  progress: Optional[Callable[[int, float], None]] = None, series_model=None) -> ImportResult:
+    """Parse `stream` as `fmt` ('csv' or 'ofx') and import it; see import_rows().
+
+    Rows the parser cannot read are skipped as well; the result counts both kinds of skip
+    and explains the first few.
+    """
+    skipped = 0
+    errors = []
+
+    def note(reason):
+        nonlocal skipped
+        skipped += 1
+        if len(errors) < MAX_REPORTED_SKIPS:
+            errors.append(reason)
+
+    def on_parse_skip(position, reason):
+        note(f"{'transaction' if fmt == 'ofx' else 'line'} {position}: {reason}")
+
+    def on_row_skip(row, reason):
+        note(f"{row.date:%Y-%m-%d} {row.amount:.2f} ({row.description or 'no description'}): {reason}")
+
+    if fmt == "ofx":
+        rows = iter_ofx_rows(stream, on_skip=on_parse_skip)
+    elif fmt == "csv":
+        rows = iter_csv_rows(stream, date_format=date_format, on_skip=on_parse_skip)
+    else:
+        raise ValueError(f"unsupported import format {fmt!r}")
+
+    known = [name for (name,) in session.query(category_model.name).filter(category_model.user_id == user_id)]
+    mapper = CategoryMapper(known, rules)
+    result = import_rows(session, rows, models, summary_model, category_model, user_id, mapper,
+                         batch_size=batch_size, progress=progress, series_model=series_model, on_skip=on_row_skip)
+    return result._replace(skipped=skipped, errors=tuple(errors))
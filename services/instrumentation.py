@@ -0,0 +1,268 @@
+"""Opt-in per-request instrumentation (INSTRUMENTATION=1).
+
+For every request it records SQL statement count and time (SQLAlchemy engine events),
+outbound HTTP time (reported by services/http_client.py), and Jinja render time (Flask's
+template signals). The numbers are returned as a `Server-Timing` header, aggregated per
+endpoint into rolling histograms served at /debug/metrics, and a sample of requests
+(PROFILE_SAMPLE_RATE) runs under cProfile, with a .prof dump written to PROFILE_DIR when the
+request takes longer than SLOW_REQUEST_MS. Only one profiler can be active per interpreter,
+so a sampled request that arrives while another is being profiled runs unprofiled.
+/debug/metrics covers every household's traffic and answers only when `authorize()` allows.
+
+Work submitted to a thread pool is attributed to the request only when it runs inside a copy
+of the request's context (see `contextvars.copy_context()`). Streamed response bodies are
+produced after the request is recorded and are not included.
+"""
+import contextvars
+import cProfile
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from flask import abort, before_render_template, g, jsonify, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# histogram bucket upper bounds, in ms (statement counts use the same bounds)
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf)
+
+
+class RequestTimings:
+    """Accumulated (count, ms) per metric for one request; safe to update from worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, List[float]] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        with self._lock:
+            entry = self.metrics.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+
+    def get(self, name: str):
+        with self._lock:
+            count, ms = self.metrics.get(name, (0, 0.0))
+        return count, ms
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+# held by the request being profiled: cProfile is process-wide (Python 3.12+ raises
+# ValueError when a second profiler is enabled), so sampling is try-acquire
+_profiling = threading.Lock()
+
+
+def record(name: str, ms: float) -> None:
+    """Add `ms` to metric `name` of the current request; a no-op outside an instrumented request."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, ms)
+
+
+class RollingHistogram:
+    """Samples from the last `window` seconds (at most `maxlen`), summarized on read."""
+
+    def __init__(self, window: float = 300.0, maxlen: int = 5000, clock=time.monotonic):
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=maxlen)  # (timestamp, value)
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._samples.append((self._clock(), value))
+
+    def summary(self) -> Dict:
+        cutoff = self._clock() - self.window
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            values = sorted(v for _, v in self._samples)
+        if not values:
+            return {"count": 0}
+        counts = [0] * len(BUCKETS)
+        i = 0
+        for v in values:
+            while v > BUCKETS[i]:
+                i += 1
+            counts[i] += 1
+
+        def pct(p):
+            return round(values[min(len(values) - 1, int(p / 100.0 * len(values)))], 3)
+
+        return {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 3),
+            "p50": pct(50),
+            "p95": pct(95),
+            "p99": pct(99),
+            "max": round(values[-1], 3),
+            "buckets": [{"le": "+Inf" if math.isinf(b) else b, "count": c} for b, c in zip(BUCKETS, counts)],
+        }
+
+
+class Metrics:
+    """Per-endpoint rolling histograms of total/db/http/render time and SQL statement count."""
+
+    FIELDS = ("total_ms", "db_ms", "db_statements", "http_ms", "render_ms")
+
+    def __init__(self, window: float = 300.0):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, RollingHistogram]] = {}
+        self.profiles: deque = deque(maxlen=50)  # recent slow-request dumps
+
+    def observe(self, endpoint: str, values: Dict[str, float]) -> None:
+        with self._lock:
+            hists = self._endpoints.get(endpoint)
+            if hists is None:
+                hists = self._endpoints[endpoint] = {f: RollingHistogram(self.window) for f in self.FIELDS}
+        for field, value in values.items():
+            hists[field].add(value)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            endpoints = dict(self._endpoints)
+        return {
+            "window_s": self.window,
+            "endpoints": {ep: {f: h.summary() for f, h in hists.items()} for ep, hists in sorted(endpoints.items())},
+            "slow_profiles": list(self.profiles),
+        }
+
+
+metrics = Metrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("instrumentation_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("instrumentation_started")
+    if started:
+        record("db", (time.perf_counter() - started.pop()) * 1000.0)
+
+
+def _handle_error(context):
+    # a statement that raises never reaches after_cursor_execute; pop its start here so the
+    # pooled connection's stack doesn't grow and skew the timing of its later statements
+    conn = context.connection
+    started = conn.info.get("instrumentation_started") if conn is not None else None
+    if started:
+        record("db", (time.perf_counter() - started.pop()) * 1000.0)
+
+
+def _before_render(sender, template, context, **extra):
+    g._render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = g.pop("_render_started", None)
+    if started is not None:
+        record("render", (time.perf_counter() - started) * 1000.0)
+
+
+def _server_timing(timings: RequestTimings, total_ms: float) -> str:
+    db_count, db_ms = timings.get("db")
+    parts = [f'db;dur={db_ms:.1f};desc="{db_count} queries"']
+    http_count, http_ms = timings.get("http")
+    if http_count:
+        parts.append(f'http;dur={http_ms:.1f};desc="{http_count} calls"')
+    _, render_ms = timings.get("render")
+    if render_ms:
+        parts.append(f"render;dur={render_ms:.1f}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    if not _profiling.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiling tool (a debugger, sys.monitoring) is active
+        _profiling.release()
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler: cProfile.Profile) -> None:
+    profiler.disable()
+    _profiling.release()
+
+
+def init_app(app, slow_ms: float = 500.0, sample_rate: float = 0.1, profile_dir: Optional[str] = None,
+             authorize: Optional[Callable[[], bool]] = None) -> None:
+    """Install the hooks on `app` and register GET /debug/metrics.
+
+    The metrics page answers 404 unless `authorize()` (called in the request) returns True.
+    """
+    profile_dir = profile_dir or os.path.join(app.instance_path, "profiles")
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def _start_request():
+        g._timings = RequestTimings()
+        g._timings_token = _current.set(g._timings)
+        g._request_started = time.perf_counter()
+        g._profiler = None
+        if sample_rate > 0 and random.random() < sample_rate:
+            g._profiler = _start_profiler()
+
+    @app.after_request
+    def _finish_request(response):
+        timings = g.get("_timings")
+        if timings is None:
+            return response
+        total_ms = (time.perf_counter() - g._request_started) * 1000.0
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            _stop_profiler(profiler)
+            if total_ms >= slow_ms:
+                _dump_profile(profiler, profile_dir, total_ms)
+        response.headers["Server-Timing"] = _server_timing(timings, total_ms)
+        db_count, db_ms = timings.get("db")
+        metrics.observe(request.url_rule.rule if request.url_rule else "<unmatched>", {
+            "total_ms": total_ms,
+            "db_ms": db_ms,
+            "db_statements": db_count,
+            "http_ms": timings.get("http")[1],
+            "render_ms": timings.get("render")[1],
+        })
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            _stop_profiler(profiler)
+        token = g.pop("_timings_token", None)
+        if token is not None:
+            _current.reset(token)
+
+    @app.route("/debug/metrics", methods=["GET"])
+    def debug_metrics():
+        if authorize is None or not authorize():
+            abort(404)
+        return jsonify(metrics.snapshot())
+
+
+def _dump_profile(profiler: cProfile.Profile, profile_dir: str, total_ms: float) -> None:
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{(request.endpoint or 'unknown').replace('.', '_')}-{int(total_ms)}ms.prof"
+        path = os.path.join(profile_dir, name)
+        profiler.dump_stats(path)
+    except OSError:
+        return
+    metrics.profiles.append({"path": path, "endpoint": request.path, "total_ms": round(total_ms, 1)})
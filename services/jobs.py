@@ -0,0 +1,339 @@
+"""In-process background jobs with persistent records.
+
+Slow work (the advisor recommendation, housing searches, imports) is handed to
+`JobQueue.submit()`, which stores a job row in a small SQLite file (JOBS_DB_PATH, default
+instance/jobs.db) and returns its id at once; a pool of worker threads runs the registered
+handler and writes the result (JSON) or the error back to the row, where the status
+endpoints read it. No broker is involved: the queue is the table plus an in-memory list of
+ids for this process.
+
+Results are cached: a submit carrying a `cache_key` returns the job already queued, running
+or finished within `result_ttl` seconds for that key instead of running the work again.
+
+A running job holds a lease: its process renews `heartbeat_at` every `stale_after` / 4
+seconds while the handler runs. A lease thread in every process also queues again, every
+`stale_after` / 4 seconds and when the pool starts, the "running" jobs whose lease lapsed
+(their worker or process died) and the "queued" jobs nobody picked up (left by a previous
+process). Claiming is an atomic UPDATE, so two processes sharing the file never run the
+same job at the same time.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from services.instrumentation import RollingHistogram
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "jobs.db")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user_id INTEGER,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    cache_key TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_job_user_created ON job (user_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_job_status_created ON job (status, created_at);
+CREATE INDEX IF NOT EXISTS ix_job_cache_key ON job (cache_key, created_at);
+"""
+
+_COLUMNS = "id, kind, user_id, status, params, result, error, created_at, started_at, finished_at"
+
+
+def _row_to_job(row) -> Dict[str, Any]:
+    job_id, kind, user_id, status, params, result, error, created_at, started_at, finished_at = row
+    return {
+        "id": job_id,
+        "kind": kind,
+        "user_id": user_id,
+        "status": status,
+        "params": json.loads(params),
+        "result": json.loads(result) if result is not None else None,
+        "error": error,
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at,
+    }
+
+
+class JobQueue:
+    def __init__(self, path: str = DEFAULT_PATH, workers: int = 4, result_ttl: float = 300.0,
+                 retention: float = 7 * 86400, stale_after: float = 600.0, name: str = "job"):
+        self.path = path
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.retention = retention
+        self.stale_after = stale_after
+        self.lease_interval = stale_after / 4
+        self._handlers: Dict[str, Callable[[Dict[str, Any], Optional[int]], Any]] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._lease_thread: Optional[threading.Thread] = None
+        self._running: set = set()  # ids of the jobs this process's workers are running
+        self._name = name
+        self._started_at: Optional[float] = None
+        self._busy = 0
+        self._busy_s = 0.0
+        self.wait_ms = RollingHistogram()
+        self.run_ms = RollingHistogram()
+        self.completed = 0
+        self.failed = 0
+        self.cache_hits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode = WAL")
+                    conn.executescript(_SCHEMA)
+                    if "heartbeat_at" not in {r[1] for r in conn.execute("PRAGMA table_info(job)")}:
+                        conn.execute("ALTER TABLE job ADD COLUMN heartbeat_at REAL")  # files from before leases
+                    self._initialized = True
+        return conn
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any], Optional[int]], Any]) -> None:
+        """`handler(params, user_id)` runs in a worker thread; its return value must be JSON-serializable."""
+        self._handlers[kind] = handler
+
+    # ------------------ SUBMIT / READ ------------------
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None, user_id: Optional[int] = None,
+               cache_key: Optional[str] = None) -> str:
+        """Queue a `kind` job and return its id (or the id of a matching cached job)."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                if cache_key is not None:
+                    row = conn.execute(
+                        "SELECT id FROM job WHERE cache_key = ? AND status != ? AND created_at > ? "
+                        "ORDER BY created_at DESC LIMIT 1",
+                        (cache_key, FAILED, now - self.result_ttl),
+                    ).fetchone()
+                    if row is not None:
+                        self.cache_hits += 1
+                        return row[0]
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO job (id, kind, user_id, status, params, cache_key, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, user_id, QUEUED, json.dumps(params or {}), cache_key, now),
+                )
+        finally:
+            conn.close()
+        self.ensure_started()
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """The job, or None if it does not exist or (when `user_id` is given) belongs to someone else."""
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {_COLUMNS} FROM job WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = _row_to_job(row)
+        if user_id is not None and job["user_id"] != user_id:
+            return None
+        return job
+
+    def recent(self, user_id: Optional[int], limit: int = 20) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM job WHERE user_id IS ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [_row_to_job(r) for r in rows]
+
+    def wait(self, job_id: str, timeout: float, poll: float = 0.05) -> Optional[Dict[str, Any]]:
+        """Poll until the job finishes or `timeout` passes; returns its latest state."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED) or time.monotonic() >= deadline:
+                return job
+            time.sleep(poll)
+
+    # ------------------ WORKERS ------------------
+
+    def ensure_started(self) -> None:
+        # started lazily so a pre-fork parent does not hand dead threads to its children
+        if (len(self._threads) == self.workers and all(t.is_alive() for t in self._threads)
+                and self._lease_thread is not None and self._lease_thread.is_alive()):
+            return
+        with self._lock:
+            alive = [t for t in self._threads if t.is_alive()]
+            if not self._threads:
+                self._started_at = time.monotonic()
+                self._recover(startup=True)
+            for i in range(len(alive), self.workers):
+                t = threading.Thread(target=self._run, name=f"{self._name}-{i}", daemon=True)
+                t.start()
+                alive.append(t)
+            self._threads = alive
+            if self._lease_thread is None or not self._lease_thread.is_alive():
+                self._lease_thread = threading.Thread(target=self._keep_leases, name=f"{self._name}-lease", daemon=True)
+                self._lease_thread.start()
+
+    def _recover(self, startup: bool = False) -> None:
+        # queue again the running jobs whose lease lapsed and the queued jobs no process took:
+        # all of them at startup, afterwards those waiting longer than `stale_after` (a live
+        # process may hold them in memory; claiming is atomic, so a duplicate entry is skipped)
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                lapsed = conn.execute(
+                    "UPDATE job SET status = ?, started_at = NULL, heartbeat_at = NULL "
+                    "WHERE status = ? AND COALESCE(heartbeat_at, started_at) < ? RETURNING id",
+                    (QUEUED, RUNNING, now - self.stale_after)).fetchall()
+                conn.execute("DELETE FROM job WHERE finished_at < ?", (now - self.retention,))
+                waiting = conn.execute("SELECT id FROM job WHERE status = ? AND created_at < ? ORDER BY created_at",
+                                       (QUEUED, now if startup else now - self.stale_after)).fetchall()
+        finally:
+            conn.close()
+        for job_id in dict.fromkeys(row[0] for row in lapsed + waiting):
+            self._queue.put(job_id)
+
+    def _renew_leases(self) -> None:
+        with self._lock:
+            running = list(self._running)
+        if not running:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("UPDATE job SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                                 [(time.time(), job_id, RUNNING) for job_id in running])
+        finally:
+            conn.close()
+
+    def _keep_leases(self) -> None:
+        while True:
+            time.sleep(self.lease_interval)
+            try:
+                self._renew_leases()
+                self._recover()
+            except sqlite3.Error:
+                pass  # the file is busy or gone; try again next round
+
+    def _claim(self, job_id: str):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                claimed = conn.execute(
+                    "UPDATE job SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                    (RUNNING, now, now, job_id, QUEUED)).rowcount
+                if not claimed:
+                    return None
+                return conn.execute("SELECT kind, user_id, params, created_at FROM job WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("UPDATE job SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                             (status, json.dumps(result) if status == DONE else None, error, time.time(), job_id))
+        finally:
+            conn.close()
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            try:
+                claimed = self._claim(job_id)
+            except sqlite3.Error:
+                continue
+            if claimed is None:
+                continue  # another process (or a duplicate queue entry) got it first
+            kind, user_id, params, created_at = claimed
+            self.wait_ms.add((time.time() - created_at) * 1000.0)
+            started = time.perf_counter()
+            with self._lock:
+                self._busy += 1
+                self._running.add(job_id)
+            try:
+                handler = self._handlers.get(kind)
+                if handler is None:
+                    raise ValueError(f"Unknown job kind: {kind}")
+                result = handler(json.loads(params), user_id)
+                status, error = DONE, None
+            except Exception as exc:
+                result, status, error = None, FAILED, str(exc) or exc.__class__.__name__
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._busy -= 1
+                self._busy_s += elapsed
+            self.run_ms.add(elapsed * 1000.0)
+            try:
+                self._finish(job_id, status, result, error)
+            except (TypeError, ValueError) as exc:  # result not JSON-serializable
+                status = FAILED
+                self._finish(job_id, FAILED, error=f"Job result could not be stored: {exc}")
+            except sqlite3.Error:
+                pass  # left "running"; _recover() re-queues it once its lease lapses
+            with self._lock:
+                self._running.discard(job_id)
+            if status == DONE:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def stats(self, user_id: Optional[int] = None, scoped: bool = False) -> Dict[str, Any]:
+        """Pool load and job counts. With `scoped`, the counts are `user_id`'s jobs only and the
+        process-wide counters and timings (everyone's work) are left out."""
+        conn = self._connect()
+        try:
+            if scoped:
+                counts = dict(conn.execute("SELECT status, COUNT(*) FROM job WHERE user_id IS ? GROUP BY status",
+                                           (user_id,)).fetchall())
+            else:
+                counts = dict(conn.execute("SELECT status, COUNT(*) FROM job GROUP BY status").fetchall())
+        finally:
+            conn.close()
+        with self._lock:
+            busy, busy_s = self._busy, self._busy_s
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        out = {
+            "workers": self.workers,
+            "busy": busy,
+            "utilization": round(busy_s / (uptime * self.workers), 4) if uptime else 0.0,
+            "queue_depth": self._queue.qsize(),
+            "jobs": {s: counts.get(s, 0) for s in (QUEUED, RUNNING, DONE, FAILED)},
+        }
+        if not scoped:
+            out.update({
+                "completed": self.completed,
+                "failed": self.failed,
+                "cache_hits": self.cache_hits,
+                "wait_ms": self.wait_ms.summary(),
+                "run_ms": self.run_ms.summary(),
+            })
+        return out
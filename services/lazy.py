@@ -0,0 +1,42 @@
+"""Deferred imports for service modules that are expensive to load.
+
+`LazyModule("services.housing")` stands in for the module and imports it on first attribute
+access, so `requests`, `numpy` and friends are only loaded by the process (and the request)
+that needs them. `on_load(module)` runs once, right after the import and before any other
+thread sees the module, for wiring that would otherwise happen at import time; it must use
+its argument rather than the proxy.
+"""
+import importlib
+import threading
+from types import ModuleType
+from typing import Callable, Optional
+
+
+class LazyModule:
+    def __init__(self, name: str, on_load: Optional[Callable[[ModuleType], None]] = None):
+        self._name = name
+        self._on_load = on_load
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> ModuleType:
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                module = importlib.import_module(self._name)
+                if self._on_load is not None:
+                    self._on_load(module)
+                self._module = module
+            return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}{'' if self.loaded else ' (not loaded)'}>"
@@ -0,0 +1,294 @@
+"""Local store of rental listings, ingested from the upstream feed.
+
+Listings live in a SQLite file (LISTINGS_DB_PATH, default instance/listings.db), one
+"market" per normalized location string. A listing is stored once, keyed by its upstream
+id, and linked to every market whose fetch returned it (`market_listing`), so overlapping
+markets share it instead of taking it from each other. Coordinates are indexed in an R*Tree
+and the attributes in B-trees, so "cheapest listing within R miles with at least B beds,
+B baths and S sqft" is a bounding-box probe plus an exact distance check in one query,
+without calling upstream. Prices are parsed once at ingest and stored as numbers.
+
+`ListingRefresher` re-fetches markets in a background thread on an interval; markets it
+has not seen yet can be queued with `schedule()`.
+"""
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "listings.db")
+MILES_PER_DEGREE_LAT = 69.0
+EARTH_RADIUS_MILES = 3958.8
+SCHEMA_VERSION = 2  # PRAGMA user_version; older stores are dropped and re-ingested
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS market (
+    location TEXT PRIMARY KEY,
+    lat REAL,
+    lon REAL,
+    radius REAL,
+    refreshed_at REAL NOT NULL,
+    listings INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS listing (
+    id INTEGER PRIMARY KEY,
+    source_key TEXT NOT NULL UNIQUE,
+    price REAL,
+    beds INTEGER,
+    baths REAL,
+    sqft INTEGER,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    address TEXT,
+    url TEXT,
+    refreshed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_listing_price ON listing (price);
+CREATE INDEX IF NOT EXISTS ix_listing_beds_price ON listing (beds, price);
+CREATE INDEX IF NOT EXISTS ix_listing_baths ON listing (baths);
+CREATE INDEX IF NOT EXISTS ix_listing_sqft ON listing (sqft);
+CREATE TABLE IF NOT EXISTS market_listing (
+    market TEXT NOT NULL,
+    listing_id INTEGER NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (market, listing_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_market_listing_listing ON market_listing (listing_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS listing_geo USING rtree (id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+_CHEAPEST = """
+SELECT l.price, l.beds, l.baths, l.sqft, l.address, l.url, l.lat, l.lon
+FROM listing_geo g JOIN listing l ON l.id = g.id
+WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lon >= ? AND g.max_lon <= ?
+  AND l.beds >= ? AND l.baths >= ? AND l.sqft >= ? AND l.price > 0
+  AND distance_miles(l.lat, l.lon, ?, ?) <= ?
+ORDER BY l.price
+LIMIT ?
+"""
+
+
+def _distance_miles(lat1, lon1, lat2, lon2) -> float:
+    # haversine; only evaluated for rows already inside the bounding box
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_miles: float) -> Tuple[float, float, float, float]:
+    dlat = radius_miles / MILES_PER_DEGREE_LAT
+    dlon = radius_miles / (MILES_PER_DEGREE_LAT * max(0.01, math.cos(math.radians(lat))))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+class ListingStore:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.create_function("distance_miles", 4, _distance_miles, deterministic=True)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode = WAL")
+                    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                        # the store is a cache of upstream data: refetching beats migrating it
+                        conn.executescript("DROP TABLE IF EXISTS listing_geo; DROP TABLE IF EXISTS listing; "
+                                           "DROP TABLE IF EXISTS market_listing; DROP TABLE IF EXISTS market;")
+                    conn.executescript(_SCHEMA)
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                    self._initialized = True
+        return conn
+
+    def market(self, location: str) -> Optional[Dict]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT lat, lon, radius, refreshed_at, listings FROM market WHERE location = ?",
+                               (location,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"location": location, "lat": row[0], "lon": row[1], "radius": row[2], "refreshed_at": row[3],
+                "listings": row[4]}
+
+    def markets(self) -> List[Dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT location, radius, refreshed_at FROM market ORDER BY location").fetchall()
+        finally:
+            conn.close()
+        return [{"location": loc, "radius": radius, "refreshed_at": at} for loc, radius, at in rows]
+
+    def replace_market(self, location: str, listings: Iterable[Dict], radius: Optional[float] = None,
+                       center: Optional[Tuple[float, float]] = None) -> int:
+        """Upsert `location`'s listings (dicts with numeric price/beds/baths/sqft, lat/lon and a
+        source_key) and unlink the ones the feed no longer returns; a listing no market links
+        to any more is dropped. `center` is the (lat, lon) searches of the market start from,
+        normally the geocoded location; without it the median of the listings' coordinates
+        stands in. Listings without coordinates are placed at the centre. Returns the number
+        of listings in the market."""
+        now = time.time()
+        listings = list(listings)
+        if center is None:
+            located = [(it["lat"], it["lon"]) for it in listings
+                       if it.get("lat") is not None and it.get("lon") is not None]
+            if located:
+                lats = sorted(p[0] for p in located)
+                lons = sorted(p[1] for p in located)
+                center = (lats[len(lats) // 2], lons[len(lons) // 2])
+
+        conn = self._connect()
+        try:
+            with conn:
+                for it in listings:
+                    lat, lon = it.get("lat"), it.get("lon")
+                    if lat is None or lon is None:
+                        if center is None:
+                            continue
+                        lat, lon = center
+                    listing_id = conn.execute(
+                        "INSERT INTO listing (source_key, price, beds, baths, sqft, lat, lon, address, url, refreshed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (source_key) DO UPDATE SET price = excluded.price, "
+                        "beds = excluded.beds, baths = excluded.baths, sqft = excluded.sqft, lat = excluded.lat, "
+                        "lon = excluded.lon, address = excluded.address, url = excluded.url, refreshed_at = excluded.refreshed_at "
+                        "RETURNING id",
+                        (it["source_key"], it.get("price"), it.get("beds") or 0, it.get("baths") or 0,
+                         it.get("sqft") or 0, lat, lon, it.get("address"), it.get("url"), now),
+                    ).fetchone()[0]
+                    conn.execute("INSERT OR REPLACE INTO listing_geo (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                                 (listing_id, lat, lat, lon, lon))
+                    conn.execute("INSERT OR REPLACE INTO market_listing (market, listing_id, refreshed_at) VALUES (?, ?, ?)",
+                                 (location, listing_id, now))
+                stale = [row[0] for row in conn.execute(
+                    "SELECT listing_id FROM market_listing WHERE market = ? AND refreshed_at < ?", (location, now))]
+                conn.execute("DELETE FROM market_listing WHERE market = ? AND refreshed_at < ?", (location, now))
+                orphans = [(listing_id,) for listing_id in stale if conn.execute(
+                    "SELECT 1 FROM market_listing WHERE listing_id = ?", (listing_id,)).fetchone() is None]
+                conn.executemany("DELETE FROM listing_geo WHERE id = ?", orphans)
+                conn.executemany("DELETE FROM listing WHERE id = ?", orphans)
+                count = conn.execute("SELECT COUNT(*) FROM market_listing WHERE market = ?", (location,)).fetchone()[0]
+                conn.execute(
+                    "INSERT OR REPLACE INTO market (location, lat, lon, radius, refreshed_at, listings) VALUES (?, ?, ?, ?, ?, ?)",
+                    (location, center[0] if center else None, center[1] if center else None, radius, now, count),
+                )
+            # keep the planner's choice between the R*Tree and the price index informed
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+        return count
+
+    def cheapest(self, lat: float, lon: float, radius_miles: float, min_beds: int = 0, min_baths: float = 0,
+                 min_sqft: int = 0, limit: int = 1) -> List[Dict]:
+        """Listings within `radius_miles` of (lat, lon) that meet the minimums, cheapest first."""
+        box = bounding_box(lat, lon, radius_miles)
+        conn = self._connect()
+        try:
+            rows = conn.execute(_CHEAPEST, (*box, min_beds, min_baths, min_sqft, lat, lon, radius_miles, limit)).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"price": price, "beds": beds, "baths": baths, "sqft": sqft, "address": address, "url": url,
+             "lat": l_lat, "lon": l_lon}
+            for price, beds, baths, sqft, address, url, l_lat, l_lon in rows
+        ]
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        try:
+            markets, oldest = conn.execute("SELECT COUNT(*), MIN(refreshed_at) FROM market").fetchone()
+            listings = conn.execute("SELECT COUNT(*) FROM listing").fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            "markets": markets,
+            "listings": listings,
+            "oldest_refresh_age_s": round(time.time() - oldest, 1) if oldest else None,
+        }
+
+
+class ListingRefresher:
+    """Background thread that refreshes every known market once per `interval` seconds.
+
+    `refresh(location, radius)` does the fetch and ingest; the optional `markets()` lists
+    (location, radius) pairs to ingest in addition to those already in the store (it can be
+    assigned after construction). Locations are store keys, i.e. already normalized. Started
+    lazily so a pre-fork parent does not hand a dead thread to its children.
+    """
+
+    def __init__(self, store: ListingStore, refresh: Callable[[str, Optional[float]], int],
+                 markets: Optional[Callable[[], Iterable[Tuple[str, Optional[float]]]]] = None,
+                 interval: float = 6 * 3600, name: str = "listing-refresh"):
+        self.store = store
+        self._refresh = refresh
+        self.markets = markets
+        self.interval = interval
+        self._queue: "queue.Queue[Tuple[str, Optional[float], float]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._name = name
+        self.refreshes = 0
+        self.failures = 0
+
+    def ensure_started(self) -> None:
+        if self.interval <= 0:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                    self._thread.start()
+
+    def schedule(self, location: str, radius: Optional[float] = None) -> None:
+        """Refresh `location` as soon as the thread is free (unless a sweep gets to it first).
+
+        A no-op when the background refresh is disabled (`interval` <= 0): no thread would
+        ever take it off the queue."""
+        if self.interval <= 0:
+            return
+        self._queue.put((location, radius, time.time()))
+        self.ensure_started()
+
+    def _due(self) -> List[Tuple[str, Optional[float]]]:
+        cutoff = time.time() - self.interval
+        stored = self.store.markets()
+        due = {m["location"]: m["radius"] for m in stored if m["refreshed_at"] <= cutoff}
+        known = {m["location"] for m in stored}
+        for location, radius in (self.markets() if self.markets else ()):
+            if location and location not in known:
+                due.setdefault(location, radius)
+        return list(due.items())
+
+    def _refresh_one(self, location: str, radius: Optional[float]) -> None:
+        try:
+            self._refresh(location, radius)
+            self.refreshes += 1
+        except Exception:
+            self.failures += 1
+
+    def _run(self) -> None:
+        next_sweep = 0.0
+        while True:
+            if time.monotonic() >= next_sweep:
+                try:
+                    due = self._due()
+                except Exception:
+                    due = []
+                for location, radius in due:
+                    self._refresh_one(location, radius)
+                next_sweep = time.monotonic() + min(self.interval, 300)
+            try:
+                location, radius, queued_at = self._queue.get(timeout=max(0.0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                continue
+            market = self.store.market(location)
+            if market is None or market["refreshed_at"] < queued_at:
+                self._refresh_one(location, radius)
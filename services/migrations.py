@@ -0,0 +1,228 @@
+"""In-place schema upgrades for databases created by older versions of the app.
+
+`db.create_all()` only creates missing tables, so columns added to existing tables are
+applied here. Each step checks the live schema first and is a no-op once applied.
+"""
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import MetaData, UniqueConstraint, inspect, select
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+
+def _columns(conn, table: str):
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def _table_sql(conn, table: str) -> str:
+    return conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).scalar() or ""
+
+
+def _rebuild(conn, table, values: Optional[Dict[str, object]] = None) -> None:
+    # copy `table` into a fresh table with its current definition; columns the old table
+    # lacks take `values` (or their server default), duplicate keys are dropped
+    values = dict(values or {})
+    old = f"_legacy_{table.name}"
+    live = _columns(conn, table.name)
+    shared = [c.name for c in table.columns if c.name in live and c.name not in values]
+    for name in [ix["name"] for ix in inspect(conn).get_indexes(table.name)]:
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')  # free the names for the new table's indexes
+    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old}"')
+    table.create(bind=conn)
+    cols = ", ".join([f'"{c}"' for c in shared] + [f'"{c}"' for c in values])
+    select_cols = ", ".join([f'"{c}"' for c in shared] + ["?"] * len(values))
+    conn.exec_driver_sql(f'INSERT OR IGNORE INTO "{table.name}" ({cols}) SELECT {select_cols} FROM "{old}"',
+                         tuple(values.values()))
+    conn.exec_driver_sql(f'DROP TABLE "{old}"')
+
+
+def _create_staging(conn, table, staging: str) -> None:
+    staging_meta = MetaData()
+    for fk in table.foreign_keys:  # the copy's FOREIGN KEY clauses need their targets
+        fk.column.table.to_metadata(staging_meta)
+    conn.execute(CreateTable(table.to_metadata(staging_meta, name=staging)))
+
+
+def _copy_and_swap(session, name: str, staging: str, copy: str, params: tuple, batch_size: int,
+                   progress: Optional[Callable[[str, int], None]], copied_so_far: int = 0) -> int:
+    # run `copy` (ending in "WHERE t.id > ? ORDER BY t.id LIMIT ?") until `name` is copied,
+    # committing each batch, then replace `name` with `staging`; returns the running row count
+    conn = session.connection()
+    last = conn.exec_driver_sql(f'SELECT COALESCE(MAX(id), 0) FROM "{staging}"').scalar()
+    while True:
+        copied = conn.exec_driver_sql(copy, params + (last, batch_size)).rowcount
+        if copied <= 0:
+            break
+        last = conn.exec_driver_sql(f'SELECT MAX(id) FROM "{staging}"').scalar()
+        copied_so_far += copied
+        session.commit()
+        conn = session.connection()
+        if progress:
+            progress(name, copied_so_far)
+
+    conn.exec_driver_sql(f'DROP TABLE "{name}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{staging}" RENAME TO "{name}"')
+    session.commit()
+    return copied_so_far
+
+
+def add_user_scope(session, user_model, append_tables: Iterable, rebuild_tables: Iterable,
+                   derived_tables: Iterable = (), username: str = "default") -> Optional[int]:
+    """Assign every existing row to a new `username` account and add the `user_id` columns.
+
+    - `append_tables` (the large transaction tables) get the column through
+      ALTER TABLE ... ADD COLUMN with the new user's id as its default, which SQLite
+      applies without rewriting the table; their old single-tenant indexes are dropped
+      so the (user_id, ...) ones can be created by ensure_indexes().
+    - `rebuild_tables` are small but carry single-tenant UNIQUE constraints that SQLite
+      cannot alter, so they are copied into a table with the new definition.
+    - `derived_tables` (the summary and recurring-series tables) are dropped and recreated
+      empty; the caller rebuilds them from the raw rows. Tables with a foreign key to a
+      rebuilt table belong here: SQLite points their key at the renamed copy, which is then
+      dropped.
+
+    Returns the id of the account that now owns the old data, or None if there was nothing to do.
+    """
+    append_tables = list(append_tables)
+    rebuild_tables = list(rebuild_tables)
+    conn = session.connection()
+    legacy = {t.name for t in append_tables + rebuild_tables
+              if _has_table(conn, t.name) and "user_id" not in _columns(conn, t.name)}
+    if not legacy:
+        return None
+
+    users = user_model.__table__
+    user_id = session.execute(select(users.c.id).where(users.c.username == username)).scalar()
+    if user_id is None:
+        user_id = session.execute(users.insert().values(username=username)).inserted_primary_key[0]
+
+    for table in append_tables:
+        if table.name not in legacy:
+            continue
+        old_indexes = [ix["name"] for ix in inspect(conn).get_indexes(table.name)]
+        conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN user_id INTEGER NOT NULL DEFAULT {int(user_id)}')
+        for name in old_indexes:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+
+    for table in rebuild_tables:
+        if table.name in legacy:
+            # OR IGNORE: the old app only ever read the first user_details row, which stays the one kept
+            _rebuild(conn, table, {"user_id": int(user_id)})
+
+    for table in derived_tables:
+        table.drop(bind=conn, checkfirst=True)
+        table.create(bind=conn)
+
+    session.commit()
+    return user_id
+
+
+def category_names_to_ids(session, category_table, tables: Iterable, derived_tables: Iterable = (),
+                          batch_size: int = 50_000, default_name: str = "Uncategorized",
+                          progress: Optional[Callable[[str, int], None]] = None) -> int:
+    """Replace the `category` name column of `tables` with the `category_id` foreign key.
+
+    `tables` maps each target table (in its new definition) to the category type used for
+    names that have no category row yet; those rows are created first. Each table is copied
+    into a new table in id order, `batch_size` rows per transaction, with the name resolved
+    through the (user_id, name) index, then swapped in. The copy resumes where it stopped if
+    interrupted. Indexes are left to ensure_indexes(), which builds them once after the copy.
+    `derived_tables` still keyed by name are dropped and recreated empty.
+
+    Returns the number of rows rewritten.
+    """
+    conn = session.connection()
+    cat = category_table.name
+    rewritten = 0
+    for table, kind in dict(tables).items():
+        name = table.name
+        staging = f"_new_{name}"
+        if not _has_table(conn, staging):
+            if "category" not in _columns(conn, name):
+                continue
+            conn.exec_driver_sql(
+                f'INSERT OR IGNORE INTO "{cat}" (user_id, name, type, is_need) '
+                f'SELECT DISTINCT user_id, COALESCE(category, ?), ?, 0 FROM "{name}"', (default_name, kind))
+            _create_staging(conn, table, staging)
+            session.commit()
+            conn = session.connection()
+
+        # columns added to the definition since (none in the old table) take their defaults
+        live = _columns(conn, name) | {"category_id"}
+        copied_cols = [col.name for col in table.columns if col.name in live]
+        select_cols = ", ".join("c.id" if col == "category_id" else f't."{col}"' for col in copied_cols)
+        insert_cols = ", ".join(f'"{col}"' for col in copied_cols)
+        copy = (f'INSERT INTO "{staging}" ({insert_cols}) SELECT {select_cols} FROM "{name}" t '
+                f'JOIN "{cat}" c ON c.user_id = t.user_id AND c.name = COALESCE(t.category, ?) '
+                f'WHERE t.id > ? ORDER BY t.id LIMIT ?')
+        rewritten = _copy_and_swap(session, name, staging, copy, (default_name,), batch_size,
+                                   progress, rewritten)
+        conn = session.connection()
+
+    for table in derived_tables:
+        if _has_table(conn, table.name) and "category" in _columns(conn, table.name):
+            table.drop(bind=conn)
+            table.create(bind=conn)
+    session.commit()
+    return rewritten
+
+
+def add_columns(session, tables: Iterable) -> int:
+    """Add the columns of `tables`' definitions that their live tables lack.
+
+    Nullable (or server-defaulted) columns are appended with ALTER TABLE ... ADD COLUMN, which
+    SQLite applies without rewriting the table. A column that is part of a UNIQUE constraint,
+    which SQLite cannot ALTER, makes the table be rebuilt instead; rows are copied with the new
+    columns at their server defaults. Returns the number of tables changed.
+    """
+    conn = session.connection()
+    changed = 0
+    for table in tables:
+        if not _has_table(conn, table.name):
+            continue
+        live = _columns(conn, table.name)
+        missing = [c for c in table.columns if c.name not in live]
+        if not missing:
+            continue
+        keyed = {c.name for con in table.constraints if isinstance(con, UniqueConstraint) for c in con.columns}
+        if any(c.name in keyed or (not c.nullable and c.server_default is None) for c in missing):
+            _rebuild(conn, table)
+        else:
+            for column in missing:
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}')
+        changed += 1
+    session.commit()
+    return changed
+
+
+def add_autoincrement(session, tables: Iterable, batch_size: int = 50_000,
+                      progress: Optional[Callable[[str, int], None]] = None) -> int:
+    """Give the live `tables` the AUTOINCREMENT primary key their definitions declare.
+
+    Without it SQLite hands out max(id) + 1, so the id of a deleted newest row is used again
+    and an id watermark (services/export.py) misses the new row. SQLite cannot add the
+    keyword in place: each table is copied into a new table in id order, `batch_size` rows
+    per transaction, keeping its ids, then swapped in; the copy resumes where it stopped if
+    interrupted. Indexes are left to ensure_indexes() and triggers to whoever owns them.
+
+    Returns the number of rows copied.
+    """
+    conn = session.connection()
+    copied = 0
+    for table in tables:
+        name = table.name
+        staging = f"_new_{name}"
+        if not _has_table(conn, staging):
+            if not _has_table(conn, name) or "AUTOINCREMENT" in _table_sql(conn, name).upper():
+                continue
+            _create_staging(conn, table, staging)
+            session.commit()
+            conn = session.connection()
+        cols = ", ".join(f'"{c.name}"' for c in table.columns)
+        copy = f'INSERT INTO "{staging}" ({cols}) SELECT {cols} FROM "{name}" t WHERE t.id > ? ORDER BY t.id LIMIT ?'
+        copied = _copy_and_swap(session, name, staging, copy, (), batch_size, progress, copied)
+        conn = session.connection()
+    return copied
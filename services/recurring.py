@@ -0,0 +1,312 @@
+"""Incremental detection of recurring charges (subscriptions, rent, regular bills).
+
+Expenses are grouped into series by (household, category, amount bucket); a bucket spans
+amounts within about BUCKET_RATIO of each other, so a fixed-price subscription always lands
+in the same one. Each series row keeps its row count and amount total, and the dates of its
+WINDOW most recent charges. Whenever a series changes its cadence is re-derived from those
+dates alone, so a write costs the same bounded work however long the history is.
+
+Writers call `add_change()` / `apply_changes()` inside their own session transaction, like
+the summary table, so the series commit (or roll back) together with the Expense rows.
+Deleting a charge that is inside the window while older charges exist beyond it refills the
+window with one query. Rows are keyed by category_id; deleting a category removes its
+series through the foreign key's ON DELETE CASCADE.
+"""
+import calendar
+import json
+import math
+from bisect import insort
+from datetime import date, datetime, timedelta
+from statistics import median
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+BUCKET_RATIO = 1.2
+WINDOW = 12  # most recent charge dates kept per series
+MIN_OCCURRENCES = 3
+KEYS_PER_QUERY = 500
+_LOG_RATIO = math.log(BUCKET_RATIO)
+
+
+class Cadence(NamedTuple):
+    name: str
+    days: float  # nominal interval
+    tolerance: float  # days an interval may be off and still count
+    months: int  # calendar months per interval (0: a fixed number of days)
+
+
+CADENCES = (
+    Cadence("weekly", 7, 1, 0),
+    Cadence("biweekly", 14, 2, 0),
+    Cadence("monthly", 30.44, 3.5, 1),
+    Cadence("quarterly", 91.31, 7, 3),
+    Cadence("yearly", 365.25, 10, 12),
+)
+_BY_NAME = {c.name: c for c in CADENCES}
+
+# (user_id, category_id, bucket) -> [(day, amount, description, +1 insert / -1 delete), ...]
+Changes = Dict[Tuple[int, int, int], List[Tuple[date, float, Optional[str], int]]]
+
+
+def bucket(amount: Optional[float]) -> Optional[int]:
+    """Amount bucket of a charge, or None for amounts that cannot recur (zero, negative)."""
+    if not amount or amount <= 0:
+        return None
+    return int(round(math.log(amount) / _LOG_RATIO))
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def add_change(changes: Changes, user_id: int, category_id: int, when: Optional[datetime], amount: float,
+               description: Optional[str] = None, count: int = 1) -> None:
+    b = bucket(amount)
+    if b is None:
+        return
+    changes.setdefault((user_id, category_id, b), []).append((_day(when or datetime.utcnow()), amount, description, count))
+
+
+# ------------------ CADENCE ------------------
+
+def cadence(dates: Sequence[date]) -> Tuple[Optional[str], Optional[float]]:
+    """(cadence name or None, median interval in days) of ascending charge dates.
+
+    A series is recurring once it has MIN_OCCURRENCES charges whose median interval is
+    within a cadence's tolerance and every interval is too, except for one (a skipped or
+    late charge) when there are at least four.
+    """
+    if len(dates) < 2:
+        return None, None
+    gaps = [(b - a).days for a, b in zip(dates, dates[1:])]
+    interval = float(median(gaps))
+    if len(dates) < MIN_OCCURRENCES:
+        return None, interval
+    for c in CADENCES:
+        if abs(interval - c.days) <= c.tolerance:
+            off = sum(1 for gap in gaps if abs(gap - c.days) > c.tolerance)
+            if off <= (1 if len(gaps) >= 4 else 0):
+                return c.name, interval
+            break
+    return None, interval
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def next_charge(last: date, name: str) -> date:
+    """Expected date of the charge after `last` for cadence `name` (same day of the month
+    for the calendar cadences)."""
+    c = _BY_NAME[name]
+    return _add_months(last, c.months) if c.months else last + timedelta(days=int(c.days))
+
+
+# ------------------ MAINTENANCE ------------------
+
+class _Series:
+    __slots__ = ("count", "total", "dates", "description", "stale")
+
+    def __init__(self, count: int = 0, total: float = 0.0, dates: Optional[List[date]] = None,
+                 description: Optional[str] = None):
+        self.count = count
+        self.total = total
+        self.dates = dates or []
+        self.description = description
+        self.stale = False  # the window lost a date that an older charge should replace
+
+    def add(self, day: date, amount: float, description: Optional[str]) -> None:
+        self.count += 1
+        self.total += amount
+        if len(self.dates) < WINDOW or day > self.dates[0]:
+            newest = not self.dates or day >= self.dates[-1]
+            insort(self.dates, day)
+            if len(self.dates) > WINDOW:
+                del self.dates[0]
+            if newest and description:
+                self.description = description
+
+    def remove(self, day: date, amount: float) -> None:
+        self.count -= 1
+        self.total -= amount
+        if day in self.dates:
+            self.dates.remove(day)
+            self.stale = self.count > len(self.dates)
+
+    def row(self, user_id: int, category_id: int, b: int) -> Dict[str, Any]:
+        name, interval = cadence(self.dates)
+        last = self.dates[-1] if self.dates else None
+        return {
+            "user_id": user_id, "category_id": category_id, "bucket": b,
+            "count": self.count, "total": self.total,
+            "dates": json.dumps([d.isoformat() for d in self.dates]),
+            "description": self.description,
+            "cadence": name, "interval_days": interval,
+            "last_date": last, "next_date": next_charge(last, name) if name else None,
+        }
+
+
+def _refill(session, expense_table, user_id: int, category_id: int, b: int, series: _Series) -> None:
+    # the WINDOW most recent charges of the series, from the (category_id, date) index;
+    # the amount range is a little wider than the bucket and re-checked here
+    lo, hi = BUCKET_RATIO ** (b - 0.5), BUCKET_RATIO ** (b + 0.5)
+    e = expense_table
+    rows = session.execute(
+        select(e.c.date, e.c.amount, e.c.description)
+        .where(e.c.category_id == category_id, e.c.user_id == user_id,
+               e.c.amount >= lo * 0.999, e.c.amount <= hi * 1.001)
+        .order_by(e.c.date.desc()).limit(WINDOW * 2)).all()
+    rows = [r for r in rows if bucket(r[1]) == b][:WINDOW]
+    series.dates = sorted(_day(r[0]) for r in rows)
+    series.description = next((r[2] for r in rows if r[2]), series.description)
+
+
+def _load(session, table, keys) -> Dict[Tuple[int, int, int], _Series]:
+    loaded = {}
+    t = table
+    keys = list(keys)
+    for start in range(0, len(keys), KEYS_PER_QUERY):
+        chunk = keys[start:start + KEYS_PER_QUERY]
+        q = (select(t.c.user_id, t.c.category_id, t.c.bucket, t.c.count, t.c.total, t.c.dates, t.c.description)
+             .where(tuple_(t.c.user_id, t.c.category_id, t.c.bucket).in_(chunk)))
+        for user_id, category_id, b, count, total, dates, description in session.execute(q):
+            days = [date.fromisoformat(d) for d in json.loads(dates or "[]")]
+            loaded[(user_id, category_id, b)] = _Series(count, total, days, description)
+    return loaded
+
+
+def apply_changes(session, series_model, expense_model, changes: Changes) -> None:
+    """Fold a batch of changes into the series rows: one read and one upsert per
+    KEYS_PER_QUERY series touched, plus a refill query per series whose window needs one.
+    Deleted rows must already be flushed."""
+    if not changes:
+        return
+    t = series_model.__table__
+    states = _load(session, t, changes)
+    rows = []
+    for key, items in changes.items():
+        series = states.get(key) or _Series()
+        for day, amount, description, count in items:
+            if count > 0:
+                series.add(day, amount, description)
+            else:
+                series.remove(day, amount)
+        if series.stale:
+            _refill(session, expense_model.__table__, *key, series)
+        rows.append(series.row(*key))
+    stmt = sqlite_insert(t)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "category_id", "bucket"],
+        set_={c: stmt.excluded[c] for c in ("count", "total", "dates", "description", "cadence", "interval_days",
+                                            "last_date", "next_date")},
+    )
+    session.execute(stmt, rows)
+    if any(row["count"] <= 0 for row in rows):
+        session.execute(delete(t).where(t.c.count <= 0))
+
+
+def apply_change(session, series_model, expense_model, user_id: int, category_id: int, when: Optional[datetime],
+                 amount: float, description: Optional[str] = None, count: int = 1) -> None:
+    changes: Changes = {}
+    add_change(changes, user_id, category_id, when, amount, description, count)
+    apply_changes(session, series_model, expense_model, changes)
+
+
+def _expected(session, expense_model, user_id: Optional[int] = None) -> Dict[Tuple[int, int, int], _Series]:
+    e = expense_model.__table__
+    q = select(e.c.user_id, e.c.category_id, e.c.amount, e.c.date, e.c.description).order_by(e.c.date, e.c.id)
+    if user_id is not None:
+        q = q.where(e.c.user_id == user_id)
+    states: Dict[Tuple[int, int, int], _Series] = {}
+    for uid, category_id, amount, when, description in session.execute(q):
+        b = bucket(amount)
+        if b is not None and when is not None:
+            states.setdefault((uid, category_id, b), _Series()).add(_day(when), amount, description)
+    return states
+
+
+def rebuild(session, series_model, expense_model, user_id: Optional[int] = None) -> int:
+    """Recompute the series table (or one household's rows) from the raw expenses; returns
+    the number of series written."""
+    t = series_model.__table__
+    rows = [s.row(*key) for key, s in _expected(session, expense_model, user_id).items()]
+    session.execute(delete(t) if user_id is None else delete(t).where(t.c.user_id == user_id))
+    if rows:
+        session.execute(t.insert(), rows)
+    return len(rows)
+
+
+def verify(session, series_model, expense_model) -> List[str]:
+    """Compare the series rows with a recomputation from the raw expenses; return drift descriptions."""
+    t = series_model.__table__
+    actual = {
+        (user_id, category_id, b): (count, total, json.loads(dates or "[]"))
+        for user_id, category_id, b, count, total, dates in session.execute(
+            select(t.c.user_id, t.c.category_id, t.c.bucket, t.c.count, t.c.total, t.c.dates))
+    }
+    expected = {
+        key: (s.count, s.total, [d.isoformat() for d in s.dates])
+        for key, s in _expected(session, expense_model).items()
+    }
+    drift = []
+    for key in sorted(set(actual) | set(expected)):
+        exp = expected.get(key, (0, 0.0, []))
+        act = actual.get(key, (0, 0.0, []))
+        if exp[0] != act[0] or abs(exp[1] - act[1]) > 0.005 or exp[2] != act[2]:
+            user_id, category_id, b = key
+            drift.append(f"user {user_id} category {category_id} bucket {b}: expected {exp[0]} rows "
+                         f"(last {exp[2][-1:] or '-'}), found {act[0]} (last {act[2][-1:] or '-'})")
+    return drift
+
+
+# ------------------ READS ------------------
+
+def detected(session, series_model, user_id: int, today: Optional[date] = None,
+             include_lapsed: bool = False) -> List[Dict[str, Any]]:
+    """The household's recurring series, next expected charge first.
+
+    A series has lapsed when its next charge is overdue by more than twice its cadence's
+    tolerance; those are left out unless `include_lapsed`.
+    """
+    today = today or datetime.utcnow().date()
+    t = series_model.__table__
+    c = next(iter(t.c.category_id.foreign_keys)).column.table
+    q = (select(t.c.id, c.c.name, t.c.description, t.c.count, t.c.total, t.c.cadence, t.c.interval_days,
+                t.c.last_date, t.c.next_date)
+         .select_from(t.join(c, t.c.category_id == c.c.id))
+         .where(t.c.user_id == user_id, t.c.cadence.isnot(None)))
+    out = []
+    for series_id, category, description, count, total, name, interval, last, upcoming in session.execute(q):
+        cad = _BY_NAME[name]
+        lapsed = today > upcoming + timedelta(days=2 * cad.tolerance)
+        if lapsed and not include_lapsed:
+            continue
+        amount = total / count
+        out.append({
+            "id": series_id,
+            "category": category,
+            "description": description,
+            "cadence": name,
+            "interval_days": interval,
+            "amount": round(amount, 2),
+            "monthly_cost": round(amount * 30.44 / cad.days, 2),
+            "count": count,
+            "last_date": last.isoformat(),
+            "next_date": upcoming.isoformat(),
+            "lapsed": lapsed,
+        })
+    out.sort(key=lambda s: (s["next_date"], s["category"]))
+    return out
+
+
+def monthly_cost(series: Sequence[Dict[str, Any]]) -> Dict[str, float]:
+    """{category: monthly cost} of the active series in `series`."""
+    out: Dict[str, float] = {}
+    for s in series:
+        if not s["lapsed"]:
+            out[s["category"]] = round(out.get(s["category"], 0.0) + s["monthly_cost"], 2)
+    return out
@@ -0,0 +1,129 @@
+"""Full-text search over transaction descriptions, backed by SQLite FTS5.
+
+Each transaction table gets an external-content FTS5 index, `<table>_fts`, over its
+`description` and `user_id` columns: the text stays in the table and the index holds only
+the tokens. Triggers keep the index in step with every INSERT, DELETE (including ON DELETE
+CASCADE from a category) and UPDATE of those columns, so writers do not need to know about
+it. Rows without a description are not indexed.
+
+`user_id` is indexed as a column and every query is ANDed with it, so a search walks the
+intersection of the household's doclist with the terms' instead of every household's
+matches; bm25 ranking gives that column no weight. Terms are matched as prefixes
+("star" finds "Starbucks"), with 2- and 3-character prefix indexes for short input.
+"""
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import column, func, literal_column, select, table as table_clause
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_TERMS = 8
+SORTS = ("rank", "date")
+
+_TERM = re.compile(r"\w+")
+
+
+def fts_name(table_name: str) -> str:
+    return f"{table_name}_fts"
+
+
+def schema(table_name: str) -> List[str]:
+    """DDL for `table_name`'s index and sync triggers (all IF NOT EXISTS)."""
+    fts = fts_name(table_name)
+    delete_old = (f"INSERT INTO {fts} ({fts}, rowid, description, user_id) "
+                  f"SELECT 'delete', old.id, old.description, old.user_id WHERE old.description IS NOT NULL;")
+    insert_new = (f"INSERT INTO {fts} (rowid, description, user_id) "
+                  f"SELECT new.id, new.description, new.user_id WHERE new.description IS NOT NULL;")
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(description, user_id, content='{table_name}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF description, user_id ON {table_name} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def ensure_index(session, table_names: Iterable[str]) -> int:
+    """Create the indexes and triggers that are missing; returns the number of rows indexed.
+
+    A new index is filled from the table's described rows in one statement, the same rows
+    the triggers would have added.
+    """
+    conn = session.connection()
+    indexed = 0
+    for name in table_names:
+        fts = fts_name(name)
+        exists = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)).first()
+        for statement in schema(name):
+            conn.exec_driver_sql(statement)
+        if not exists:
+            indexed += conn.exec_driver_sql(
+                f"INSERT INTO {fts} (rowid, description, user_id) "
+                f"SELECT id, description, user_id FROM {name} WHERE description IS NOT NULL"
+            ).rowcount
+    session.commit()
+    return indexed
+
+
+def match_expression(text: Optional[str], user_id: int) -> Optional[str]:
+    """FTS5 query for `text` within one household, or None if `text` has no searchable terms.
+
+    Input is reduced to word characters, so FTS5 syntax in it is never interpreted; every
+    term must match as a prefix.
+    """
+    terms = _TERM.findall(text or "")[:MAX_TERMS]
+    if not terms:
+        return None
+    return f"user_id : {int(user_id)} AND " + " AND ".join(f'"{term}"*' for term in terms)
+
+
+def search(session, tables: Dict[str, Any], category_table, user_id: int, text: str,
+           category_id: Optional[int] = None, min_amount: Optional[float] = None,
+           max_amount: Optional[float] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+           sort: str = "rank", limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+    """Transactions of household `user_id` whose description matches `text`, best match first.
+
+    `tables` maps a kind ("expense"/"income") to its table; results from several are merged.
+    The amount bounds are inclusive, `start` inclusive and `end` exclusive. `sort` is "rank"
+    (bm25) or "date" (newest first). Raises ValueError on bad arguments.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(SORTS)}")
+    match = match_expression(text, user_id)
+    if match is None:
+        raise ValueError("q must contain at least one word")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    hits = []
+    for kind, t in tables.items():
+        fts = table_clause(fts_name(t.name), column("rowid"))
+        index = literal_column(fts.name)
+        score = func.bm25(index, 1.0, 0.0).label("score")
+        # the MATCH has to drive the query: with the columns written as `x + 0` the planner cannot
+        # walk the (user_id, ...) / (category_id, ...) indexes instead and re-run the MATCH per row
+        q = (select(t.c.id, category_table.c.name, t.c.description, t.c.amount, t.c.date, score)
+             .select_from(fts.join(t, t.c.id == fts.c.rowid).join(category_table, category_table.c.id == t.c.category_id))
+             .where(index.op("MATCH")(match), t.c.user_id + 0 == user_id))
+        if category_id is not None:
+            q = q.where(t.c.category_id + 0 == category_id)
+        if min_amount is not None:
+            q = q.where(t.c.amount >= min_amount)
+        if max_amount is not None:
+            q = q.where(t.c.amount <= max_amount)
+        if start is not None:
+            q = q.where(t.c.date >= start)
+        if end is not None:
+            q = q.where(t.c.date < end)
+        q = q.order_by(score, t.c.id.desc()) if sort == "rank" else q.order_by(t.c.date.desc(), t.c.id.desc())
+        for txn_id, category, description, amount, date, rank in session.execute(q.limit(limit)):
+            hits.append({"id": txn_id, "type": kind, "category": category, "description": description,
+                         "amount": amount, "date": date, "score": round(-rank, 4)})
+
+    if sort == "rank":
+        hits.sort(key=lambda h: (-h["score"], -h["id"]))
+    else:
+        hits.sort(key=lambda h: (h["date"] or datetime.min, h["id"]), reverse=True)
+    return hits[:limit]
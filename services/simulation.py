@@ -0,0 +1,235 @@
+"""Monte Carlo cash-flow simulation for the savings advisor.
+
+A household's next `months` months are sampled as `paths` independent sequences of monthly
+cash flows. In every simulated month each expense category's total, and the household's
+income, is drawn from that series' own complete months over the last HISTORY_WINDOW (a
+bootstrap: the observed months are the distribution, so no shape is assumed, and a category
+that is zero in some months stays zero in some draws). Categories are drawn independently of
+each other, which spreads the outcomes a little less than months where several categories
+run high together would.
+
+A scenario rescales categories before summing: "current" is the history as it is, and
+"suggested" moves each category with a suggested budget to that budget on average (or to
+a flat monthly amount when the category has no history, e.g. a new rent).
+
+Paths are simulated in CHUNK_PATHS-sized chunks, each with its own generator spawned from
+one `SeedSequence`, so a run is reproducible from its seed and gives the same result
+whether its chunks run in this process or on a process pool of any size.
+"""
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from services.forecast import History
+
+HISTORY_WINDOW = 24  # most recent complete months sampled from
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 120
+DEFAULT_PATHS = 10000
+MAX_PATHS = 100000
+MAX_GOALS = 10
+CHUNK_PATHS = 2048
+PARALLEL_MIN_PATHS = 20000  # smaller runs finish before a pool would pay for itself
+PERCENTILES = (5, 25, 50, 75, 95)
+CURRENT, SUGGESTED = "current", "suggested"
+
+
+class Model(NamedTuple):
+    categories: List[str]
+    expenses: np.ndarray  # (categories, months) historical monthly totals, the bootstrap sample
+    income: np.ndarray  # (months,) historical monthly income
+    scenarios: List[str]
+    scales: np.ndarray  # (scenarios, categories) multiplier on each category's draws
+    fixed: np.ndarray  # (scenarios,) flat monthly spend of budgets without history
+
+
+# ------------------ MODEL ------------------
+
+def _window(history: History, start: int, end: int) -> np.ndarray:
+    # totals of absolute months start..end-1, zero before the history begins
+    out = np.zeros((history.totals.shape[0], end - start))
+    lo = max(start, history.first_month)
+    if lo < end:
+        out[:, lo - start:] = history.totals[:, lo - history.first_month:end - history.first_month]
+    return out
+
+
+def build_model(expenses: History, income: History, suggested: Optional[Dict[str, float]] = None,
+                window: int = HISTORY_WINDOW) -> Model:
+    """Sample matrix and scenarios from `forecast.load_history()` results for both kinds.
+
+    Both histories must end at the same (current, incomplete) month, which is left out.
+    Raises ValueError if the household has no complete month of history.
+    """
+    end = expenses.first_month + expenses.totals.shape[1] - 1
+    if income.first_month + income.totals.shape[1] - 1 != end:
+        raise ValueError("histories must end at the same month")
+    firsts = [h.first_month for h in (expenses, income) if h.categories]
+    start = max(min(firsts, default=end), end - window)
+    if end - start < 1:
+        raise ValueError("at least one complete month of history is needed")
+
+    sample = _window(expenses, start, end)
+    scenarios = [CURRENT]
+    scales = [np.ones(len(expenses.categories))]
+    fixed = [0.0]
+    if suggested:
+        means = sample.mean(axis=1)
+        index = {c: i for i, c in enumerate(expenses.categories)}
+        scale = np.ones(len(expenses.categories))
+        flat = 0.0
+        for category, budget in suggested.items():
+            i = index.get(category)
+            if i is not None and means[i] > 0:
+                scale[i] = float(budget) / means[i]
+            else:
+                flat += float(budget)
+        scenarios.append(SUGGESTED)
+        scales.append(scale)
+        fixed.append(flat)
+    return Model(list(expenses.categories), sample, _window(income, start, end).sum(axis=0),
+                 scenarios, np.array(scales), np.array(fixed))
+
+
+# ------------------ SAMPLING ------------------
+
+def _run_chunk(model: Model, months: int, starting_balance: float, paths: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Balance after each month, shape (scenarios, paths, months), for one chunk of paths."""
+    rng = np.random.default_rng(seed)
+    k, n = model.expenses.shape
+    income = model.income[rng.integers(0, n, size=(paths, months))]
+    out = np.empty((len(model.scenarios), paths, months), dtype=np.float32)
+    if k:
+        # one draw per (path, month, category), looked up in the flattened (category, month) matrix
+        draws = rng.integers(0, n, size=(paths, months, k)) + np.arange(k) * n
+        spend = model.expenses.ravel()[draws]
+    for s in range(len(model.scenarios)):
+        net = income - model.fixed[s]
+        if k:
+            net = net - np.einsum("pmk,k->pm", spend, model.scales[s])
+        out[s] = starting_balance + np.cumsum(net, axis=1)
+    return out
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    # one long-lived pool; "spawn" because the web process is multi-threaded and fork would
+    # copy whatever locks its other threads happen to hold
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def sample(model: Model, months: int, paths: int, seed: int, starting_balance: float = 0.0,
+           workers: int = 1) -> np.ndarray:
+    """Balance after each month for every path, shape (scenarios, paths, months).
+
+    With `workers` > 1 and at least PARALLEL_MIN_PATHS paths the chunks run on a process pool.
+    """
+    sizes = [CHUNK_PATHS] * (paths // CHUNK_PATHS) + ([paths % CHUNK_PATHS] if paths % CHUNK_PATHS else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    run = partial(_run_chunk, model, months, float(starting_balance))
+    if workers > 1 and paths >= PARALLEL_MIN_PATHS:
+        chunks = list(_executor(workers).map(run, sizes, seeds))
+    else:
+        chunks = [run(size, s) for size, s in zip(sizes, seeds)]
+    return np.concatenate(chunks, axis=1)
+
+
+# ------------------ SUMMARY ------------------
+
+def _bands(values: np.ndarray, axis: int = 0) -> Dict[str, Any]:
+    qs = np.percentile(values, PERCENTILES, axis=axis)
+    return {f"p{p}": np.round(q, 2).tolist() for p, q in zip(PERCENTILES, qs)}
+
+
+def _goals(balance: np.ndarray, goals: Sequence[float]) -> List[Dict[str, Any]]:
+    out = []
+    for goal in goals:
+        hit = balance >= goal
+        reached = hit.any(axis=1)
+        first = hit.argmax(axis=1)[reached] + 1  # months until the balance first reaches the goal
+        out.append({
+            "amount": goal,
+            "probability": round(float(reached.mean()), 4),
+            "median_months": int(np.median(first)) if first.size else None,
+        })
+    return out
+
+
+def budget_bands(model: Model, suggested: Dict[str, float]) -> List[Dict[str, Any]]:
+    """How each suggested budget compares with that category's historical monthly spend:
+    percentile bands and the share of months it would have covered."""
+    index = {c: i for i, c in enumerate(model.categories)}
+    out = []
+    for category, budget in sorted(suggested.items()):
+        i = index.get(category)
+        if i is None:
+            out.append({"category": category, "budget": float(budget), "history": None, "covered": None})
+            continue
+        row = model.expenses[i]
+        out.append({
+            "category": category,
+            "budget": float(budget),
+            "history": _bands(row),
+            "covered": round(float((row <= budget).mean()), 4),
+        })
+    return out
+
+
+def simulate(model: Model, months: int = DEFAULT_MONTHS, paths: int = DEFAULT_PATHS, seed: Optional[int] = None,
+             goals: Sequence[float] = (), starting_balance: float = 0.0, workers: int = 1) -> Dict[str, Any]:
+    """Run the simulation and summarize it per scenario.
+
+    Each scenario gets the monthly net cash flow and the balance after each month as
+    percentile bands, the final balance's bands, the probability that the balance goes
+    below zero at some point, and for each goal the probability of reaching it within
+    `months` (and the median month it is first reached). Without `seed` a random one is
+    chosen; it is returned so the run can be repeated. Raises ValueError on bad arguments.
+    """
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"months must be between 1 and {MAX_MONTHS}")
+    if not 1 <= paths <= MAX_PATHS:
+        raise ValueError(f"paths must be between 1 and {MAX_PATHS}")
+    if len(goals) > MAX_GOALS:
+        raise ValueError(f"at most {MAX_GOALS} goals")
+    if any(goal <= 0 for goal in goals):
+        raise ValueError("goals must be positive amounts")
+    if seed is None:
+        seed = secrets.randbits(32)
+    elif seed < 0:
+        raise ValueError("seed must not be negative")
+
+    balances = sample(model, months, paths, seed, starting_balance, workers)
+    scenarios = {}
+    for name, balance in zip(model.scenarios, balances):
+        net = np.diff(balance, axis=1, prepend=np.float32(starting_balance))
+        scenarios[name] = {
+            "monthly_net": _bands(net.ravel()),
+            "balance": _bands(balance),
+            "final": _bands(balance[:, -1]),
+            "shortfall": round(float((balance.min(axis=1) < 0).mean()), 4),
+            "goals": _goals(balance, goals),
+        }
+    return {
+        "seed": seed,
+        "paths": paths,
+        "months": months,
+        "history_months": int(model.expenses.shape[1]),
+        "starting_balance": starting_balance,
+        "scenarios": scenarios,
+    }
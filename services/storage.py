@@ -0,0 +1,138 @@
+"""SQLite storage profiles.
+
+Every profile turns on foreign key enforcement, which SQLite leaves off per connection
+unless asked; the schema relies on it for ON DELETE CASCADE.
+
+STORAGE_PROFILE=default otherwise keeps SQLAlchemy's stock settings. STORAGE_PROFILE=production
+is meant for multi-threaded / multi-process servers:
+
+- WAL journal, so readers never block the writer and the writer never blocks readers,
+  with synchronous=NORMAL (durable across application crashes; an OS crash may lose the
+  last transactions but never corrupts the file);
+- a larger page cache and memory-mapped reads (SQLITE_CACHE_KIB, SQLITE_MMAP_BYTES);
+- a busy timeout (SQLITE_BUSY_TIMEOUT_MS) instead of failing immediately with
+  "database is locked";
+- transactions begun inside `immediate()` (the app's write routes, the transaction writer and
+  imports) use BEGIN IMMEDIATE, which takes the write lock up front. A deferred transaction
+  that reads first and then writes can fail with SQLITE_BUSY without waiting, if another
+  writer committed in between. Everything else, including read-mostly POSTs and the
+  advisor's pool threads, stays deferred so it never holds the write lock;
+- a bounded, pre-pinged connection pool (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT),
+  discarded in forked children so worker processes never share connections.
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: the development server is a single process anyway
+    fcntl = None
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ("default", "production")
+
+_immediate: ContextVar[bool] = ContextVar("sqlite_begin_immediate", default=False)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def is_sqlite(uri: str) -> bool:
+    return make_url(uri).get_backend_name() == "sqlite"
+
+
+def engine_options(uri: str, profile: str) -> Dict[str, Any]:
+    """Options for create_engine() (SQLALCHEMY_ENGINE_OPTIONS) under `profile`."""
+    if profile != "production":
+        return {}
+    options: Dict[str, Any] = {
+        "pool_size": _env_int("DB_POOL_SIZE", 10),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_pre_ping": True,
+    }
+    if is_sqlite(uri):
+        # connections move between the pool's threads; the busy timeout itself is set as a pragma
+        options["connect_args"] = {"check_same_thread": False, "timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 10000) / 1000.0}
+    return options
+
+
+def pragmas() -> Dict[str, Any]:
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 10000),
+        "cache_size": -_env_int("SQLITE_CACHE_KIB", 64 * 1024),
+        "mmap_size": _env_int("SQLITE_MMAP_BYTES", 256 * 1024 * 1024),
+        "temp_store": "MEMORY",
+        # keep the WAL file from growing without bound between checkpoints
+        "wal_autocheckpoint": 1000,
+    }
+
+
+def configure_engine(engine, profile: str) -> None:
+    """Install the connection hooks for `profile` on `engine` (before its first connection)."""
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys = ON")
+            cursor.close()
+
+    if profile != "production":
+        return
+    if engine.dialect.name == "sqlite":
+        settings = pragmas()
+
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            # let SQLAlchemy's "begin" hook below issue BEGIN itself (pysqlite's implicit one is always DEFERRED)
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for name, value in settings.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.close()
+
+        @event.listens_for(engine, "begin")
+        def _on_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE" if _immediate.get() else "BEGIN")
+
+    if hasattr(os, "register_at_fork"):
+        # connections inherited from a pre-fork parent must not be reused by the child
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+@contextmanager
+def immediate() -> Iterator[None]:
+    """Begin the transactions opened inside this block (or decorated function) with BEGIN
+    IMMEDIATE under the production profile. Enter it before the unit of work's first
+    statement: a transaction that is already open keeps the mode it began with."""
+    token = _immediate.set(True)
+    try:
+        yield
+    finally:
+        _immediate.reset(token)
+
+
+@contextmanager
+def init_lock(engine) -> Iterator[None]:
+    """Hold an exclusive lock (a file next to the SQLite database) while one process initializes
+    the schema; concurrently starting workers wait for it and then find the work done."""
+    database = engine.url.database if engine.dialect.name == "sqlite" else None
+    if fcntl is None or not database or database == ":memory:":
+        yield
+        return
+    with open(database + ".init-lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,114 @@
+"""Maintenance and reads for the per-category/per-month summary table.
+
+Writers call `apply_delta()` / `apply_deltas()` inside their own session transaction so
+the summary commits (or rolls back) together with the raw Expense/Income rows. Rows are keyed
+by category_id; deleting a category removes its rows through the foreign key's ON DELETE CASCADE.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+import services.aggregates as aggregates
+
+# (user_id, kind, category_id, 'YYYY-MM') -> (amount delta, row-count delta)
+Deltas = Dict[Tuple[int, str, int, str], Tuple[float, int]]
+
+
+def month_key(date: Optional[datetime]) -> str:
+    return (date or datetime.utcnow()).strftime('%Y-%m')
+
+
+def _category_table(summary_table):
+    # the table category_id points at, so reads can return names without a category_model argument
+    return next(iter(summary_table.c.category_id.foreign_keys)).column.table
+
+
+def add_delta(deltas: Deltas, user_id: int, kind: str, category_id: int, date: Optional[datetime], amount: float,
+              count: int = 1) -> None:
+    key = (user_id, kind, category_id, month_key(date))
+    total, n = deltas.get(key, (0.0, 0))
+    deltas[key] = (total + amount, n + count)
+
+
+def apply_deltas(session, summary_model, deltas: Deltas) -> None:
+    """Upsert a batch of deltas in one executemany and drop any rows that emptied out."""
+    if not deltas:
+        return
+    table = summary_model.__table__
+    rows = [
+        {'user_id': user_id, 'kind': kind, 'category_id': category_id, 'month': month, 'total': total, 'count': count}
+        for (user_id, kind, category_id, month), (total, count) in deltas.items()
+    ]
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'kind', 'category_id', 'month'],
+        set_={'total': table.c.total + stmt.excluded.total, 'count': table.c.count + stmt.excluded.count},
+    )
+    session.execute(stmt, rows)
+    if any(count < 0 for _, count in deltas.values()):
+        session.execute(delete(table).where(table.c.count <= 0))
+
+
+def apply_delta(session, summary_model, user_id: int, kind: str, category_id: int, date: Optional[datetime],
+                amount: float, count: int = 1) -> None:
+    deltas: Deltas = {}
+    add_delta(deltas, user_id, kind, category_id, date, amount, count)
+    apply_deltas(session, summary_model, deltas)
+
+
+# ------------------ READS ------------------
+
+def category_totals(session, summary_model, user_id: int, kind: str, month: Optional[str] = None) -> Dict[str, float]:
+    """{category name: total} across all months (or a single 'YYYY-MM' month)."""
+    t = summary_model.__table__
+    c = _category_table(t)
+    q = (select(c.c.name, func.sum(t.c.total)).select_from(t.join(c, t.c.category_id == c.c.id))
+         .where(t.c.user_id == user_id, t.c.kind == kind))
+    if month is not None:
+        q = q.where(t.c.month == month)
+    q = q.group_by(t.c.category_id).order_by(c.c.name)
+    return {cat: float(total or 0) for cat, total in session.execute(q)}
+
+
+# ------------------ REBUILD / VERIFY ------------------
+
+def _expected(session, models: Dict[str, object]) -> Deltas:
+    expected = {}
+    for kind, model in models.items():
+        for user_id, month, cat, total, count in aggregates.monthly_rollup(session, model):
+            expected[(user_id, kind, cat, month)] = (float(total or 0), int(count))
+    return expected
+
+
+def verify(session, summary_model, models: Dict[str, object], tolerance: float = 0.005) -> List[str]:
+    """Compare the summary table with totals recomputed from the raw rows; return drift descriptions."""
+    t = summary_model.__table__
+    actual = {
+        (user_id, kind, cat, month): (float(total or 0), int(count or 0))
+        for user_id, kind, cat, month, total, count in session.execute(
+            select(t.c.user_id, t.c.kind, t.c.category_id, t.c.month, t.c.total, t.c.count))
+    }
+    expected = _expected(session, models)
+    drift = []
+    for key in sorted(set(actual) | set(expected), key=lambda k: tuple(str(p) for p in k)):
+        exp = expected.get(key, (0.0, 0))
+        act = actual.get(key, (0.0, 0))
+        if abs(exp[0] - act[0]) > tolerance or exp[1] != act[1]:
+            user_id, kind, cat, month = key
+            drift.append(f"user {user_id} {kind} category {cat} {month}: expected {exp[0]:.2f} ({exp[1]} rows), found {act[0]:.2f} ({act[1]} rows)")
+    return drift
+
+
+def rebuild(session, summary_model, models: Dict[str, object]) -> int:
+    """Recompute the whole summary table from raw rows; returns the number of summary rows written."""
+    t = summary_model.__table__
+    rows = [
+        {'user_id': user_id, 'kind': kind, 'category_id': cat, 'month': month, 'total': total, 'count': count}
+        for (user_id, kind, cat, month), (total, count) in _expected(session, models).items()
+    ]
+    session.execute(delete(t))
+    if rows:
+        session.execute(t.insert(), rows)
+    return len(rows)
@@ -0,0 +1,226 @@
+"""Per-category totals over time, for the dashboard's line chart.
+
+`series()` sums a household's rows per category into day, week (starting Monday) or month
+buckets in SQL, so only one row per category per bucket leaves the database. Month buckets
+over whole months are read from the summary table instead of the raw rows. Series longer
+than `points` buckets are reduced with Largest-Triangle-Three-Buckets (LTTB), which keeps
+the peaks and dips a line chart needs; the smaller categories are folded into "Other".
+
+The result is array-encoded to keep it small: each series is a list of values, one per
+bucket counted from `start`. A downsampled series also carries `x`, the bucket offsets of
+the values it kept. A payload stays at roughly `points` x `categories` numbers whether the
+range covers a month or ten years.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+
+BUCKETS = ("day", "week", "month")
+AUTO = "auto"
+DEFAULT_POINTS = 120
+MAX_POINTS = 1000
+MAX_BUCKETS = 10_000  # ~27 years of days; each category's values are built at full length before LTTB
+DEFAULT_CATEGORIES = 8
+MAX_CATEGORIES = 50
+OTHER = "Other"
+
+
+# ------------------ BUCKETS ------------------
+
+def bucket_start(day: date, bucket: str) -> date:
+    """First day of the bucket containing `day`."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_index(day: date, origin: date, bucket: str) -> int:
+    """Offset of `day`'s bucket from the bucket starting at `origin`."""
+    if bucket == "month":
+        return (day.year - origin.year) * 12 + day.month - origin.month
+    days = (day - origin).days
+    return days // 7 if bucket == "week" else days
+
+
+def next_bucket(day: date, bucket: str) -> date:
+    """First day of the bucket after the one containing `day`."""
+    first = bucket_start(day, bucket)
+    if bucket == "month":
+        return date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first + timedelta(days=7 if bucket == "week" else 1)
+
+
+def pick_bucket(start: date, end: date, points: int) -> str:
+    """The finest bucket that covers start..end (exclusive) in at most `points` buckets."""
+    span = (end - start).days
+    if span <= points:
+        return "day"
+    if span <= points * 7:
+        return "week"
+    return "month"
+
+
+def _bucket_expr(column, bucket: str):
+    # 'YYYY-MM-DD' of the bucket's first day; same rules as bucket_start()
+    if bucket == "week":
+        return func.date(column, "-6 days", "weekday 1")
+    if bucket == "month":
+        return func.strftime("%Y-%m-01", column)
+    return func.date(column)
+
+
+# ------------------ DOWNSAMPLING ------------------
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> Tuple[List[float], List[float]]:
+    """Largest-Triangle-Three-Buckets: `threshold` of the (x, y) points, first and last included.
+
+    The points between the ends are split into threshold - 2 equal runs; from each run the
+    point forming the largest triangle with the previously kept point and the average of
+    the next run is kept.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+    out_x, out_y = [xs[0]], [ys[0]]
+    every = (n - 2) / (threshold - 2)
+    kept = 0
+    for i in range(threshold - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        ax, ay = xs[kept], ys[kept]
+        best, best_area = -1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        kept = best
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+
+# ------------------ READS ------------------
+
+def date_range(session, model, user_id: int) -> Optional[Tuple[date, date]]:
+    """(first day, day after the last) of the household's `model` rows, or None without rows."""
+    # two queries: SQLite answers a lone MIN()/MAX() from the (user_id, date) index in one
+    # probe, but scans the household's rows when both share a SELECT
+    first = session.execute(select(func.min(model.date)).where(model.user_id == user_id)).scalar()
+    last = session.execute(select(func.max(model.date)).where(model.user_id == user_id)).scalar()
+    if first is None:
+        return None
+    return first.date(), last.date() + timedelta(days=1)
+
+
+def _raw_buckets(session, model, user_id, category_ids, start, end, bucket):
+    b = _bucket_expr(model.date, bucket)
+    q = (select(model.category_id, b, func.sum(model.amount))
+         .where(model.user_id == user_id,
+                model.date >= datetime.combine(start, datetime.min.time()),
+                model.date < datetime.combine(end, datetime.min.time()))
+         .group_by(model.category_id, b))
+    if category_ids is not None:
+        q = q.where(model.category_id.in_(category_ids))
+    return ((cid, date.fromisoformat(day), total) for cid, day, total in session.execute(q))
+
+
+def _summary_buckets(session, summary_model, kind, user_id, category_ids, start, end):
+    t = summary_model.__table__
+    q = (select(t.c.category_id, t.c.month, t.c.total)
+         .where(t.c.user_id == user_id, t.c.kind == kind,
+                t.c.month >= start.strftime("%Y-%m"), t.c.month < end.strftime("%Y-%m")))
+    if category_ids is not None:
+        q = q.where(t.c.category_id.in_(category_ids))
+    return ((cid, date.fromisoformat(month + "-01"), total) for cid, month, total in session.execute(q))
+
+
+def series(session, model, category_model, user_id: int, start: Optional[date] = None, end: Optional[date] = None,
+           bucket: str = AUTO, points: int = DEFAULT_POINTS, categories: int = DEFAULT_CATEGORIES,
+           names: Optional[Sequence[str]] = None, summary_model=None, kind: Optional[str] = None) -> Dict[str, Any]:
+    """Per-category series of `model` rows for household `user_id` over start..end (end exclusive).
+
+    `start`/`end` default to the household's first and last rows. `bucket` is "day", "week",
+    "month" or "auto" (the finest with at most `points` buckets). Only the `categories`
+    largest categories get their own series, the rest are summed into "Other"; `names`
+    restricts the chart to those categories instead. With `summary_model` (and `kind`),
+    month buckets covering whole months come from the summary table.
+    Raises ValueError on bad arguments, including a range of more than MAX_BUCKETS buckets.
+    """
+    if bucket != AUTO and bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join((AUTO,) + BUCKETS)}")
+    if not 3 <= points <= MAX_POINTS:
+        raise ValueError(f"points must be between 3 and {MAX_POINTS}")
+    if not 1 <= categories <= MAX_CATEGORIES:
+        raise ValueError(f"categories must be between 1 and {MAX_CATEGORIES}")
+    given = start, end
+    if start is None or end is None:
+        found = date_range(session, model, user_id)
+        if found is None:
+            found = (date.today(), date.today() + timedelta(days=1))
+        start, end = start or found[0], end or found[1]
+    if end <= start:
+        raise ValueError("end must be after start")
+    if bucket == AUTO:
+        bucket = pick_bucket(start, end, points)
+    # a defaulted bound has no rows beyond it, so widen it to whole buckets
+    if given[0] is None:
+        start = bucket_start(start, bucket)
+    if given[1] is None:
+        end = next_bucket(end - timedelta(days=1), bucket)
+
+    category_ids = None
+    id_names = dict(session.execute(
+        select(category_model.id, category_model.name).where(category_model.user_id == user_id)
+    ).all())
+    if names is not None:
+        wanted = set(names)
+        category_ids = [cid for cid, name in id_names.items() if name in wanted]
+
+    origin = bucket_start(start, bucket)
+    length = bucket_index(end - timedelta(days=1), origin, bucket) + 1
+    if length > MAX_BUCKETS:
+        raise ValueError(f"{start}..{end} spans {length:,} {bucket} buckets (at most {MAX_BUCKETS:,}); "
+                         f"use a coarser bucket or a shorter range")
+    if (bucket == "month" and summary_model is not None and kind is not None
+            and start.day == 1 and end.day == 1):
+        rows = _summary_buckets(session, summary_model, kind, user_id, category_ids, start, end)
+    else:
+        rows = _raw_buckets(session, model, user_id, category_ids, start, end, bucket)
+
+    values: Dict[int, List[float]] = {}
+    for cid, day, total in rows:
+        values.setdefault(cid, [0.0] * length)[bucket_index(day, origin, bucket)] += float(total or 0)
+
+    ranked = sorted(values, key=lambda cid: (-sum(values[cid]), id_names.get(cid, "")))
+    if names is None and len(ranked) > categories:
+        other = [0.0] * length
+        for cid in ranked[categories - 1:]:
+            other = [a + b for a, b in zip(other, values[cid])]
+        ranked = ranked[:categories - 1]
+        named = [(id_names.get(cid, str(cid)), values[cid]) for cid in ranked] + [(OTHER, other)]
+    else:
+        named = [(id_names.get(cid, str(cid)), values[cid]) for cid in ranked]
+
+    out = []
+    for name, ys in named:
+        entry = {"name": name, "total": round(sum(ys), 2)}
+        if length > points:
+            xs, ys = lttb(range(length), ys, points)
+            entry["x"] = list(xs)
+        entry["y"] = [round(y, 2) for y in ys]
+        out.append(entry)
+    return {
+        "bucket": bucket,
+        "start": origin.isoformat(),
+        "end": end.isoformat(),
+        "length": length,
+        "downsampled": length > points,
+        "series": out,
+    }
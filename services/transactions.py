@@ -0,0 +1,62 @@
+import base64
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(date: datetime, id_: int) -> str:
+    raw = f"{date.isoformat()}|{id_}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor(); raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        date_s, id_s = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_s), int(id_s)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def page_transactions(session, model, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                      category_id: Optional[int] = None, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None, user_id: Optional[int] = None) -> Page:
+    """Return one page of `model` rows, newest first, using keyset pagination on (date, id).
+
+    Each page costs an index range scan of `limit` rows regardless of how deep into the
+    history the cursor points, unlike OFFSET which has to skip over every earlier row.
+    With `user_id` the scan runs on the (user_id, date, id) index, so it also does not
+    depend on how many other households share the table.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    q = session.query(model)
+    if user_id is not None:
+        q = q.filter(model.user_id == user_id)
+    if category_id is not None:
+        q = q.filter(model.category_id == category_id)
+    if start is not None:
+        q = q.filter(model.date >= start)
+    if end is not None:
+        q = q.filter(model.date < end)
+    if cursor:
+        c_date, c_id = decode_cursor(cursor)
+        q = q.filter(tuple_(model.date, model.id) < tuple_(c_date, c_id))
+    rows = q.order_by(model.date.desc(), model.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date, last.id)
+    return Page(rows, next_cursor)
@@ -8,15 +8,99 @@ function openTab(tabId) {
     if (tab && content) {
         tab.classList.add("active");
         content.classList.add("active");
-        // Ensure Chart.js recalculates sizes when a hidden tab becomes visible
-        setTimeout(() => { window.dispatchEvent(new Event('resize')); }, 50);
-        // Initialize budget charts when budget tab is activated
-        if (tabId === 'budget' && typeof initBudgetCharts === 'function') {
-            setTimeout(() => initBudgetCharts(), 60);
+        // Tabs other than the one the page was rendered with are fetched on first open; after
+        // that the inserted DOM is the client-side cache and is only revalidated by ETag.
+        if (content.dataset.fragment) {
+            loadFragment(tabId, content).then(changed => { if (!changed) showTab(tabId); });
+        } else {
+            showTab(tabId);
         }
     }
 }
 
+function showTab(tabId){
+    // Ensure Chart.js recalculates sizes when a hidden tab becomes visible
+    setTimeout(() => { window.dispatchEvent(new Event('resize')); }, 50);
+    // Initialize budget charts when budget tab is activated
+    if (tabId === 'budget' && typeof initBudgetCharts === 'function') {
+        setTimeout(() => initBudgetCharts(), 60);
+    }
+}
+
+// Fetches /fragments/<tab> with If-None-Match; resolves true when new HTML was inserted and
+// false when the cached copy is still current (304) or the request failed.
+async function loadFragment(tabId, content){
+    if (content.dataset.loading === '1') return false;
+    content.dataset.loading = '1';
+    const etag = content.dataset.etag;
+    if (!etag) content.innerHTML = '<div class="card"><p class="empty-text">Loading...</p></div>';
+    try {
+        const headers = etag ? { 'If-None-Match': '"' + etag + '"' } : {};
+        const resp = await fetch(content.dataset.fragment, { headers: headers, cache: 'no-store' });
+        if (resp.status === 304 || !resp.ok) return false;
+        content.innerHTML = await resp.text();
+        content.dataset.etag = (resp.headers.get('ETag') || '').replace(/^W\//, '').replace(/"/g, '');
+        runInlineScripts(content);
+        initFragment(tabId, content);
+        return true;
+    } catch (err){
+        console.error('fragment fetch failed', err);
+        return false;
+    } finally {
+        content.dataset.loading = '';
+    }
+}
+
+// Scripts inserted through innerHTML do not run; swap each for a fresh element so they do.
+function runInlineScripts(root){
+    root.querySelectorAll('script').forEach(old => {
+        const script = document.createElement('script');
+        Array.from(old.attributes).forEach(attr => script.setAttribute(attr.name, attr.value));
+        script.textContent = old.textContent;
+        old.replaceWith(script);
+    });
+}
+
+function initFragment(tabId, content){
+    if (tabId === 'dashboard') initTimeseriesChart();
+    if (tabId === 'transactions') initTransactionLists(content);
+    if (tabId === 'budget'){
+        // the fragment replaced the canvases; drop the old charts and draw new ones
+        [window._budget_pie, window._budget_gauge].forEach(chart => { if (chart) chart.destroy(); });
+        window._budget_charts_initialized = false;
+    }
+    showTab(tabId);
+}
+
+// Delegated handlers for buttons inside tab fragments, bound once so reloading a fragment
+// does not add duplicates.
+document.addEventListener('click', function(e){
+    const target = e.target;
+    if (!target || !target.classList) return;
+    if (target.classList.contains('delete-category-btn')){
+        const id = target.dataset.id;
+        if (!confirm('Delete this category and ALL associated expenses, incomes, and budgets? This action cannot be undone.')) return;
+        fetch('/delete-category/' + id, { method: 'POST' })
+            .then(res => { if (res.ok) location.reload(); else alert('Failed to delete'); })
+            .catch(()=> alert('Failed to delete'));
+    }
+    if (target.classList.contains('delete-budget-btn')){
+        const id = target.dataset.id;
+        if (!confirm('Delete this budget?')) return;
+        fetch('/delete-budget/' + id, { method: 'POST' })
+            .then(res => {
+                if (res.ok) location.reload();
+                else alert('Failed to delete budget');
+            }).catch(()=> alert('Failed to delete budget'));
+    }
+    if (target.classList.contains('remove-fm')){
+        target.closest('.family-row').remove();
+    }
+    if (target.classList.contains('remove-pet')){
+        target.closest('.pet-row').remove();
+    }
+});
+
 // Initialize budget charts lazily. Expects window._budget_payload to be set by template.
 function initBudgetCharts(){
     try {
@@ -103,39 +187,259 @@ document.addEventListener('DOMContentLoaded', function(){
     }
 });
 
+// Dashboard line chart from /api/timeseries. Each series holds one value per bucket counted
+// from `start`; a downsampled series lists the bucket offsets it kept in `x`.
+const SERIES_COLORS = ['#36a2eb', '#ff6384', '#ffce56', '#4bc0c0', '#9966ff', '#ff9f40', '#8bc34a', '#9e9e9e'];
+
+function bucketLabel(start, bucket, offset){
+    const d = new Date(start + 'T00:00:00Z');
+    if (bucket === 'month') d.setUTCMonth(d.getUTCMonth() + offset);
+    else d.setUTCDate(d.getUTCDate() + offset * (bucket === 'week' ? 7 : 1));
+    return d.toISOString().slice(0, bucket === 'month' ? 7 : 10);
+}
+
+async function initTimeseriesChart(){
+    const canvas = document.getElementById('timeseriesChart');
+    if (!canvas) return;
+    const select = document.getElementById('timeseriesBucket');
+    const params = new URLSearchParams({ type: 'expense', bucket: select ? select.value : 'auto' });
+    try {
+        const resp = await fetch(canvas.dataset.src + '?' + params.toString());
+        if (!resp.ok) return;
+        const data = await resp.json();
+        const label = offset => bucketLabel(data.start, data.bucket, Math.round(offset));
+        const datasets = data.series.map((s, i) => ({
+            label: s.name,
+            data: s.y.map((y, j) => ({ x: s.x ? s.x[j] : j, y: y })),
+            borderColor: SERIES_COLORS[i % SERIES_COLORS.length],
+            backgroundColor: SERIES_COLORS[i % SERIES_COLORS.length],
+            borderWidth: 1.5,
+            pointRadius: 0,
+        }));
+        if (window._timeseries_chart) window._timeseries_chart.destroy();
+        window._timeseries_chart = new Chart(canvas, {
+            type: 'line',
+            data: { datasets: datasets },
+            options: {
+                parsing: false,
+                animation: false,
+                interaction: { mode: 'nearest', axis: 'x', intersect: false },
+                scales: { x: { type: 'linear', min: 0, max: Math.max(0, data.length - 1), ticks: { precision: 0, callback: label } } },
+                plugins: {
+                    legend: { position: 'bottom' },
+                    tooltip: { callbacks: { title: items => items.length ? label(items[0].parsed.x) : '' } },
+                },
+            },
+        });
+    } catch (err){ console.error('timeseries fetch failed', err); }
+}
+
+document.addEventListener('change', function(e){
+    if (e.target && e.target.id === 'timeseriesBucket') initTimeseriesChart();
+});
+
+document.addEventListener('DOMContentLoaded', function(){
+    const content = document.getElementById('dashboard');
+    if (content && content.classList.contains('active')) initTimeseriesChart();
+});
+
+// Transactions: the server renders the first page of each list; further pages come from
+// /api/transactions using the opaque next_cursor it returns.
+function currentTxnFilters(txnType){
+    const form = document.getElementById('txnFilters');
+    const params = {};
+    if (!form) return params;
+    new FormData(form).forEach((value, key) => {
+        if (!value) return;
+        // "<type>_category" filters only the list of that type, as its category param
+        const m = key.match(/^(expense|income)_category$/);
+        if (m){
+            if (m[1] === txnType) params.category = value;
+            return;
+        }
+        params[key] = value;
+    });
+    return params;
+}
+
+function buildTxnRow(item){
+    const row = document.createElement('div');
+    row.className = 'transaction-row';
+    const date = document.createElement('span');
+    date.className = 'date';
+    date.textContent = item.date || '';
+    const cat = document.createElement('span');
+    cat.className = 'category';
+    cat.textContent = item.category || '';
+    if (item.description){
+        const desc = document.createElement('span');
+        desc.className = 'description';
+        desc.textContent = item.description;
+        cat.append(' ', desc);
+    }
+    const amount = document.createElement('span');
+    const value = Number(item.amount || 0).toFixed(2);
+    amount.className = 'amount ' + (item.type === 'expense' ? 'negative' : 'positive');
+    amount.textContent = (item.type === 'expense' ? '-$' : '$') + value;
+    const del = document.createElement('a');
+    del.className = 'delete-btn';
+    del.href = item.delete_url;
+    del.textContent = '✕';
+    row.append(date, cat, amount, del);
+    return row;
+}
+
+async function loadTransactions(listEl, reset){
+    if (listEl.dataset.loading === '1') return;
+    const cursor = reset ? '' : (listEl.dataset.nextCursor || '');
+    if (!reset && !cursor) return;
+    listEl.dataset.loading = '1';
+    const moreBtn = listEl.querySelector('.load-more-btn');
+    try {
+        const params = new URLSearchParams(Object.assign({ type: listEl.dataset.txnType }, currentTxnFilters(listEl.dataset.txnType)));
+        if (cursor) params.set('cursor', cursor);
+        // a search query switches to /api/search: one ranked page, no cursor
+        const url = params.get('q') ? '/api/search?' : '/api/transactions?';
+        const resp = await fetch(url + params.toString());
+        const data = await resp.json();
+        if (data.error){ console.error('transactions fetch failed', data.error); return; }
+        if (reset){
+            listEl.querySelectorAll('.transaction-row, .empty-text').forEach(el => el.remove());
+        }
+        data.items.forEach(item => listEl.insertBefore(buildTxnRow(item), moreBtn));
+        if (reset && data.items.length === 0){
+            const empty = document.createElement('p');
+            empty.className = 'empty-text';
+            empty.textContent = 'No matching transactions';
+            listEl.insertBefore(empty, moreBtn);
+        }
+        listEl.dataset.nextCursor = data.next_cursor || '';
+        if (moreBtn) moreBtn.hidden = !data.next_cursor;
+    } catch (err){ console.error('transactions fetch failed', err); }
+    finally { listEl.dataset.loading = ''; }
+}
+
+function initTransactionLists(root){
+    const lists = root.querySelectorAll('.transaction-list[data-txn-type]');
+    lists.forEach(listEl => {
+        const moreBtn = listEl.querySelector('.load-more-btn');
+        if (moreBtn) moreBtn.addEventListener('click', () => loadTransactions(listEl, false));
+        // fetch the next page when the user scrolls close to the bottom of the list
+        listEl.addEventListener('scroll', () => {
+            if (listEl.scrollTop + listEl.clientHeight >= listEl.scrollHeight - 40) loadTransactions(listEl, false);
+        });
+    });
+    const filters = root.querySelector('#txnFilters');
+    if (filters) filters.addEventListener('submit', e => {
+        e.preventDefault();
+        lists.forEach(listEl => loadTransactions(listEl, true));
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function(){
+    initTransactionLists(document);
+});
+
 // AI: call server to run housing+budget recommendations
+// Reads a text/event-stream response body and calls onEvent(eventName, data) per event.
+// (EventSource only supports GET, and the explanation request needs a JSON body.)
+async function readSse(resp, onEvent){
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true){
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) >= 0){
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+            });
+            if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
+}
+
+function renderApplyButton(actionsEl, suggested){
+    if (!suggested || Object.keys(suggested).length === 0) return;
+    const applyBtn = document.createElement('button');
+    applyBtn.textContent = 'Apply suggested budget updates';
+    applyBtn.onclick = async () => {
+        applyBtn.disabled = true; applyBtn.textContent = 'Applying...';
+        const body = { updates: suggested };
+        const r = await fetch('/api/apply-budget-updates', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body) });
+        const j = await r.json();
+        if (j.success){ applyBtn.textContent = 'Applied'; applyBtn.disabled = true; }
+        else { applyBtn.textContent = 'Failed'; applyBtn.disabled = false; }
+    };
+    actionsEl.appendChild(applyBtn);
+}
+
+// The recommendation is fetched first and shown immediately; the explanation is then streamed
+// token by token from /api/ai-explain/stream. Cancelling aborts the stream; the server closes
+// its upstream Gemini stream when it next tries to send a chunk.
+let aiAbort = null;
+
 async function runAiAnalysis(){
     const btn = document.getElementById('aiAnalyzeBtn');
     const resultsEl = document.getElementById('aiResults');
     const actionsEl = document.getElementById('aiActions');
+    if (aiAbort) aiAbort.abort();
+    const controller = aiAbort = new AbortController();
     if (btn) { btn.disabled = true; btn.textContent = 'Analyzing...'; }
     resultsEl.textContent = '';
     actionsEl.innerHTML = '';
+    const cancelBtn = document.createElement('button');
+    cancelBtn.textContent = 'Cancel explanation';
+    cancelBtn.onclick = () => controller.abort();
+    const explanationEl = document.createElement('div');
     try {
-        const resp = await fetch('/api/ai-recommend', { method: 'POST', headers: { 'Content-Type': 'application/json' } });
+        const resp = await fetch('/api/ai-recommend', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ explain: false }),
+            signal: controller.signal
+        });
         const data = await resp.json();
         if (data.error){ resultsEl.textContent = 'Error: ' + data.error; }
         else {
-            // Pretty-print results
             resultsEl.textContent = JSON.stringify(data, null, 2);
+            explanationEl.textContent = '\nExplanation: generating...';
+            resultsEl.appendChild(explanationEl);
+            renderApplyButton(actionsEl, data.suggested_budgets);
+            if (btn) { btn.disabled = false; btn.textContent = 'Analyze housing & budgets'; }
+            actionsEl.appendChild(cancelBtn);
 
-            // If there are suggested budgets, offer an apply button
-            if (data.suggested_budgets && Object.keys(data.suggested_budgets).length > 0){
-                const applyBtn = document.createElement('button');
-                applyBtn.textContent = 'Apply suggested budget updates';
-                applyBtn.onclick = async () => {
-                    applyBtn.disabled = true; applyBtn.textContent = 'Applying...';
-                    const body = { updates: data.suggested_budgets };
-                    const r = await fetch('/api/apply-budget-updates', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body) });
-                    const j = await r.json();
-                    if (j.success){ applyBtn.textContent = 'Applied'; applyBtn.disabled = true; }
-                    else { applyBtn.textContent = 'Failed'; applyBtn.disabled = false; }
-                };
-                actionsEl.appendChild(applyBtn);
-            }
+            const stream = await fetch('/api/ai-explain/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+                body: JSON.stringify(data),
+                signal: controller.signal
+            });
+            let text = '';
+            await readSse(stream, (event, payload) => {
+                if (event === 'message' && payload.text){
+                    text += payload.text;
+                    explanationEl.textContent = '\nExplanation:\n' + text;
+                }
+            });
         }
-    } catch (err){ resultsEl.textContent = 'Request failed: ' + err; }
-    if (btn) { btn.disabled = false; btn.textContent = 'Analyze housing & budgets'; }
+    } catch (err){
+        if (err.name === 'AbortError'){
+            if (explanationEl.isConnected && explanationEl.textContent.includes('generating')) explanationEl.textContent = '\nExplanation: cancelled';
+        } else { resultsEl.textContent = 'Request failed: ' + err; }
+    }
+    cancelBtn.remove();
+    if (controller === aiAbort){
+        aiAbort = null;
+        if (btn) { btn.disabled = false; btn.textContent = 'Analyze housing & budgets'; }
+    }
 }
 
 document.addEventListener('DOMContentLoaded', function(){
@@ -0,0 +1,36 @@
+import uuid
+
+import pytest
+
+import app as app_module
+
+
+@pytest.mark.parametrize("target, expected", [
+    ("/?tab=budget", "/?tab=budget"),
+    ("/fragments/budget", "/fragments/budget"),
+    (None, "/"),
+    ("", "/"),
+    ("https://evil.example/", "/"),
+    ("//evil.example", "/"),
+    ("/\\evil.example", "/"),
+    ("\\\\evil.example", "/"),
+    ("/\t/evil.example", "/"),
+    ("/\n/evil.example", "/"),
+    ("javascript:alert(1)", "/"),
+    ("evil.example", "/"),
+])
+def test_safe_next(target, expected):
+    with app_module.app.test_request_context():
+        assert app_module._safe_next(target) == expected
+
+
+def test_login_does_not_redirect_off_site():
+    with app_module.app.app_context():
+        app_module.init_db()
+        username = f"auth-{uuid.uuid4().hex[:8]}"
+        app_module.create_user(username, "password123")
+        app_module.db.session.commit()
+    with app_module.app.test_client() as client:
+        resp = client.post("/login?next=/%5Cevil.example", data={"username": username, "password": "password123"})
+        assert resp.status_code == 302
+        assert resp.headers["Location"] == "/"
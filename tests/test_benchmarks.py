@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+
+import app as app_module
+from benchmarks import run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _household():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"bench-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        app_module.db.session.add(app_module.UserDetails(user_id=user.id, location="Austin, TX", radius=10,
+                                                         family_members="[]", pets="[]"))
+        app_module.db.session.commit()
+        food = app_module._category_id(user.id, "Food")
+        for day in (3, 10, 17):
+            app_module.add_transaction(user.id, "expense", food, 42.0, datetime(2024, 5, day), "Starbucks Reserve")
+        return user.id
+
+
+def test_worker_drives_every_endpoint_against_the_test_database(monkeypatch, capsys):
+    monkeypatch.setenv("BENCH_USER_ID", str(_household()))
+    run.run_worker(iterations=2, warmup=0)
+    results = json.loads(capsys.readouterr().out)
+    assert list(results) == [name for name, *_ in run.ENDPOINTS]
+    for name, ep in results.items():
+        assert ep["requests"] == 2
+        assert set(ep["status"]) == {"200"}, name
+        assert 0 < ep["p50_ms"] <= ep["p95_ms"] <= ep["p99_ms"] <= ep["max_ms"]
+        assert ep["queries_per_request"] > 0, name
+
+
+def test_compare_flags_regressions_past_the_threshold():
+    def report(p95, queries):
+        return {"results": [{"transactions": 1000, "endpoints": {"index": {"p95_ms": p95, "queries_per_request": queries}}}]}
+
+    baseline = report(10.0, 4.0)
+    assert run.compare(report(11.9, 4.0), baseline, 1.2) == []
+    assert run.compare(report(12.5, 5.0), baseline, 1.2) == [
+        "index @ 1,000: p95_ms 10.0 -> 12.5", "index @ 1,000: queries_per_request 4.0 -> 5.0"]
+    assert run.compare({"results": [dict(report(50.0, 9.0)["results"][0], transactions=5)]}, baseline, 1.2) == []
+
+
+def test_percentile_is_nearest_rank():
+    samples = list(range(1, 101))
+    assert [run.percentile(samples, p) for p in (7, 50, 95, 99, 100)] == [7, 50, 95, 99, 100]
+    assert [run.percentile([1, 2, 3, 4], p) for p in (25, 26, 50, 51)] == [1, 2, 2, 3]
+    assert run.percentile([7.0], 99) == 7.0
+
+
+def test_driver_generates_a_small_dataset_and_reports(tmp_path):
+    # the whole pipeline (datagen, stub upstreams, worker process), at a size that takes seconds
+    out = tmp_path / "bench.json"
+    env = dict(os.environ, JOBS_DB_PATH=str(tmp_path / "jobs.db"), LISTINGS_DB_PATH=str(tmp_path / "listings.db"))
+    cmd = [sys.executable, "-m", "benchmarks.run", "--sizes", "200", "--categories", "6", "--months", "6",
+           "--iterations", "1", "--warmup", "0", "--latency", "0", "--data-dir", str(tmp_path), "--out", str(out)]
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stderr
+    report = json.loads(out.read_text())
+    [result] = report["results"]
+    assert result["transactions"] == 200 and result["db_bytes"] > 0
+    assert set(result["endpoints"]) == {name for name, *_ in run.ENDPOINTS}
+    proc = subprocess.run(cmd[:-2] + ["--compare", str(out), "--threshold", "1000"], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
@@ -0,0 +1,102 @@
+import uuid
+
+import pytest
+
+import app as app_module
+from services import budgets
+
+
+@pytest.fixture
+def household():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"budgets-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        app_module.db.session.info[app_module.data_version.SCOPE] = user.id
+        yield user.id
+
+
+def _upsert(user_id, items, **kwargs):
+    parsed, errors = budgets.parse_updates({"items": items})
+    assert errors == []
+    results = budgets.upsert(app_module.db.session, app_module.Budget, app_module.Category, user_id, parsed, **kwargs)
+    app_module.db.session.commit()
+    return results
+
+
+def _rows(user_id):
+    return sorted((b.category_ref.name, b.period, b.limit) for b in app_module.Budget.query.filter_by(user_id=user_id))
+
+
+def _for_month(user_id, month):
+    return budgets.for_month(app_module.db.session, app_module.Budget, app_module.Category, user_id, month)
+
+
+def test_upsert_inserts_then_updates_in_place(household):
+    created = _upsert(household, [{"category": "Food", "limit": 400}, {"category": "Rent", "limit": 1500}])
+    assert [(r["category"], r["status"]) for r in created] == [("Food", "created"), ("Rent", "created")]
+    assert _rows(household) == [("Food", "", 400.0), ("Rent", "", 1500.0)]
+
+    updated = _upsert(household, [{"category": "Food", "limit": 450}, {"category": "Transport", "limit": 90}])
+    assert [(r["category"], r["status"]) for r in updated] == [("Food", "updated"), ("Transport", "created")]
+    assert updated[0]["id"] == created[0]["id"]
+    assert _rows(household) == [("Food", "", 450.0), ("Rent", "", 1500.0), ("Transport", "", 90.0)]
+
+
+def test_monthly_override_takes_precedence_over_the_standing_budget(household):
+    _upsert(household, [{"category": "Food", "limit": 400}, {"category": "Rent", "limit": 1500},
+                        {"category": "Food", "limit": 600, "period": "2024-12"}])
+    assert len(_rows(household)) == 3  # the override is its own row, the standing one is untouched
+    assert _for_month(household, "2024-12") == {"Food": 600.0, "Rent": 1500.0}
+    assert _for_month(household, "2024-11") == {"Food": 400.0, "Rent": 1500.0}
+
+    # updating either one leaves the other alone
+    results = _upsert(household, [{"category": "Food", "limit": 650, "period": "2024-12"},
+                                  {"category": "Food", "limit": 420}])
+    assert [r["status"] for r in results] == ["updated", "updated"]
+    assert _for_month(household, "2024-12")["Food"] == 650.0
+    assert _for_month(household, "2025-01")["Food"] == 420.0
+
+
+def test_unknown_categories_are_created_or_reported(household):
+    results = _upsert(household, [{"category": "Hobbies", "limit": 50}], create_missing=False)
+    assert results[0]["status"] == "unknown_category" and results[0]["id"] is None
+    assert _rows(household) == []
+    results = _upsert(household, [{"category": "Hobbies", "limit": 50}])
+    assert results[0]["status"] == "created"
+    assert app_module.Category.query.filter_by(user_id=household, name="Hobbies").one().type == "expense"
+
+
+def test_households_do_not_share_budgets(household):
+    other = app_module.create_user(f"budgets-{uuid.uuid4().hex[:8]}", "password123").id
+    app_module.db.session.commit()
+    _upsert(household, [{"category": "Food", "limit": 400}])
+    assert _upsert(other, [{"category": "Food", "limit": 100}])[0]["status"] == "created"
+    assert _for_month(household, "2024-12") == {"Food": 400.0}
+    assert _for_month(other, "2024-12") == {"Food": 100.0}
+
+
+@pytest.mark.parametrize("payload, error", [
+    ({"items": [{"category": "Food", "limit": -1}]}, "limit must be a non-negative number"),
+    ({"items": [{"category": "Food", "limit": True}]}, "limit must be a number"),
+    ({"items": [{"category": "Food", "limit": 1, "period": "2024-13"}]}, "period must be YYYY-MM"),
+    ({"items": [{"category": "Food", "limit": 1}, {"category": "Food", "limit": 2}]}, "duplicates item 1"),
+])
+def test_invalid_payloads_write_nothing(household, payload, error):
+    payload["items"].insert(0, {"category": "Rent", "limit": 1000})
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s["user_id"] = household
+    resp = client.post("/api/apply-budget-updates", json=payload)
+    assert resp.status_code == 400
+    assert any(e["error"].startswith(error) for e in resp.get_json()["errors"])
+    assert _rows(household) == []
+
+
+def test_endpoint_accepts_the_older_updates_shape(household):
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s["user_id"] = household
+    resp = client.post("/api/apply-budget-updates", json={"updates": {"Food": 300, "Utilities": 120}})
+    assert resp.status_code == 200
+    assert _rows(household) == [("Food", "", 300.0), ("Utilities", "", 120.0)]
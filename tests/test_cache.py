@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+import services.housing as housing
+from benchmarks.stub_server import StubServer
+from services.cache import TTLCache
+from services.http_client import HttpClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    with StubServer(latency=0.0) as server:
+        yield server
+
+
+def _fetcher(client, stub, limit):
+    return lambda: client.get(stub.url + "/search", params={"limit": limit}).json()["listings"]
+
+
+def test_ttl_expiry_refetches(stub):
+    clock = FakeClock()
+    cache = TTLCache(maxsize=8, ttl=60, clock=clock)
+    client = HttpClient(max_retries=0)
+
+    first = cache.get_or_compute("a", _fetcher(client, stub, 3))
+    clock.now += 59
+    assert cache.get_or_compute("a", _fetcher(client, stub, 3)) == first
+    assert stub.calls["/search"] == 1
+
+    clock.now += 1
+    cache.get_or_compute("a", _fetcher(client, stub, 3))
+    assert stub.calls["/search"] == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_evicts_least_recently_used(stub):
+    cache = TTLCache(maxsize=2, ttl=600)
+    client = HttpClient(max_retries=0)
+
+    cache.get_or_compute("a", _fetcher(client, stub, 1))
+    cache.get_or_compute("b", _fetcher(client, stub, 2))
+    cache.get_or_compute("a", _fetcher(client, stub, 1))  # "b" is now the oldest
+    cache.get_or_compute("c", _fetcher(client, stub, 3))
+    assert cache.evictions == 1
+    assert stub.calls["/search"] == 3
+
+    cache.get_or_compute("a", _fetcher(client, stub, 1))
+    assert stub.calls["/search"] == 3
+    cache.get_or_compute("b", _fetcher(client, stub, 2))
+    assert stub.calls["/search"] == 4
+
+
+def test_concurrent_misses_share_one_upstream_call(monkeypatch):
+    with StubServer(latency=0.3) as server:
+        monkeypatch.setattr(housing, "RENTCAST_API_KEY", "test-key")
+        monkeypatch.setattr(housing, "RENTCAST_BASE_URL", server.url)
+        monkeypatch.setattr(housing, "_cache", TTLCache(maxsize=8, ttl=600))
+        barrier = threading.Barrier(8)
+        results = []
+
+        def search():
+            barrier.wait()
+            results.append(housing.search_housing("Austin, TX", radius=5, max_results=4))
+
+        threads = [threading.Thread(target=search) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert server.calls == {"/search": 1}
+        assert len(results) == 8 and all(r == results[0] for r in results)
+        assert results[0][0]["address"] == "200 Stub St"
+        stats = housing.cache_stats()
+        assert stats["misses"] == 1 and stats["coalesced"] == 7
+
+
+def test_errors_are_shared_but_not_cached(stub):
+    cache = TTLCache(maxsize=8, ttl=600)
+    client = HttpClient(max_retries=0)
+
+    def fetch():
+        resp = client.get(stub.url + "/search")
+        resp.raise_for_status()
+        return resp.json()
+
+    stub.status = 503
+    with pytest.raises(Exception):
+        cache.get_or_compute("a", fetch)
+    stub.status = 200
+    assert cache.get_or_compute("a", fetch)["listings"]
+    assert stub.calls["/search"] == 2
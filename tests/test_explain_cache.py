@@ -0,0 +1,119 @@
+import sqlite3
+
+import pytest
+
+import services.explain_cache as explain_cache
+import services.gemini as gemini
+from services.explain_cache import ExplanationCache, cache_key
+
+NEEDS = {"beds": 2, "baths": 1, "sqft": 900}
+LISTING = {"price": 1500, "address": "1 Main St"}
+SUGGESTED = {"Food": 400.0, "Rent": 1500.0}
+DETAILS = {"location": "Austin, TX", "radius": 10, "family": [{"relation": "self", "age": 35}], "pets": []}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(explain_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ExplanationCache(str(tmp_path / "explanations.db"), max_entries=3, ttl=3600)
+
+
+def test_hits_count_and_record_what_they_saved(cache):
+    assert cache.get("k") is None
+    cache.put("k", "text", latency_ms=800.0, prompt_tokens=100, output_tokens=50)
+    assert cache.get("k") == "text"
+    assert cache.get("k") == "text"
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 2, 1)
+    assert stats["hit_ratio"] == 0.6667
+    assert (stats["saved_ms"], stats["saved_tokens"]) == (1600.0, 300)
+    assert (stats["upstream_ms"], stats["upstream_tokens"]) == (800.0, 150)
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.put("old", "stale", 100.0, 1, 1)
+    clock.now += 3599
+    assert cache.get("old") == "stale"  # a hit does not extend the entry's life
+    clock.now += 1
+    assert cache.get("old") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_writes_purge_expired_and_least_recently_used_entries(cache, clock):
+    cache.put("expired", "x", 1.0, 1, 1)
+    clock.now += 3600
+    for key in ("a", "b", "c"):
+        clock.now += 1
+        cache.put(key, key, 1.0, 1, 1)
+    assert cache.stats()["entries"] == 3  # "expired" went with the first of these writes
+    clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.put("d", "d", 1.0, 1, 1)
+    assert [cache.get(k) for k in ("a", "b", "c", "d")] == ["a", None, "c", "d"]
+
+
+def test_keys_ignore_formatting_but_not_content():
+    key = cache_key(NEEDS, LISTING, SUGGESTED, DETAILS)
+    reordered = dict(reversed(list(DETAILS.items())))
+    assert cache_key({**NEEDS, "sqft": 900.0000001}, LISTING, dict(reversed(list(SUGGESTED.items()))), reordered) == key
+    assert cache_key(NEEDS, LISTING, {**SUGGESTED, "Food": 401.0}, DETAILS) != key
+    assert cache_key(NEEDS, None, SUGGESTED, DETAILS) != key
+
+
+@pytest.fixture
+def gemini_calls(monkeypatch, cache):
+    calls = []
+
+    def generate(prompt, timeout=None):
+        calls.append(prompt)
+        return f"explanation {len(calls)}", {"prompt_tokens": 10, "output_tokens": 5}
+
+    monkeypatch.setattr(gemini, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(gemini, "_generate", generate)
+    monkeypatch.setattr(gemini, "_explanations", cache)
+    return calls
+
+
+def test_households_get_their_own_explanations(gemini_calls):
+    mine = gemini.compose_explanation(NEEDS, LISTING, SUGGESTED, DETAILS)
+    theirs_details = {**DETAILS, "location": "Denver, CO", "family": [{"relation": "self"}, {"relation": "child", "age": 4}]}
+    theirs = gemini.compose_explanation(NEEDS, LISTING, SUGGESTED, theirs_details)
+    assert (mine, theirs) == ("explanation 1", "explanation 2")
+    assert "Denver" in gemini_calls[1] and "Denver" not in gemini_calls[0]
+    assert gemini.compose_explanation(NEEDS, LISTING, SUGGESTED, DETAILS) == mine
+    assert gemini.compose_explanation(NEEDS, LISTING, SUGGESTED, theirs_details) == theirs
+    assert len(gemini_calls) == 2
+    # a hit is only ever shared between identical inputs, which build the identical prompt
+    assert gemini._build_prompt(NEEDS, LISTING, SUGGESTED, dict(DETAILS)) == gemini_calls[0]
+
+
+def test_without_a_key_nothing_is_cached(gemini_calls, monkeypatch, cache):
+    monkeypatch.setattr(gemini, "GEMINI_API_KEY", None)
+    monkeypatch.setattr(gemini, "_generate", lambda prompt, timeout=None: None)
+    text = gemini.compose_explanation(NEEDS, LISTING, SUGGESTED, DETAILS)
+    assert text == gemini.fallback_explanation(NEEDS, LISTING, SUGGESTED)
+    assert cache.stats()["entries"] == 0
+
+
+def test_an_unusable_cache_file_does_not_break_explanations(gemini_calls, monkeypatch, cache):
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "get", broken)
+    monkeypatch.setattr(cache, "put", broken)
+    assert gemini.compose_explanation(NEEDS, LISTING, SUGGESTED, DETAILS) == "explanation 1"
@@ -0,0 +1,96 @@
+import csv
+import uuid
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from services import export
+
+
+@pytest.fixture
+def household():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"export-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        user_id = user.id
+        food = app_module._category_id(user_id, "Food")
+        salary = app_module._category_id(user_id, "Salary")
+        app_module.db.session.add_all([
+            app_module.Expense(user_id=user_id, category_id=food, amount=12.5, date=datetime(2024, 1, 3), description="Bakery"),
+            app_module.Expense(user_id=user_id, category_id=food, amount=40.0, date=datetime(2024, 2, 9)),
+            app_module.Income(user_id=user_id, category_id=salary, amount=3000.0, date=datetime(2024, 2, 1),
+                              description="Payroll"),
+        ])
+        app_module.db.session.commit()
+        yield user_id
+
+
+def _export(out_dir, user_id, full=False):
+    tables = {name: model.__table__ for name, model in app_module.TRANSACTION_MODELS.items()}
+    with app_module.app.app_context():
+        return export.export_snapshot(app_module.db.session, str(out_dir), tables, app_module.Budget.__table__,
+                                      fmt="csv", full=full, user_id=user_id, chunk_size=2)
+
+
+def _rows(out_dir, table):
+    manifest = export._load_manifest(str(out_dir))
+    rows = []
+    for part in manifest["tables"][table]["parts"]:
+        with open(out_dir / part["path"], encoding="utf-8", newline="") as f:
+            rows += list(csv.DictReader(f))
+    return rows
+
+
+def test_full_export(household, tmp_path):
+    result = _export(tmp_path, household)
+    assert result.full
+    assert result.rows == {"expense": 2, "income": 1, "budget": 0}
+    expenses = _rows(tmp_path, "expense")
+    assert list(expenses[0]) == [name for name, _ in export.TRANSACTION_COLUMNS]
+    assert [(r["category"], float(r["amount"]), r["description"]) for r in expenses] == [("Food", 12.5, "Bakery"),
+                                                                                         ("Food", 40.0, "")]
+    assert export.Snapshot(str(tmp_path)).months("expense") == ["2024-01", "2024-02"]
+    assert _rows(tmp_path, "income")[0]["description"] == "Payroll"
+
+
+def test_incremental_export_appends_new_rows(household, tmp_path):
+    _export(tmp_path, household)
+    with app_module.app.app_context():
+        food = app_module._category_id(household, "Food")
+        app_module.db.session.add(app_module.Expense(user_id=household, category_id=food, amount=7.0,
+                                                     date=datetime(2024, 3, 1)))
+        app_module.db.session.commit()
+    result = _export(tmp_path, household)
+    assert not result.full
+    assert result.rows["expense"] == 1 and result.rows["income"] == 0
+    assert sorted(float(r["amount"]) for r in _rows(tmp_path, "expense")) == [7.0, 12.5, 40.0]
+
+
+def test_incremental_export_after_deleting_the_newest_row(household, tmp_path):
+    _export(tmp_path, household)
+    with app_module.app.app_context():
+        session = app_module.db.session
+        newest = session.query(app_module.Expense).filter_by(user_id=household).order_by(app_module.Expense.id.desc()).first()
+        deleted_id, category_id = newest.id, newest.category_id
+        session.delete(newest)
+        session.commit()
+        replacement = app_module.Expense(user_id=household, category_id=category_id, amount=99.0, date=datetime(2024, 3, 1))
+        session.add(replacement)
+        session.commit()
+        assert replacement.id > deleted_id
+    result = _export(tmp_path, household)
+    assert result.rows["expense"] == 1
+    assert 99.0 in [float(r["amount"]) for r in _rows(tmp_path, "expense")]
+
+
+def test_snapshot_with_other_columns_is_rewritten(household, tmp_path):
+    _export(tmp_path, household)
+    manifest = export._load_manifest(str(tmp_path))
+    manifest["columns"].remove("description")
+    export._save_manifest(str(tmp_path), manifest)
+    result = _export(tmp_path, household)
+    assert result.full
+    assert result.rows["expense"] == 2
+    assert len(_rows(tmp_path, "expense")) == 2
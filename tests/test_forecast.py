@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from services.forecast import History, forecast
+
+JANUARY = 2024 * 12
+
+
+def _only(history, budgets, today):
+    [result] = forecast(history, budgets, today)
+    return result
+
+
+def test_no_history_early_in_month_is_not_extrapolated():
+    # $2000 rent paid on the 1st, looked at an hour into the 2nd
+    rent = History(["Rent"], JANUARY, np.array([[2000.0]]))
+    result = _only(rent, {"Rent": 2000.0}, datetime(2024, 1, 2, 1, 0))
+    assert result.projected == 2000.0
+    assert result.expected == 2000.0
+    assert result.overspend == 0.0
+
+
+def test_no_history_uses_run_rate_after_first_week():
+    groceries = History(["Groceries"], JANUARY + 3, np.array([[300.0]]))
+    result = _only(groceries, {"Groceries": 500.0}, datetime(2024, 4, 16))  # half of April gone
+    assert result.projected == pytest.approx(600.0)
+    assert result.overspend == pytest.approx(100.0)
+
+
+def test_history_projects_remaining_share_of_expected():
+    totals = np.array([[600.0, 600.0, 600.0, 300.0]])
+    groceries = History(["Groceries"], JANUARY, totals)
+    result = _only(groceries, {}, datetime(2024, 4, 16))
+    assert result.rolling_avg == pytest.approx(600.0)
+    assert result.expected == pytest.approx(600.0)
+    assert result.projected == pytest.approx(600.0)
+    assert result.budget is None and result.overspend == 0.0
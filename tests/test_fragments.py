@@ -0,0 +1,96 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+
+WRITES = {
+    "category": lambda user_id, cid: app_module.Category(user_id=user_id, name="Hobbies", type="expense", is_need=False),
+    "expense": lambda user_id, cid: app_module.Expense(user_id=user_id, category_id=cid, amount=9.5,
+                                                       date=datetime(2024, 5, 1)),
+    "income": lambda user_id, cid: app_module.Income(user_id=user_id, category_id=cid, amount=100.0,
+                                                     date=datetime(2024, 5, 1)),
+    "budget": lambda user_id, cid: app_module.Budget(user_id=user_id, category_id=cid, limit=250.0),
+    "category_monthly_total": lambda user_id, cid: app_module.CategoryMonthlyTotal(
+        user_id=user_id, kind="expense", category_id=cid, month="2024-05", total=9.5, count=1),
+    "recurring_series": lambda user_id, cid: app_module.RecurringSeries(user_id=user_id, category_id=cid, bucket=40),
+    "user_details": lambda user_id, cid: app_module.UserDetails(user_id=user_id, location="Austin, TX", radius=10),
+}
+
+CASES = [(tab, table) for tab, (_, _, tables) in app_module.TAB_FRAGMENTS.items() for table in tables]
+
+
+def _new_user():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"etag-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        return user.id
+
+
+def _write(user_id, table, scope="own"):
+    with app_module.app.app_context():
+        session = app_module.db.session
+        session.info[app_module.data_version.SCOPE] = user_id if scope == "own" else None
+        cid = app_module._category_id(user_id, "Food")
+        session.add(WRITES[table](user_id, cid))
+        session.commit()
+
+
+@pytest.fixture
+def client():
+    user_id = _new_user()
+    with app_module.app.test_client() as c:
+        with c.session_transaction() as s:
+            s["user_id"] = user_id
+        c.user_id = user_id
+        yield c
+
+
+def _etag(client, tab):
+    resp = client.get(f"/fragments/{tab}")
+    assert resp.status_code == 200
+    return resp.headers["ETag"]
+
+
+def _revalidate(client, tab, etag):
+    return client.get(f"/fragments/{tab}", headers={"If-None-Match": etag})
+
+
+@pytest.mark.parametrize("tab", sorted(app_module.TAB_FRAGMENTS))
+def test_unchanged_fragment_revalidates_with_304(client, tab):
+    etag = _etag(client, tab)
+    resp = _revalidate(client, tab, etag)
+    assert resp.status_code == 304
+    assert resp.data == b""
+    assert resp.headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("tab, table", CASES)
+def test_write_to_a_dependent_table_changes_the_etag(client, tab, table):
+    etag = _etag(client, tab)
+    _write(client.user_id, table)
+    resp = _revalidate(client, tab, etag)
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert _revalidate(client, tab, resp.headers["ETag"]).status_code == 304
+
+
+@pytest.mark.parametrize("tab, table", CASES)
+def test_another_households_write_keeps_the_etag(client, tab, table):
+    etag = _etag(client, tab)
+    _write(_new_user(), table)
+    assert _revalidate(client, tab, etag).status_code == 304
+
+
+def test_unscoped_write_changes_every_households_etag(client):
+    etag = _etag(client, "transactions")
+    _write(_new_user(), "expense", scope=None)  # e.g. a maintenance command
+    assert _revalidate(client, "transactions", etag).status_code == 200
+
+
+def test_write_to_an_unrelated_table_keeps_the_etag(client):
+    etag = _etag(client, "user-details")
+    _write(client.user_id, "expense")
+    assert _revalidate(client, "user-details", etag).status_code == 304
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.stub_server import StubServer
+from services.http_client import CircuitOpenError, HttpClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    with StubServer(latency=0.0) as server:
+        yield server
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr("services.http_client.time.sleep", lambda seconds: None)
+
+
+def test_circuit_breaker_opens_and_recovers(stub):
+    client = HttpClient(max_retries=0, failure_threshold=2, reset_timeout=60)
+    clock = FakeClock()
+    _, breaker = client._prepare_host(stub.url)
+    breaker._clock = clock
+    url = stub.url + "/search"
+
+    stub.status = 503
+    assert client.get(url).status_code == 503
+    assert breaker.state == "closed"
+    assert client.get(url).status_code == 503
+    assert breaker.state == "open"
+
+    # open: fails fast without reaching the upstream
+    with pytest.raises(CircuitOpenError):
+        client.get(url)
+    assert stub.calls["/search"] == 2
+
+    # half-open: one trial call; a failure re-opens the circuit
+    clock.now += 60
+    assert breaker.state == "half-open"
+    assert client.get(url).status_code == 503
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get(url)
+    assert stub.calls["/search"] == 3
+
+    # a successful trial closes it again
+    clock.now += 60
+    stub.status = 200
+    assert client.get(url).status_code == 200
+    assert breaker.state == "closed"
+    assert client.breaker_states() == {"127.0.0.1": {"state": "closed", "failures": 0}}
+
+
+def test_retries_back_off_then_return_last_response(stub, no_sleep):
+    client = HttpClient(max_retries=2, failure_threshold=10)
+    stub.status = 503
+    assert client.get(stub.url + "/search").status_code == 503
+    assert stub.calls["/search"] == 3
+
+
+def test_retries_share_one_deadline():
+    with StubServer(latency=0.2, status=503) as server:
+        client = HttpClient(max_retries=5, backoff_base=0.01, failure_threshold=100)
+        started = time.monotonic()
+        try:
+            assert client.get(server.url + "/search", deadline=started + 0.5).status_code == 503
+        except requests.Timeout:
+            pass  # the attempt running at the deadline was cut short
+        assert time.monotonic() - started < 0.8
+        assert server.calls["/search"] <= 3
+
+
+def test_deadline_cuts_the_read_timeout():
+    with StubServer(latency=2.0) as server:
+        client = HttpClient(max_retries=2, read_timeout=10.0, failure_threshold=100)
+        started = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            client.get(server.url + "/search", deadline=started + 0.3)
+        assert time.monotonic() - started < 1.0
+        with pytest.raises(requests.Timeout):
+            client.get(server.url + "/search", deadline=started - 1)
+
+
+def test_retries_count_as_one_breaker_failure(stub, no_sleep):
+    client = HttpClient(max_retries=2, failure_threshold=3)
+    _, breaker = client._prepare_host(stub.url)
+    stub.status = 503
+    for _ in range(2):
+        assert client.get(stub.url + "/search").status_code == 503
+    assert stub.calls["/search"] == 6
+    assert (breaker.state, breaker.failures) == ("closed", 2)
+    client.get(stub.url + "/search")
+    assert breaker.state == "open"
+
+
+def test_success_after_retry_resets_failures(stub, monkeypatch):
+    client = HttpClient(max_retries=2, failure_threshold=3)
+    _, breaker = client._prepare_host(stub.url)
+
+    def recover(seconds):
+        # time.sleep is shared with the stub's handler threads; only the client's backoff counts
+        if threading.current_thread() is threading.main_thread():
+            stub.status = 200
+
+    monkeypatch.setattr("services.http_client.time.sleep", recover)
+    stub.status = 503
+    assert client.get(stub.url + "/search").status_code == 200
+    assert stub.calls["/search"] == 2
+    assert (breaker.state, breaker.failures) == ("closed", 0)
+
+
+@pytest.mark.parametrize("error", [requests.exceptions.InvalidURL, requests.exceptions.TooManyRedirects,
+                                   requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError])
+def test_other_exceptions_count_and_end_the_half_open_trial(stub, monkeypatch, error):
+    client = HttpClient(max_retries=2, failure_threshold=1, reset_timeout=60)
+    clock = FakeClock()
+    _, breaker = client._prepare_host(stub.url)
+    breaker._clock = clock
+    url = stub.url + "/search"
+    real_request = client.session.request
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(args)
+        raise error("boom")
+
+    monkeypatch.setattr(client.session, "request", failing)
+    with pytest.raises(error):
+        client.get(url)
+    assert len(calls) == 1  # not retried
+    assert breaker.state == "open"
+
+    # the half-open trial fails the same way: the circuit re-opens instead of sticking
+    clock.now += 60
+    with pytest.raises(error):
+        client.get(url)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get(url)
+
+    # and the next trial, once the upstream is back, closes it
+    clock.now += 60
+    monkeypatch.setattr(client.session, "request", real_request)
+    assert client.get(url).status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_connection_errors_are_retried_then_raised(no_sleep):
+    client = HttpClient(max_retries=2, connect_timeout=0.5, failure_threshold=5)
+    # nothing listens on port 9 of localhost
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://127.0.0.1:9/search")
+    assert client.breaker_states()["127.0.0.1"] == {"state": "closed", "failures": 1}
@@ -0,0 +1,150 @@
+import io
+import uuid
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from services import importer, recurring, summary
+
+CSV = """Date,Description,Amount,Category
+2024-01-05,Netflix,-15.99,Entertainment
+2024-02-05,Netflix,-15.99,Entertainment
+2024-03-05,Netflix,-15.99,Entertainment
+2024-03-01,ACME payroll,2500.00,Salary
+03/07/2024,Corner store,(12.40),
+not a date,Broken,-1.00,Food
+2024-03-09,Missing amount,,Food
+"""
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240310120000[-5:EST]<TRNAMT>-42.10<NAME>Grocery Mart</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240315<TRNAMT>100.00<MEMO>Refund</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>garbage<TRNAMT>-1.00</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_csv_rows_signs_formats_and_skips():
+    skipped = []
+    rows = list(importer.iter_csv_rows(io.StringIO(CSV), on_skip=lambda line, reason: skipped.append(line)))
+    assert [(r.kind, r.amount, r.category) for r in rows] == [
+        ("expense", 15.99, "Entertainment"), ("expense", 15.99, "Entertainment"), ("expense", 15.99, "Entertainment"),
+        ("income", 2500.0, "Salary"), ("expense", 12.4, None),
+    ]
+    assert rows[4].date == datetime(2024, 3, 7)
+    assert skipped == [7, 8]
+
+
+def test_csv_debit_credit_columns_and_type_override():
+    text = "Posted Date,Payee,Debit,Credit,Type\n2024-01-02,Coffee,4.50,,\n2024-01-03,Transfer,,50,expense\n"
+    rows = list(importer.iter_csv_rows(io.StringIO(text)))
+    assert [(r.kind, r.amount, r.description) for r in rows] == [("expense", 4.5, "Coffee"), ("expense", 50.0, "Transfer")]
+
+
+def test_csv_without_amount_column_is_rejected():
+    with pytest.raises(ValueError):
+        list(importer.iter_csv_rows(io.StringIO("Date,Payee\n2024-01-02,Coffee\n")))
+
+
+def test_ofx_rows():
+    skipped = []
+    rows = list(importer.iter_ofx_rows(io.StringIO(OFX), on_skip=lambda n, reason: skipped.append(n)))
+    assert [(r.kind, r.date, r.amount, r.description) for r in rows] == [
+        ("expense", datetime(2024, 3, 10, 12), 42.1, "Grocery Mart"),
+        ("income", datetime(2024, 3, 15), 100.0, "Refund"),
+    ]
+    assert skipped == [3]
+
+
+@pytest.fixture
+def user_id():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"import-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        yield user.id
+
+
+def _import(user_id, text, fmt="csv", **kwargs):
+    app_module.db.session.info[app_module.data_version.SCOPE] = user_id
+    return app_module.run_import(user_id, io.StringIO(text), fmt, **kwargs)
+
+
+def _summary_rows(user_id):
+    t = app_module.CategoryMonthlyTotal
+    return sorted((r.kind, r.category_id, r.month, round(r.total, 2), r.count)
+                  for r in t.query.filter_by(user_id=user_id))
+
+
+def _series_rows(user_id):
+    return sorted((r.category_id, r.bucket, r.count, round(r.total, 2), r.cadence, r.last_date)
+                  for r in app_module.RecurringSeries.query.filter_by(user_id=user_id))
+
+
+def _rebuilt(user_id, rows):
+    # the same rows recomputed from the household's raw transactions, in a rolled-back transaction
+    session = app_module.db.session
+    session.commit()
+    session.execute(app_module.CategoryMonthlyTotal.__table__.delete()
+                    .where(app_module.CategoryMonthlyTotal.user_id == user_id))
+    summary.apply_deltas(session, app_module.CategoryMonthlyTotal, _raw_deltas(user_id))
+    recurring.rebuild(session, app_module.RecurringSeries, app_module.Expense, user_id)
+    try:
+        return rows(user_id)
+    finally:
+        session.rollback()
+
+
+def _raw_deltas(user_id):
+    deltas = {}
+    for kind, model in app_module.TRANSACTION_MODELS.items():
+        for row in model.query.filter_by(user_id=user_id):
+            summary.add_delta(deltas, user_id, kind, row.category_id, row.date, row.amount)
+    return deltas
+
+
+def test_import_commits_per_batch_and_matches_rebuilds(user_id):
+    batches = []
+    result = _import(user_id, CSV, batch_size=2, progress=lambda rows, elapsed: batches.append(rows))
+    assert (result.rows, result.expenses, result.incomes, result.skipped) == (5, 4, 1, 2)
+    assert batches == [2, 4, 5]
+    assert result.errors[0].startswith("line 7: ")
+
+    session = app_module.db.session
+    assert _summary_rows(user_id) == _rebuilt(user_id, _summary_rows)
+    assert _series_rows(user_id) == _rebuilt(user_id, _series_rows)
+    totals = summary.category_totals(session, app_module.CategoryMonthlyTotal, user_id, "expense")
+    assert totals == {"Entertainment": pytest.approx(47.97), "Uncategorized": 12.4}
+    netflix = app_module.RecurringSeries.query.filter_by(user_id=user_id, description="Netflix").one()
+    assert (netflix.count, netflix.cadence) == (3, "monthly")
+
+
+def test_import_rejects_a_category_of_the_other_type(user_id):
+    text = "Date,Description,Amount,Category\n2024-04-01,Refund,30.00,Food\n2024-04-02,Lunch,-9.00,Salary\n" \
+           "2024-04-03,Dinner,-20.00,Food\n"
+    result = _import(user_id, text)
+    assert (result.rows, result.expenses, result.incomes, result.skipped) == (1, 1, 0, 2)
+    assert result.errors == ("2024-04-01 30.00 (Refund): 'Food' is not an income category",
+                             "2024-04-02 9.00 (Lunch): 'Salary' is not an expense category")
+    assert app_module.Income.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_new_category_takes_the_type_of_its_first_row(user_id):
+    result = _import(user_id, "Date,Amount,Category\n2024-04-01,-5,Hobbies\n2024-04-02,8,Hobbies\n")
+    assert (result.rows, result.skipped) == (1, 1)
+    category = app_module.Category.query.filter_by(user_id=user_id, name="Hobbies").one()
+    assert category.type == "expense"
+
+
+def test_import_endpoint_reports_skips(user_id):
+    with app_module.app.test_client() as client:
+        with client.session_transaction() as s:
+            s["user_id"] = user_id
+        data = {"file": (io.BytesIO(b"Date,Amount,Category\n2024-04-01,12,Food\n"), "bank.csv")}
+        resp = client.post("/api/import", data=data, content_type="multipart/form-data")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["imported"] == 0 and body["skipped"] == 1
+    assert body["errors"] == ["2024-04-01 12.00 (no description): 'Food' is not an income category"]
@@ -0,0 +1,104 @@
+import threading
+import time
+import uuid
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+
+import app as app_module
+import services.instrumentation as instrumentation
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    event.listen(engine, "before_cursor_execute", instrumentation._before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", instrumentation._after_cursor_execute)
+    event.listen(engine, "handle_error", instrumentation._handle_error)
+    yield engine
+    engine.dispose()
+
+
+def test_failed_statements_do_not_leak_timers(engine):
+    timings = instrumentation.RequestTimings()
+    token = instrumentation._current.set(timings)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+            for _ in range(3):
+                with pytest.raises(exc.OperationalError):
+                    conn.exec_driver_sql("SELECT * FROM missing")
+            conn.exec_driver_sql("SELECT 2")
+            assert conn.info["instrumentation_started"] == []
+    finally:
+        instrumentation._current.reset(token)
+    assert timings.get("db")[0] == 5
+
+
+def test_only_one_request_is_profiled_at_a_time():
+    first = instrumentation._start_profiler()
+    assert first is not None
+    try:
+        assert instrumentation._start_profiler() is None
+    finally:
+        instrumentation._stop_profiler(first)
+    again = instrumentation._start_profiler()
+    assert again is not None
+    instrumentation._stop_profiler(again)
+
+
+@pytest.fixture
+def instrumented():
+    def make(authorize=None):
+        app = Flask(__name__)
+        instrumentation.init_app(app, sample_rate=1.0, slow_ms=1e9, authorize=authorize)
+
+        @app.route("/slow")
+        def slow():
+            time.sleep(0.05)
+            return "ok"
+
+        return app
+
+    yield make
+    event.remove(Engine, "before_cursor_execute", instrumentation._before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", instrumentation._after_cursor_execute)
+    event.remove(Engine, "handle_error", instrumentation._handle_error)
+
+
+def test_concurrent_sampled_requests(instrumented):
+    app = instrumented()
+    statuses = []
+
+    def get():
+        statuses.append(app.test_client().get("/slow").status_code)
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert statuses == [200] * 8
+    assert not instrumentation._profiling.locked()
+
+
+@pytest.mark.parametrize("authorize, status", [(None, 404), (lambda: False, 404), (lambda: True, 200)])
+def test_metrics_need_authorization(instrumented, authorize, status):
+    app = instrumented(authorize)
+    assert app.test_client().get("/debug/metrics").status_code == status
+
+
+def test_metrics_users(monkeypatch):
+    with app_module.app.app_context():
+        app_module.init_db()
+        ops = app_module.create_user(f"ops-{uuid.uuid4().hex[:8]}", "password123")
+        other = app_module.create_user(f"user-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        ops_id, ops_name, other_id = ops.id, ops.username, other.id
+    monkeypatch.setattr(app_module, "METRICS_USERS", frozenset({ops_name}))
+    for user_id, allowed in ((ops_id, True), (other_id, False), (None, False)):
+        with app_module.app.test_request_context():
+            app_module.g.user_id = user_id
+            assert app_module._can_view_metrics() is allowed
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+import uuid
+
+import pytest
+
+import app as app_module
+from services import jobs
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    def make(**kwargs):
+        queue = jobs.JobQueue(str(tmp_path / "jobs.db"), workers=2, **kwargs)
+        queue.register("echo", lambda params, user_id: {"echo": params, "user": user_id})
+        queue.register("fail", lambda params, user_id: 1 / 0)
+        return queue
+    return make
+
+
+def _insert(queue, status, started_ago=None, user_id=1):
+    # a job row as another (dead) process would have left it
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    started = now - started_ago if started_ago is not None else None
+    conn = queue._connect()
+    with conn:
+        conn.execute("INSERT INTO job (id, kind, user_id, status, params, created_at, started_at, heartbeat_at) "
+                     "VALUES (?, 'echo', ?, ?, ?, ?, ?, ?)",
+                     (job_id, user_id, status, json.dumps({"n": 1}), now - (started_ago or 0), started, started))
+    conn.close()
+    return job_id
+
+
+def test_jobs_run_and_record_results(make_queue):
+    queue = make_queue()
+    ok = queue.submit("echo", {"x": 1}, user_id=7)
+    bad = queue.submit("fail", user_id=7)
+    assert queue.wait(ok, 5)["result"] == {"echo": {"x": 1}, "user": 7}
+    failed = queue.wait(bad, 5)
+    assert failed["status"] == jobs.FAILED and "division" in failed["error"]
+    assert queue.get(ok, user_id=8) is None
+    assert [j["id"] for j in queue.recent(7)] == [bad, ok]
+    with pytest.raises(ValueError):
+        queue.submit("missing")
+
+
+def test_cache_key_returns_the_existing_job(make_queue):
+    queue = make_queue()
+    first = queue.submit("echo", {"x": 1}, cache_key="k")
+    assert queue.submit("echo", {"x": 1}, cache_key="k") == first
+    assert queue.cache_hits == 1
+
+
+def test_leftover_jobs_are_picked_up_at_start(make_queue):
+    queue = make_queue(stale_after=60)
+    queued = _insert(queue, jobs.QUEUED)
+    lapsed = _insert(queue, jobs.RUNNING, started_ago=120)
+    live = _insert(queue, jobs.RUNNING, started_ago=1)
+    queue.ensure_started()
+    assert queue.wait(queued, 5)["status"] == jobs.DONE
+    assert queue.wait(lapsed, 5)["status"] == jobs.DONE
+    assert queue.get(live)["status"] == jobs.RUNNING
+
+
+def test_lapsed_lease_is_recovered_while_running(make_queue):
+    queue = make_queue(stale_after=0.4)
+    queue.ensure_started()
+    orphan = _insert(queue, jobs.RUNNING, started_ago=1)  # its process died after the pool started
+    assert queue.wait(orphan, 5)["status"] == jobs.DONE
+
+
+def test_leases_of_long_jobs_are_renewed(make_queue):
+    queue = make_queue(stale_after=0.4)
+    runs = []
+    release = threading.Event()
+
+    def slow(params, user_id):
+        runs.append(time.monotonic())
+        release.wait(5)
+        return "slow"
+
+    queue.register("slow", slow)
+    job_id = queue.submit("slow")
+    time.sleep(1.2)  # three lease periods
+    release.set()
+    assert queue.wait(job_id, 5)["status"] == jobs.DONE
+    assert len(runs) == 1
+
+
+def test_stats_scoped_to_a_household(make_queue):
+    queue = make_queue()
+    for user_id in (1, 1, 2):
+        queue.wait(queue.submit("echo", user_id=user_id), 5)
+    assert queue.stats(1, scoped=True)["jobs"][jobs.DONE] == 2
+    assert "completed" not in queue.stats(1, scoped=True)
+    assert queue.stats()["jobs"][jobs.DONE] == 3
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(app_module.job_queue._handlers, "echo", lambda params, user_id: params)
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"jobs-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        user_id = user.id
+    other = app_module.job_queue.submit("echo", {"who": "other"}, user_id=user_id + 10_000)
+    app_module.job_queue.wait(other, 5)
+    with app_module.app.test_client() as c:
+        with c.session_transaction() as s:
+            s["user_id"] = user_id
+        c.user_id = user_id
+        yield c
+
+
+@pytest.mark.parametrize("query", ["", "?limit=abc", "?limit=-5", "?limit=1000"])
+def test_jobs_list_tolerates_bad_limits(client, query):
+    app_module.job_queue.submit("echo", {}, user_id=client.user_id)
+    resp = client.get(f"/api/jobs{query}")
+    assert resp.status_code == 200
+    assert 1 <= len(resp.get_json()["jobs"]) <= 100
+
+
+@pytest.mark.parametrize("wait", ["abc", "nan", "-1", "inf", "0.5"])
+def test_job_status_tolerates_bad_waits(client, wait):
+    job_id = app_module.job_queue.submit("echo", {}, user_id=client.user_id)
+    resp = client.get(f"/api/jobs/{job_id}?wait={wait}")
+    assert resp.status_code == 200
+    assert resp.get_json()["id"] == job_id
+
+
+def test_job_stats_endpoint_counts_only_the_households_jobs(client):
+    app_module.job_queue.wait(app_module.job_queue.submit("echo", {}, user_id=client.user_id), 5)
+    body = client.get("/api/jobs/stats").get_json()
+    assert sum(body["jobs"].values()) == 1
+    assert "wait_ms" not in body
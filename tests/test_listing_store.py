@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+
+import services.housing as housing
+from benchmarks.stub_server import CENTER, StubServer
+from services.cache import TTLCache
+from services.listing_store import SCHEMA_VERSION, ListingRefresher, ListingStore
+
+
+def _listing(key, price, lat=30.27, lon=-97.74, beds=2):
+    return {"source_key": key, "price": price, "beds": beds, "baths": 1, "sqft": 800, "lat": lat, "lon": lon,
+            "address": f"{key} Main St", "url": f"http://listing/{key}"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ListingStore(str(tmp_path / "listings.db"))
+
+
+def test_overlapping_markets_share_a_listing(store):
+    shared = _listing("shared", 900)
+    assert store.replace_market("austin, tx", [shared, _listing("a", 1500)]) == 2
+    assert store.replace_market("round rock, tx", [shared, _listing("r", 1700, lat=30.5)]) == 2
+    assert store.market("austin, tx")["listings"] == 2
+    assert store.stats()["listings"] == 3
+    # a refresh of one market that no longer returns the listing leaves it in the other
+    store.replace_market("austin, tx", [_listing("a", 1500)])
+    assert store.stats()["listings"] == 3
+    assert [r["price"] for r in store.cheapest(30.27, -97.74, 5, limit=5)] == [900, 1500]
+    store.replace_market("round rock, tx", [_listing("r", 1700, lat=30.5)])
+    assert store.stats()["listings"] == 2
+    assert [r["price"] for r in store.cheapest(30.27, -97.74, 5, limit=5)] == [1500]
+
+
+def test_market_centre_is_the_given_location(store):
+    listings = [_listing("far", 1000, lat=30.6, lon=-97.4), _listing("farther", 1100, lat=30.7, lon=-97.3),
+                dict(_listing("unplaced", 800), lat=None, lon=None)]
+    store.replace_market("austin, tx", listings, center=(30.27, -97.74))
+    market = store.market("austin, tx")
+    assert (market["lat"], market["lon"]) == (30.27, -97.74)
+    assert [r["price"] for r in store.cheapest(30.27, -97.74, 1, limit=5)] == [800]
+    # without a location the listings' median stands in
+    store.replace_market("lakeway, tx", listings[:2])
+    assert store.market("lakeway, tx")["lat"] == 30.7
+
+
+def test_old_store_is_dropped_and_recreated(tmp_path):
+    path = tmp_path / "listings.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("CREATE TABLE market (location TEXT PRIMARY KEY, lat REAL, lon REAL, radius REAL, "
+                       "refreshed_at REAL NOT NULL, listings INTEGER NOT NULL DEFAULT 0);"
+                       "CREATE TABLE listing (id INTEGER PRIMARY KEY, source_key TEXT NOT NULL UNIQUE, "
+                       "market TEXT NOT NULL, price REAL, lat REAL NOT NULL, lon REAL NOT NULL, refreshed_at REAL NOT NULL);"
+                       "INSERT INTO market VALUES ('austin, tx', 30.3, -97.7, NULL, 1, 1);")
+    conn.close()
+    store = ListingStore(str(path))
+    assert store.markets() == []
+    assert store.replace_market("austin, tx", [_listing("a", 1500)]) == 1
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+def test_schedule_is_a_noop_when_refresh_is_disabled(store):
+    calls = []
+    refresher = ListingRefresher(store, lambda location, radius: calls.append(location), interval=0)
+    for _ in range(3):
+        refresher.schedule("austin, tx")
+    assert refresher._queue.qsize() == 0
+    assert refresher._thread is None
+    assert calls == []
+
+
+@pytest.fixture
+def upstream(monkeypatch, store):
+    with StubServer(latency=0.0) as server:
+        monkeypatch.setattr(housing, "RENTCAST_API_KEY", "test-key")
+        monkeypatch.setattr(housing, "RENTCAST_BASE_URL", server.url)
+        monkeypatch.setattr(housing, "GEOCODER_URL", server.url + "/geocode")
+        monkeypatch.setattr(housing, "_geocode_cache", TTLCache(maxsize=8, ttl=600))
+        monkeypatch.setattr(housing, "_store", store)
+        monkeypatch.setattr(housing, "_refresher", ListingRefresher(store, housing.refresh_market, interval=0))
+        yield server
+
+
+def test_refresh_market_centres_on_the_geocoded_location(upstream, store):
+    assert housing.refresh_market("Austin,  TX") > 0
+    market = store.market("austin, tx")
+    assert (market["lat"], market["lon"]) == CENTER
+    housing.refresh_market("austin, tx")
+    assert upstream.calls["/geocode"] == 1  # cached per normalized location
+
+
+def test_local_search_falls_back_when_refresh_is_disabled(upstream):
+    assert housing.local_search("Austin, TX") is None
+    assert housing._refresher._queue.qsize() == 0
+    housing.refresh_market("Austin, TX")
+    results = housing.local_search("Austin, TX", radius=25, min_beds=1, min_baths=1, min_sqft=0, max_results=3)
+    assert len(results) == 3
+    assert [r["price"] for r in results] == sorted(r["price"] for r in results)
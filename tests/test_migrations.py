@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the schema the single-tenant app created, before accounts and category ids
+BASELINE_SCHEMA = """
+CREATE TABLE category (id INTEGER NOT NULL, name VARCHAR(100), type VARCHAR(20), is_need BOOLEAN,
+                       PRIMARY KEY (id), UNIQUE (name));
+CREATE TABLE expense (id INTEGER NOT NULL, category VARCHAR(100), amount FLOAT, date DATETIME, PRIMARY KEY (id));
+CREATE TABLE income (id INTEGER NOT NULL, category VARCHAR(100), amount FLOAT, date DATETIME, PRIMARY KEY (id));
+CREATE TABLE budget (id INTEGER NOT NULL, category VARCHAR(100), "limit" FLOAT, PRIMARY KEY (id), UNIQUE (category));
+CREATE TABLE user_details (id INTEGER NOT NULL, location VARCHAR(200), radius INTEGER, insurance_type VARCHAR(100),
+                           family_members TEXT, pets TEXT, PRIMARY KEY (id));
+"""
+
+# the app module reads DATABASE_URL when it is imported, so the upgrade runs in a fresh interpreter
+UPGRADE = textwrap.dedent("""
+    import json
+    from datetime import datetime
+    import app as app_module
+
+    app_module.create_app()
+    with app_module.app.app_context():
+        session = app_module.db.session
+        user = app_module.User.query.filter_by(username="default").one()
+        session.info[app_module.data_version.SCOPE] = user.id
+        rent = app_module._category_id(user.id, "Rent")
+        app_module.add_transaction(user.id, "expense", rent, 1200.0, datetime(2024, 5, 1), "May rent")
+        conn = session.connection()
+        print(json.dumps({
+            "expenses": app_module.Expense.query.count(),
+            "incomes": app_module.Income.query.count(),
+            "budgets": [b.limit for b in app_module.Budget.query.all()],
+            "series": sorted((s.count, s.total, s.cadence) for s in app_module.RecurringSeries.query.all()),
+            "summary": app_module.CategoryMonthlyTotal.query.count(),
+            "foreign_key_errors": conn.exec_driver_sql("PRAGMA foreign_key_check").all(),
+            "legacy_refs": conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE sql LIKE '%_legacy_%' OR name LIKE '_legacy_%'").all(),
+        }, default=list))
+""")
+
+
+def test_baseline_database_upgrades(tmp_path):
+    path = tmp_path / "finance.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany("INSERT INTO category (name, type, is_need) VALUES (?, ?, ?)",
+                     [("Rent", "expense", 1), ("Food", "expense", 1), ("Salary", "income", 1)])
+    conn.executemany("INSERT INTO expense (category, amount, date) VALUES (?, ?, ?)",
+                     [("Rent", 1200.0, f"2024-0{m}-01 09:00:00.000000") for m in range(1, 5)]
+                     + [("Food", 80.0, "2024-04-12 18:00:00.000000")])
+    conn.execute("INSERT INTO income (category, amount, date) VALUES ('Salary', 3000.0, '2024-04-01 08:00:00.000000')")
+    conn.execute("""INSERT INTO budget (category, "limit") VALUES ('Food', 400.0)""")
+    conn.execute("INSERT INTO user_details (location, radius) VALUES ('Austin, TX', 10)")
+    conn.commit()
+    conn.close()
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", JOBS_DB_PATH=str(tmp_path / "jobs.db"),
+               EXPLANATION_CACHE_PATH=str(tmp_path / "explanations.db"), LISTINGS_DB_PATH=str(tmp_path / "listings.db"))
+    proc = subprocess.run([sys.executable, "-c", UPGRADE], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert result["expenses"] == 6 and result["incomes"] == 1
+    assert result["budgets"] == [400.0]
+    assert result["series"] == [[1, 80.0, None], [5, 6000.0, "monthly"]]
+    assert result["summary"] == 7  # rent in five months, food and salary in April
+    assert result["foreign_key_errors"] == []
+    assert result["legacy_refs"] == []
+
+
+def test_add_autoincrement_keeps_ids_and_search(tmp_path):
+    from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, create_engine
+    from sqlalchemy.orm import Session
+
+    from services import migrations, search
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'ids.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE expense (id INTEGER NOT NULL, user_id INTEGER NOT NULL, amount FLOAT, "
+                             "date DATETIME, description VARCHAR(200), PRIMARY KEY (id))")
+        conn.exec_driver_sql("INSERT INTO expense (user_id, amount, description) VALUES "
+                             "(1, 5.0, 'Coffee'), (1, 7.5, 'Starbucks'), (2, 9.0, NULL), (1, 12.0, 'Bakery'), (1, 3.0, NULL)")
+        conn.exec_driver_sql("DELETE FROM expense WHERE id = 2")
+    expense = Table("expense", MetaData(), Column("id", Integer, primary_key=True),
+                    Column("user_id", Integer, nullable=False), Column("amount", Float), Column("date", DateTime),
+                    Column("description", String(200)), sqlite_autoincrement=True)
+    with Session(engine) as session:
+        search.ensure_index(session, ["expense"])
+        progress = []
+        assert migrations.add_autoincrement(session, [expense], batch_size=2,
+                                            progress=lambda table, rows: progress.append(rows)) == 4
+        assert progress == [2, 4]
+        assert migrations.add_autoincrement(session, [expense]) == 0
+        search.ensure_index(session, ["expense"])
+        conn = session.connection()
+        assert "AUTOINCREMENT" in conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'expense'").scalar()
+        assert conn.exec_driver_sql("SELECT id FROM expense ORDER BY id").scalars().all() == [1, 3, 4, 5]
+        conn.exec_driver_sql("DELETE FROM expense WHERE id = 5")
+        conn.exec_driver_sql("INSERT INTO expense (user_id, amount, description) VALUES (1, 4.0, 'Bagel')")
+        assert conn.exec_driver_sql("SELECT MAX(id) FROM expense").scalar() == 6
+        matches = conn.exec_driver_sql(
+            "SELECT rowid FROM expense_fts WHERE expense_fts MATCH ? ORDER BY rowid", (search.match_expression("ba", 1),)
+        ).scalars().all()
+        assert matches == [4, 6]
@@ -0,0 +1,145 @@
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import app as app_module
+from services import recurring
+
+
+def _monthly(start, n):
+    return [recurring._add_months(start, i) for i in range(n)]
+
+
+def _weekly(start, n):
+    return [start + timedelta(weeks=i) for i in range(n)]
+
+
+@pytest.mark.parametrize("dates, expected", [
+    (_monthly(date(2024, 1, 31), 6), "monthly"),  # 31st clamped to month ends
+    (_weekly(date(2024, 3, 4), 5), "weekly"),
+    ([date(2024, 3, 4) + timedelta(days=d) for d in (0, 13, 29, 42)], "biweekly"),
+    (_monthly(date(2023, 1, 15), 5)[:2] + _monthly(date(2023, 4, 15), 3), "monthly"),  # one skipped month
+    ([date(2024, 1, 1) + timedelta(days=d) for d in (0, 9, 31, 33, 70, 71)], None),
+    ([date(2024, 1, 1) + timedelta(days=d) for d in (0, 7, 30)], None),  # a weekly and a monthly gap
+    (_monthly(date(2024, 1, 5), 2), None),  # too few charges
+])
+def test_cadence_detection(dates, expected):
+    assert recurring.cadence(dates)[0] == expected
+
+
+def test_one_late_charge_is_tolerated_only_with_enough_history():
+    assert recurring.cadence([date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 20)])[0] is None
+    assert recurring.cadence(_weekly(date(2024, 1, 1), 4) + [date(2024, 2, 6)])[0] == "weekly"
+
+
+def test_next_charge_keeps_the_day_of_month():
+    assert recurring.next_charge(date(2024, 1, 31), "monthly") == date(2024, 2, 29)
+    assert recurring.next_charge(date(2024, 11, 15), "quarterly") == date(2025, 2, 15)
+    assert recurring.next_charge(date(2024, 3, 4), "weekly") == date(2024, 3, 11)
+
+
+@pytest.fixture
+def household():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"recurring-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        app_module.db.session.info[app_module.data_version.SCOPE] = user.id
+        yield user.id
+
+
+def _rows(user_id):
+    t = app_module.RecurringSeries
+    return sorted((r.category_id, r.bucket, r.count, round(r.total, 2), r.dates, r.description, r.cadence,
+                   r.last_date, r.next_date) for r in t.query.filter_by(user_id=user_id))
+
+
+def _rebuilt(user_id):
+    # the series recomputed from this household's expenses, without keeping them
+    session = app_module.db.session
+    session.commit()
+    recurring.rebuild(session, app_module.RecurringSeries, app_module.Expense, user_id)
+    try:
+        return _rows(user_id)
+    finally:
+        session.rollback()
+
+
+def _client(user_id):
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s["user_id"] = user_id
+    return client
+
+
+def _detected(user_id, today):
+    return recurring.detected(app_module.db.session, app_module.RecurringSeries, user_id, today=today)
+
+
+def test_series_follows_adds_edits_and_deletes(household):
+    utilities = app_module._category_id(household, "Utilities")
+    for day in _monthly(date(2024, 1, 10), 4):
+        app_module.add_transaction(household, "expense", utilities, 15.99, datetime.combine(day, datetime.min.time()),
+                                   "Spotify")
+    app_module.add_transaction(household, "expense", utilities, 80.0, datetime(2024, 2, 3), "Power bill")
+    assert _rows(household) == _rebuilt(household)
+    [series] = _detected(household, date(2024, 4, 20))
+    assert (series["description"], series["cadence"], series["count"]) == ("Spotify", "monthly", 4)
+    assert series["next_date"] == "2024-05-10"
+
+    # an edit books the old row out and the new one in; a price rise moves the charge to another bucket
+    session = app_module.db.session
+    txn = app_module.Expense.query.filter_by(user_id=household, date=datetime(2024, 4, 10)).one()
+    recurring.apply_change(session, app_module.RecurringSeries, app_module.Expense, household, txn.category_id,
+                           txn.date, txn.amount, count=-1)
+    txn.amount, txn.description = 21.99, "Spotify Family"
+    recurring.apply_change(session, app_module.RecurringSeries, app_module.Expense, household, txn.category_id,
+                           txn.date, txn.amount, txn.description)
+    session.commit()
+    assert _rows(household) == _rebuilt(household)
+    [series] = _detected(household, date(2024, 4, 12))
+    assert (series["count"], series["next_date"]) == (3, "2024-04-10")
+    assert _detected(household, date(2024, 4, 20)) == []  # overdue past its tolerance: lapsed
+
+    client = _client(household)
+    txn = app_module.Expense.query.filter_by(user_id=household, date=datetime(2024, 2, 10)).one()
+    assert client.post(f"/delete-transaction/expense/{txn.id}").status_code == 302
+    app_module.db.session.expire_all()
+    assert _rows(household) == _rebuilt(household)
+    assert _detected(household, date(2024, 4, 12)) == []  # two charges left are not a series
+
+    for txn in app_module.Expense.query.filter_by(user_id=household).all():
+        assert client.post(f"/delete-transaction/expense/{txn.id}").status_code == 302
+    app_module.db.session.expire_all()
+    assert _rows(household) == _rebuilt(household) == []
+
+
+def test_deleting_inside_the_window_refills_it_from_older_charges(household):
+    rent = app_module._category_id(household, "Rent")
+    days = _weekly(date(2023, 1, 2), recurring.WINDOW + 3)
+    app_module._write_transactions([(household, "expense", rent, 25.0, datetime.combine(d, datetime.min.time()), "Gym")
+                                    for d in days])
+    [before] = _rows(household)
+    assert before[2] == len(days) and before[6] == "weekly"
+
+    client = _client(household)
+    for when in (days[-1], days[-5]):
+        txn = app_module.Expense.query.filter_by(user_id=household, date=datetime.combine(when, datetime.min.time())).one()
+        assert client.post(f"/delete-transaction/expense/{txn.id}").status_code == 302
+    app_module.db.session.expire_all()
+    [after] = _rows(household)
+    assert after == _rebuilt(household)[0]
+    assert after[2] == len(days) - 2
+    assert after[7] == days[-2]  # the last charge moved back
+    assert after[6] == "weekly"  # one missed week is tolerated
+
+
+def test_deleting_a_category_drops_its_series(household):
+    rent = app_module._category_id(household, "Rent")
+    for day in _monthly(date(2024, 1, 1), 3):
+        app_module.add_transaction(household, "expense", rent, 1200.0, datetime.combine(day, datetime.min.time()))
+    assert len(_rows(household)) == 1
+    assert _client(household).post(f"/delete-category/{rent}").status_code == 302
+    app_module.db.session.expire_all()
+    assert _rows(household) == []
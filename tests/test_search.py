@@ -0,0 +1,132 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from services import search
+
+
+@pytest.mark.parametrize("text", ["", "   ", "***", "\"'()-+^:*", "—…", None])
+def test_punctuation_only_queries_have_no_terms(text):
+    assert search.match_expression(text, 1) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("star", 'user_id : 5 AND "star"*'),
+    ("coffee OR NOT tea", 'user_id : 5 AND "coffee"* AND "OR"* AND "NOT"* AND "tea"*'),
+    ('"corner" NEAR(shop)', 'user_id : 5 AND "corner"* AND "NEAR"* AND "shop"*'),
+    ("user_id:7 rent", 'user_id : 5 AND "user_id"* AND "7"* AND "rent"*'),
+    ("Café", 'user_id : 5 AND "Café"*'),
+])
+def test_operators_are_matched_as_words(text, expected):
+    assert search.match_expression(text, 5) == expected
+
+
+def test_terms_are_capped():
+    expression = search.match_expression(" ".join(f"w{i}" for i in range(20)), 1)
+    assert expression.count("*") == search.MAX_TERMS
+
+
+def _new_user():
+    user = app_module.create_user(f"search-{uuid.uuid4().hex[:8]}", "password123")
+    app_module.db.session.commit()
+    return user.id
+
+
+@pytest.fixture
+def users():
+    with app_module.app.app_context():
+        app_module.init_db()
+        yield _new_user(), _new_user()
+
+
+def _find(user_id, text, kind=None):
+    tables = {k: m.__table__ for k, m in app_module.TRANSACTION_MODELS.items() if kind in (None, k)}
+    return [(h["type"], h["id"]) for h in search.search(app_module.db.session, tables, app_module.Category.__table__,
+                                                         user_id, text)]
+
+
+def _expense(user_id, description, category="Food", amount=5.0):
+    row = app_module.Expense(user_id=user_id, category_id=app_module._category_id(user_id, category), amount=amount,
+                             date=datetime(2024, 5, 1), description=description)
+    app_module.db.session.add(row)
+    app_module.db.session.commit()
+    return row
+
+
+def test_index_follows_inserts_updates_and_deletes(users):
+    me, _ = users
+    session = app_module.db.session
+    row = _expense(me, "Starbucks Reserve")
+    assert _find(me, "star") == [("expense", row.id)]
+    assert _find(me, "reserve starb") == [("expense", row.id)]
+
+    row.description = "Blue Bottle"
+    session.commit()
+    assert _find(me, "starbucks") == []
+    assert _find(me, "bottle") == [("expense", row.id)]
+
+    row.amount = 6.0  # not an indexed column
+    session.commit()
+    assert _find(me, "bottle") == [("expense", row.id)]
+
+    row.description = None
+    session.commit()
+    assert _find(me, "bottle") == []
+    row.description = "Blue Bottle again"
+    session.commit()
+    assert _find(me, "bottle") == [("expense", row.id)]
+
+    session.delete(row)
+    session.commit()
+    assert _find(me, "bottle") == []
+
+
+def test_income_rows_are_indexed_too(users):
+    me, _ = users
+    row = app_module.Income(user_id=me, category_id=app_module._category_id(me, "Salary"), amount=100.0,
+                            date=datetime(2024, 5, 1), description="ACME payroll")
+    app_module.db.session.add(row)
+    app_module.db.session.commit()
+    assert _find(me, "acme") == [("income", row.id)]
+    assert _find(me, "acme", kind="expense") == []
+
+
+def test_category_delete_cascades_out_of_the_index(users):
+    me, _ = users
+    _expense(me, "Weekly groceries", category="Food")
+    kept = _expense(me, "Weekly bus pass", category="Transport")
+    session = app_module.db.session
+    session.delete(session.get(app_module.Category, app_module._category_id(me, "Food")))
+    session.commit()
+    assert _find(me, "weekly") == [("expense", kept.id)]
+
+
+def test_results_are_scoped_to_the_household(users):
+    me, other = users
+    mine = _expense(me, "Netflix subscription")
+    theirs = _expense(other, "Netflix subscription")
+    assert _find(me, "netflix") == [("expense", mine.id)]
+    assert _find(other, "netflix") == [("expense", theirs.id)]
+    # a row handed to another household moves with it
+    mine.user_id = other
+    app_module.db.session.commit()
+    assert _find(me, "netflix") == []
+    assert sorted(_find(other, "netflix")) == sorted([("expense", mine.id), ("expense", theirs.id)])
+
+
+def test_endpoint_rejects_queries_without_words(users):
+    me, _ = users
+    _expense(me, "Corner shop")
+    with app_module.app.test_client() as client:
+        with client.session_transaction() as s:
+            s["user_id"] = me
+        for q in ("", "***", '"', "(-)", "^:"):
+            resp = client.get("/api/search", query_string={"q": q})
+            assert resp.status_code == 400, q
+        for q in ("NOT", "OR corner", '"corner', "corner*", "NEAR(corner shop)"):
+            resp = client.get("/api/search", query_string={"q": q})
+            assert resp.status_code == 200, q
+        items = client.get("/api/search", query_string={"q": "corner*"}).get_json()["items"]
+        assert [item["description"] for item in items] == ["Corner shop"]
@@ -0,0 +1,108 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import app as app_module
+from services import simulation
+from services.forecast import History
+
+JANUARY = 2024 * 12
+
+
+@pytest.fixture
+def model():
+    # six complete months and the current one, two expense categories and a salary
+    expenses = History(["Food", "Rent"], JANUARY, np.array([[400.0, 520.0, 380.0, 610.0, 450.0, 0.0, 90.0],
+                                                            [1500.0] * 6 + [1500.0]]))
+    income = History(["Salary"], JANUARY, np.array([[2500.0, 2500.0, 2600.0, 2500.0, 2400.0, 2500.0, 0.0]]))
+    return simulation.build_model(expenses, income, {"Food": 300.0, "Gym": 40.0})
+
+
+def test_seeded_run_is_reproducible(model):
+    first = simulation.simulate(model, months=6, paths=3000, seed=42, goals=[1000.0, 5000.0])
+    assert simulation.simulate(model, months=6, paths=3000, seed=42, goals=[1000.0, 5000.0]) == first
+    assert simulation.simulate(model, months=6, paths=3000, seed=43, goals=[1000.0, 5000.0]) != first
+    unseeded = simulation.simulate(model, months=6, paths=100)
+    assert simulation.simulate(model, months=6, paths=100, seed=unseeded["seed"]) == unseeded
+
+
+def test_percentile_bands_have_the_expected_shape(model):
+    result = simulation.simulate(model, months=9, paths=500, seed=1, goals=[2000.0])
+    assert result["history_months"] == 6
+    assert set(result["scenarios"]) == {simulation.CURRENT, simulation.SUGGESTED}
+    keys = [f"p{p}" for p in simulation.PERCENTILES]
+    for scenario in result["scenarios"].values():
+        balance, final = scenario["balance"], scenario["final"]
+        assert list(balance) == list(final) == list(scenario["monthly_net"]) == keys
+        assert all(len(balance[k]) == 9 for k in keys)  # one value per simulated month
+        assert all(isinstance(final[k], float) for k in keys)
+        for month in range(9):
+            column = [balance[k][month] for k in keys]
+            assert column == sorted(column)
+        assert [final[k] for k in keys] == [balance[k][-1] for k in keys]
+        assert 0.0 <= scenario["shortfall"] <= 1.0
+        [goal] = scenario["goals"]
+        assert goal["amount"] == 2000.0 and 0.0 <= goal["probability"] <= 1.0
+    # a smaller food budget, less the flat gym fee, still saves more on the median path
+    scenarios = result["scenarios"]
+    assert scenarios[simulation.SUGGESTED]["final"]["p50"] > scenarios[simulation.CURRENT]["final"]["p50"]
+
+
+def test_small_runs_stay_in_process(model, monkeypatch):
+    def no_pool(workers):
+        raise AssertionError("a small run started the process pool")
+
+    monkeypatch.setattr(simulation, "_executor", no_pool)
+    paths = simulation.PARALLEL_MIN_PATHS - 1
+    balances = simulation.sample(model, months=3, paths=paths, seed=7, workers=8)
+    assert balances.shape == (2, paths, 3)
+
+
+def test_pooled_chunks_match_the_in_process_run(model, monkeypatch):
+    # the pool only changes where chunks run, not their seeds; threads stand in for processes here
+    used = []
+
+    def threads(workers):
+        used.append(workers)
+        return ThreadPoolExecutor(max_workers=workers)
+
+    monkeypatch.setattr(simulation, "_executor", threads)
+    paths = simulation.PARALLEL_MIN_PATHS + 5
+    pooled = simulation.sample(model, months=2, paths=paths, seed=7, workers=4)
+    assert used == [4]
+    np.testing.assert_array_equal(pooled, simulation.sample(model, months=2, paths=paths, seed=7, workers=1))
+
+
+@pytest.mark.parametrize("kwargs", [{"months": 0}, {"months": simulation.MAX_MONTHS + 1}, {"paths": 0},
+                                    {"seed": -1}, {"goals": [0.0]}, {"goals": [1.0] * (simulation.MAX_GOALS + 1)}])
+def test_bad_arguments_are_rejected(model, kwargs):
+    with pytest.raises(ValueError):
+        simulation.simulate(model, **kwargs)
+
+
+def test_endpoint_repeats_a_seeded_run():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"simulate-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        food = app_module._category_id(user.id, "Food")
+        salary = app_module._category_id(user.id, "Salary")
+        now = datetime.utcnow()
+        for back, amount in enumerate((410.0, 530.0, 390.0, 600.0), start=1):
+            month = now.year * 12 + now.month - 1 - back
+            when = datetime(month // 12, month % 12 + 1, 5)
+            app_module.add_transaction(user.id, "expense", food, amount, when)
+            app_module.add_transaction(user.id, "income", salary, 2500.0, when)
+        user_id = user.id
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s["user_id"] = user_id
+    body = {"months": 6, "paths": 400, "seed": 5, "goals": [1000], "suggested_budgets": {"Food": 350}}
+    first = client.post("/api/simulate", json=body)
+    assert first.status_code == 200
+    assert client.post("/api/simulate", json=body).get_json() == first.get_json()
+    assert first.get_json()["history_months"] == 4
+    assert client.post("/api/simulate", json=dict(body, months=0)).status_code == 400
@@ -0,0 +1,61 @@
+from collections import Counter
+
+from sqlalchemy import text
+
+import app as app_module
+
+
+def _schema():
+    conn = app_module.db.session.connection()
+    rows = conn.exec_driver_sql("SELECT type, name, tbl_name, sql FROM sqlite_master ORDER BY type, name").all()
+    app_module.db.session.rollback()
+    return rows
+
+
+def _indexed_columns():
+    # (table, columns) of every index, the implicit ones behind UNIQUE constraints included
+    conn = app_module.db.session.connection()
+    out = []
+    for (table,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").all():
+        for index in conn.exec_driver_sql(f'PRAGMA index_list("{table}")').all():
+            columns = tuple(r[2] for r in conn.exec_driver_sql(f'PRAGMA index_info("{index[1]}")').all())
+            out.append((table, columns))
+    app_module.db.session.rollback()
+    return out
+
+
+def _counts():
+    return {model.__tablename__: model.query.count()
+            for model in (app_module.User, app_module.Category, app_module.CategoryMonthlyTotal,
+                          app_module.RecurringSeries)}
+
+
+def test_init_db_on_an_initialized_database_is_a_noop():
+    with app_module.app.app_context():
+        app_module.init_db()
+        before, counts = _schema(), _counts()
+        assert app_module.init_db() is False
+        assert _schema() == before
+        assert _counts() == counts
+
+
+def test_rerunning_every_step_creates_nothing_twice():
+    with app_module.app.app_context():
+        app_module.init_db()
+        before, counts = _schema(), _counts()
+        # as after a model change: the stored revision no longer matches
+        app_module.db.session.execute(text("PRAGMA user_version = 0"))
+        app_module.db.session.commit()
+        assert app_module.init_db() is True
+        assert _schema() == before
+        assert _counts() == counts
+        assert app_module.db.session.execute(text("PRAGMA user_version")).scalar() == app_module.schema_revision()
+
+
+def test_no_two_indexes_cover_the_same_columns():
+    with app_module.app.app_context():
+        app_module.init_db()
+        duplicates = [key for key, n in Counter(_indexed_columns()).items() if n > 1]
+        assert duplicates == []
+        names = [name for kind, name, _, _ in _schema() if kind == "index"]
+        assert len(names) == len(set(names))
@@ -0,0 +1,72 @@
+import contextvars
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from services import storage
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'storage.db'}")
+    storage.configure_engine(engine, "production")
+    engine.begins = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("BEGIN"):
+            engine.begins.append(statement)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+    engine.begins.clear()
+    yield engine
+    engine.dispose()
+
+
+def test_transactions_are_deferred_unless_marked_immediate(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("SELECT * FROM t").all()
+    with storage.immediate():
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("SELECT * FROM t").all()
+    assert engine.begins == ["BEGIN", "BEGIN IMMEDIATE", "BEGIN"]
+
+
+def test_immediate_as_decorator(engine):
+    @storage.immediate()
+    def write():
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+
+    write()
+    assert engine.begins == ["BEGIN IMMEDIATE"]
+
+
+def test_copied_context_outside_a_write_stays_deferred(engine):
+    # advisor pool threads run in a copy of the request's context
+    ctx = contextvars.copy_context()
+
+    def read():
+        with engine.begin() as conn:
+            conn.exec_driver_sql("SELECT * FROM t").all()
+
+    thread = threading.Thread(target=ctx.run, args=(read,))
+    thread.start()
+    thread.join()
+    assert engine.begins == ["BEGIN"]
+
+
+def test_open_read_transaction_does_not_block_a_write(engine):
+    with engine.connect() as reader:
+        reader.begin()
+        reader.exec_driver_sql("SELECT * FROM t").all()
+        with storage.immediate():
+            with engine.begin() as writer:
+                writer.exec_driver_sql("INSERT INTO t VALUES (3)")
+        reader.rollback()
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT x FROM t").scalars().all() == [3]
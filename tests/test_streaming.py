@@ -0,0 +1,142 @@
+import json
+import time
+import uuid
+from concurrent.futures import Future
+
+import pytest
+
+import app as app_module
+import services.gemini as gemini
+import services.http_client as http_client
+from benchmarks.stub_server import STREAM_CHUNKS, StubServer
+
+
+@pytest.fixture
+def client():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"stream-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.add(app_module.UserDetails(
+            user_id=user.id, location="Austin, TX", radius=10, family_members="[]", pets="[]"))
+        app_module.db.session.commit()
+        user_id = user.id
+    with app_module.app.test_client() as c:
+        with c.session_transaction() as s:
+            s["user_id"] = user_id
+        yield c
+
+
+def _gemini(monkeypatch, server):
+    # a client of its own, so failures here don't trip the process-wide breaker for 127.0.0.1
+    monkeypatch.setattr(http_client, "_client", http_client.HttpClient(max_retries=0))
+    monkeypatch.setattr(gemini, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(gemini, "GEMINI_ENDPOINT", server.url + "/generate")
+    monkeypatch.setattr(gemini, "GEMINI_STREAM_ENDPOINT", server.url + "/stream")
+
+
+def _recommendation():
+    # a fresh budget per test keeps the explanation cache from answering
+    return {"needs": {"beds": 1, "baths": 1, "sqft": 500}, "best_listing": None,
+            "suggested_budgets": {"Groceries": float(uuid.uuid4().int % 100000)}}
+
+
+def _events(body):
+    events = []
+    for block in body.split("\n\n"):
+        if not block or block.startswith(":"):
+            continue
+        event, data = "message", None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+def test_sse_chunks_arrive_in_order_then_done(client, monkeypatch):
+    with StubServer(latency=0.0) as server:
+        _gemini(monkeypatch, server)
+        body = _recommendation()
+        resp = client.post("/api/ai-explain/stream", json=body)
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/event-stream"
+        text = resp.get_data(as_text=True)
+        assert text.startswith(": stream open\n\n")
+        events = _events(text)
+        assert events == [("message", {"text": chunk}) for chunk in STREAM_CHUNKS] + [("done", {})]
+
+        # a complete stream is cached and replayed whole
+        events = _events(client.post("/api/ai-explain/stream", json=body).get_data(as_text=True))
+        assert events == [("message", {"text": "".join(STREAM_CHUNKS)}), ("done", {})]
+        assert server.calls["/stream"] == 1
+
+
+def test_sse_upstream_failure_mid_stream(client, monkeypatch):
+    with StubServer(latency=0.0, fail_after=2) as server:
+        _gemini(monkeypatch, server)
+        body = _recommendation()
+        events = _events(client.post("/api/ai-explain/stream", json=body).get_data(as_text=True))
+        # what arrived is passed on and the stream still ends normally
+        assert events == [("message", {"text": chunk}) for chunk in STREAM_CHUNKS[:2]] + [("done", {})]
+
+        # a truncated explanation is not cached
+        client.post("/api/ai-explain/stream", json=body).get_data()
+        assert server.calls["/stream"] == 2
+
+
+def test_sse_upstream_failure_before_first_chunk_falls_back(client, monkeypatch):
+    with StubServer(latency=0.0, status=503) as server:
+        _gemini(monkeypatch, server)
+        events = _events(client.post("/api/ai-explain/stream", json=_recommendation()).get_data(as_text=True))
+        assert [event for event, _ in events] == ["message", "done"]
+        assert events[0][1]["text"]
+
+
+def test_sse_client_disconnect_closes_upstream(client, monkeypatch):
+    chunks = [f"word{i} " for i in range(100)]
+    with StubServer(latency=0.0, chunks=chunks, chunk_interval=0.02) as server:
+        _gemini(monkeypatch, server)
+        entries = gemini.explanation_cache().stats()["entries"]
+        resp = client.post("/api/ai-explain/stream", json=_recommendation(), buffered=False)
+        stream = iter(resp.response)
+        assert next(stream) == b": stream open\n\n"
+        assert _events(next(stream).decode()) == [("message", {"text": "word0 "})]
+        resp.close()
+
+        deadline = time.monotonic() + 5
+        while server.disconnects == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert server.disconnects == 1
+        assert gemini.explanation_cache().stats()["entries"] == entries
+
+
+def test_ndjson_recommendation_then_explanation(client, monkeypatch):
+    with StubServer(latency=0.0) as server:
+        _gemini(monkeypatch, server)
+        resp = client.post("/api/ai-recommend", json={"stream": True})
+        assert resp.status_code == 200
+        assert resp.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        assert [line["type"] for line in lines] == ["recommendation", "explanation"]
+        assert lines[0]["needs"] == {"beds": 1, "baths": 1, "sqft": 500}
+        assert lines[1]["explanation"] == "Stub explanation: the listing meets the minimum needs."
+
+
+def test_ndjson_client_disconnect_cancels_explanation(client, monkeypatch):
+    pending = []
+    submit = app_module._submit
+
+    def hold_explanation(fn, *args, **kwargs):
+        if fn is gemini.compose_explanation:
+            pending.append(Future())  # never started, as if the pool were busy
+            return pending[-1]
+        return submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(app_module, "_submit", hold_explanation)
+    resp = client.post("/api/ai-recommend", json={"stream": True}, buffered=False)
+    first = json.loads(next(iter(resp.response)))
+    assert first["type"] == "recommendation"
+    resp.close()
+    assert len(pending) == 1 and pending[0].cancelled()
@@ -0,0 +1,115 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from services import summary
+
+
+@pytest.fixture
+def household():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"summary-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        app_module.db.session.info[app_module.data_version.SCOPE] = user.id
+        yield user.id
+
+
+def _rows(user_id):
+    t = app_module.CategoryMonthlyTotal
+    return sorted((r.kind, r.category_id, r.month, round(r.total, 2), r.count) for r in t.query.filter_by(user_id=user_id))
+
+
+def _rebuilt(user_id):
+    # the summary rows recomputed from this household's raw rows, without keeping them
+    session = app_module.db.session
+    session.commit()
+    session.execute(app_module.CategoryMonthlyTotal.__table__.delete()
+                    .where(app_module.CategoryMonthlyTotal.user_id == user_id))
+    deltas = {}
+    for kind, model in app_module.TRANSACTION_MODELS.items():
+        for row in model.query.filter_by(user_id=user_id):
+            summary.add_delta(deltas, user_id, kind, row.category_id, row.date, row.amount)
+    summary.apply_deltas(session, app_module.CategoryMonthlyTotal, deltas)
+    try:
+        return _rows(user_id)
+    finally:
+        session.rollback()
+
+
+def _client(user_id):
+    client = app_module.app.test_client()
+    with client.session_transaction() as s:
+        s["user_id"] = user_id
+    return client
+
+
+def test_summary_follows_adds_edits_and_deletes(household):
+    food = app_module._category_id(household, "Food")
+    rent = app_module._category_id(household, "Rent")
+    salary = app_module._category_id(household, "Salary")
+    for amount, day in ((12.5, 3), (30.0, 17), (8.25, 28)):
+        app_module.add_transaction(household, "expense", food, amount, datetime(2024, 5, day))
+    app_module.add_transaction(household, "expense", rent, 1200.0, datetime(2024, 6, 1))
+    app_module.add_transaction(household, "income", salary, 3000.0, datetime(2024, 5, 31))
+    resp = _client(household).post("/", data={"expense_amount": "4.75", "expense_category": "Food"})
+    assert resp.status_code == 302
+    assert _rows(household) == _rebuilt(household)
+    totals = summary.category_totals(app_module.db.session, app_module.CategoryMonthlyTotal, household, "expense", "2024-05")
+    assert totals == {"Food": 50.75}
+
+    # an edit books the old row out and the new one in: amount, month and category change
+    session = app_module.db.session
+    txn = app_module.Expense.query.filter_by(user_id=household, amount=30.0).one()
+    summary.apply_delta(session, app_module.CategoryMonthlyTotal, household, "expense", txn.category_id, txn.date,
+                        -txn.amount, count=-1)
+    txn.amount, txn.date, txn.category_id = 45.0, datetime(2024, 6, 2), rent
+    summary.apply_delta(session, app_module.CategoryMonthlyTotal, household, "expense", rent, txn.date, txn.amount)
+    session.commit()
+    assert _rows(household) == _rebuilt(household)
+
+    client = _client(household)
+    for txn in app_module.Expense.query.filter_by(user_id=household, category_id=food).all():
+        assert client.post(f"/delete-transaction/expense/{txn.id}").status_code == 302
+    app_module.db.session.expire_all()
+    assert _rows(household) == _rebuilt(household)
+    # the May food row emptied out and is gone rather than left at zero
+    assert not any(kind == "expense" and cid == food for kind, cid, *_ in _rows(household))
+
+
+def test_deleting_a_category_drops_its_summary_rows(household):
+    food = app_module._category_id(household, "Food")
+    app_module.add_transaction(household, "expense", food, 20.0, datetime(2024, 5, 3))
+    assert _client(household).post(f"/delete-category/{food}").status_code == 302
+    app_module.db.session.expire_all()
+    assert _rows(household) == _rebuilt(household) == []
+
+
+def test_verify_reports_drift_and_rebuild_repairs_it(household):
+    food = app_module._category_id(household, "Food")
+    app_module.add_transaction(household, "expense", food, 20.0, datetime(2024, 5, 3))
+    app_module.add_transaction(household, "expense", food, 5.0, datetime(2024, 7, 9))
+    session = app_module.db.session
+    t = app_module.CategoryMonthlyTotal
+    session.query(t).filter_by(user_id=household, month="2024-05").update({"total": 99.0})
+    session.query(t).filter_by(user_id=household, month="2024-07").delete()
+    session.commit()
+
+    mine = [line for line in summary.verify(session, t, app_module.TRANSACTION_MODELS)
+            if line.startswith(f"user {household} ")]
+    assert mine == [
+        f"user {household} expense category {food} 2024-05: expected 20.00 (1 rows), found 99.00 (1 rows)",
+        f"user {household} expense category {food} 2024-07: expected 5.00 (1 rows), found 0.00 (0 rows)",
+    ]
+
+    runner = app_module.app.test_cli_runner()
+    result = runner.invoke(args=["summary", "verify"])
+    assert result.exit_code == 1
+    result = runner.invoke(args=["summary", "rebuild"])
+    assert result.exit_code == 0 and "Fixed" in result.output
+    result = runner.invoke(args=["summary", "verify"])
+    assert result.exit_code == 0 and "0 drifted rows" in result.output
+    session.expire_all()
+    assert [(month, total) for _, _, month, total, _ in _rows(household)] == [("2024-05", 20.0), ("2024-07", 5.0)]
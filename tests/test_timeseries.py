@@ -0,0 +1,99 @@
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+import app as app_module
+from services import timeseries
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    ys = [0.0] * 100
+    ys[37], ys[71] = 50.0, -40.0
+    xs, kept = timeseries.lttb(range(100), ys, 10)
+    assert len(xs) == len(kept) == 10
+    assert xs[0] == 0 and xs[-1] == 99
+    assert list(xs) == sorted(xs)
+    assert 37 in xs and 71 in xs
+
+
+def test_lttb_returns_short_series_unchanged():
+    assert timeseries.lttb([0, 1, 2], [5.0, 6.0, 7.0], 10) == ([0, 1, 2], [5.0, 6.0, 7.0])
+    assert timeseries.lttb([0, 1, 2, 3], [1.0, 2.0, 3.0, 4.0], 2) == ([0, 1, 2, 3], [1.0, 2.0, 3.0, 4.0])
+
+
+@pytest.mark.parametrize("day, bucket, start, nxt", [
+    (date(2024, 3, 14), "day", date(2024, 3, 14), date(2024, 3, 15)),
+    (date(2024, 3, 14), "week", date(2024, 3, 11), date(2024, 3, 18)),
+    (date(2024, 12, 14), "month", date(2024, 12, 1), date(2025, 1, 1)),
+])
+def test_buckets(day, bucket, start, nxt):
+    assert timeseries.bucket_start(day, bucket) == start
+    assert timeseries.next_bucket(day, bucket) == nxt
+    assert timeseries.bucket_index(nxt, start, bucket) == 1
+
+
+@pytest.fixture
+def household():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"series-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        ids = {name: app_module._category_id(user.id, name) for name in ("Rent", "Food", "Transport")}
+        rows = [("Rent", 1000.0, datetime(2024, m, 1)) for m in range(1, 4)]
+        rows += [("Food", 10.0 * d, datetime(2024, 1, d)) for d in range(1, 32)]
+        rows += [("Transport", 5.0, datetime(2024, 2, 10))]
+        app_module.db.session.add_all(app_module.Expense(user_id=user.id, category_id=ids[name], amount=amount, date=when)
+                                      for name, amount, when in rows)
+        app_module.db.session.commit()
+        yield user.id
+
+
+def _series(user_id, **kwargs):
+    return timeseries.series(app_module.db.session, app_module.Expense, app_module.Category, user_id, **kwargs)
+
+
+def test_series_by_month(household):
+    with app_module.app.app_context():
+        out = _series(household, bucket="month")
+    assert (out["bucket"], out["start"], out["end"], out["length"], out["downsampled"]) == \
+        ("month", "2024-01-01", "2024-04-01", 3, False)
+    assert [(s["name"], s["y"]) for s in out["series"]] == [
+        ("Food", [4960.0, 0.0, 0.0]), ("Rent", [1000.0, 1000.0, 1000.0]), ("Transport", [0.0, 5.0, 0.0]),
+    ]
+
+
+def test_series_folds_small_categories_into_other(household):
+    with app_module.app.app_context():
+        out = _series(household, bucket="month", categories=2)
+    assert [(s["name"], s["total"]) for s in out["series"]] == [("Food", 4960.0), (timeseries.OTHER, 3005.0)]
+
+
+def test_series_downsamples_long_ranges(household):
+    with app_module.app.app_context():
+        out = _series(household, bucket="day", points=10)
+    assert out["length"] == 61 and out["downsampled"]
+    food = next(s for s in out["series"] if s["name"] == "Food")
+    assert len(food["x"]) == len(food["y"]) == 10
+    assert food["total"] == 4960.0
+
+
+def test_series_rejects_too_many_buckets(household):
+    with app_module.app.app_context():
+        with pytest.raises(ValueError, match="buckets"):
+            _series(household, start=date(1990, 1, 1), end=date(2024, 1, 1), bucket="day")
+        out = _series(household, start=date(1990, 1, 1), end=date(2024, 1, 1), bucket="month")
+    assert out["length"] == 408
+
+
+def test_endpoint_rejects_unbounded_ranges(household):
+    with app_module.app.test_client() as client:
+        with client.session_transaction() as s:
+            s["user_id"] = household
+        resp = client.get("/api/timeseries?bucket=day&start=0001-01-01&end=9999-01-01")
+        assert resp.status_code == 400
+        assert "buckets" in resp.get_json()["error"]
+        resp = client.get("/api/timeseries?bucket=auto&start=0001-01-01&end=9999-01-01")
+        assert resp.status_code == 400
+        resp = client.get("/api/timeseries")
+        assert resp.status_code == 200
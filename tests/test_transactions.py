@@ -0,0 +1,85 @@
+import re
+import uuid
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from services import transactions
+
+SAME_TIME = datetime(2024, 5, 1, 9, 30)
+
+
+@pytest.fixture
+def client():
+    with app_module.app.app_context():
+        app_module.init_db()
+        user = app_module.create_user(f"pages-{uuid.uuid4().hex[:8]}", "password123")
+        app_module.db.session.commit()
+        user_id = user.id
+    with app_module.app.test_client() as c:
+        with c.session_transaction() as s:
+            s["user_id"] = user_id
+        c.user_id = user_id
+        yield c
+
+
+def _add(user_id, kind, category, amount, when):
+    with app_module.app.app_context():
+        cid = app_module._category_id(user_id, category)
+        app_module.add_transaction(user_id, kind, cid, amount, when)
+
+
+def _all_pages(client, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, cursor=cursor) if cursor else params
+        body = client.get("/api/transactions", query_string=query).get_json()
+        ids += [item["id"] for item in body["items"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids, pages
+
+
+def test_equal_timestamps_across_a_page_boundary(client):
+    _add(client.user_id, "expense", "Rent", 1200.0, datetime(2024, 6, 1))
+    for n in range(5):
+        _add(client.user_id, "expense", "Food", 10.0 + n, SAME_TIME)
+    _add(client.user_id, "expense", "Food", 3.0, datetime(2024, 4, 30))
+    with app_module.app.app_context():
+        expected = [e.id for e in app_module.Expense.query.filter_by(user_id=client.user_id)
+                    .order_by(app_module.Expense.date.desc(), app_module.Expense.id.desc())]
+    for limit in (1, 2, 3, 4):
+        ids, pages = _all_pages(client, type="expense", limit=limit)
+        assert ids == expected, limit  # none skipped or repeated where a page splits the tie
+        assert pages == -(-len(expected) // limit)
+    # the cursor of a row in the middle of the tie continues with the rest of it
+    with app_module.app.app_context():
+        tied = app_module.Expense.query.filter_by(user_id=client.user_id, date=SAME_TIME).order_by(
+            app_module.Expense.id.desc()).all()
+        cursor = transactions.encode_cursor(tied[1].date, tied[1].id)
+    body = client.get("/api/transactions", query_string={"type": "expense", "limit": 10, "cursor": cursor}).get_json()
+    assert [item["id"] for item in body["items"]] == [t.id for t in tied[2:]] + expected[-1:]
+
+
+def test_category_filter_applies_to_its_own_list(client):
+    _add(client.user_id, "expense", "Food", 20.0, SAME_TIME)
+    _add(client.user_id, "expense", "Rent", 900.0, SAME_TIME)
+    _add(client.user_id, "income", "Salary", 2500.0, SAME_TIME)
+    food = client.get("/api/transactions", query_string={"type": "expense", "category": "Food"}).get_json()
+    assert [item["category"] for item in food["items"]] == ["Food"]
+    # an expense category names nothing in the income list
+    assert client.get("/api/transactions", query_string={"type": "income", "category": "Food"}).get_json()["items"] == []
+
+    html = client.get("/fragments/transactions").get_data(as_text=True)
+    options = {name: sorted(re.findall(r'<option value="([^"]+)"', block)) for name, block in
+               re.findall(r'<select name="(\w+_category)"[^>]*>(.*?)</select>', html, re.S)}
+    assert options == {"expense_category": ["Entertainment", "Food", "Rent", "Transport", "Utilities"],
+                       "income_category": ["Salary", "Side Hustle"]}
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "Zm9v", "!!"])
+def test_malformed_cursor_is_a_400(client, cursor):
+    resp = client.get("/api/transactions", query_string={"type": "expense", "cursor": cursor})
+    assert resp.status_code == 400
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The storage profile and write queue are read when the app module is imported, so the
+# production-profile check runs in a fresh interpreter.
+PRODUCTION_CLIENT = textwrap.dedent("""
+    import json, threading
+    import app as app_module
+
+    app_module.create_app()
+    assert app_module._transaction_writes is not None
+    client = app_module.app.test_client()
+    assert client.post("/register", data={"username": "queue", "password": "password123"}).status_code == 302
+    cookie = client.get_cookie("session").value
+
+    statuses = []
+
+    def post(i):
+        c = app_module.app.test_client()
+        c.set_cookie("session", cookie)
+        resp = c.post("/", data={"expense_amount": str(10 + i), "expense_category": "Food",
+                                 "expense_description": f"item {i}"})
+        statuses.append(resp.status_code)
+
+    post(0)
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(1, 9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with app_module.app.app_context():
+        rows = app_module.Expense.query.count()
+        total = app_module.db.session.query(app_module.db.func.sum(app_module.CategoryMonthlyTotal.total)).scalar()
+    print(json.dumps({"statuses": statuses, "rows": rows, "total": total}))
+""")
+
+
+def test_transaction_post_under_production_profile(tmp_path):
+    env = dict(os.environ, STORAGE_PROFILE="production", DATABASE_URL=f"sqlite:///{tmp_path / 'finance.db'}",
+               JOBS_DB_PATH=str(tmp_path / "jobs.db"), EXPLANATION_CACHE_PATH=str(tmp_path / "explanations.db"),
+               LISTINGS_DB_PATH=str(tmp_path / "listings.db"))
+    env.pop("WRITE_QUEUE", None)
+    proc = subprocess.run([sys.executable, "-c", PRODUCTION_CLIENT], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert result["statuses"] == [302] * 9
+    assert result["rows"] == 9
+    assert result["total"] == sum(10 + i for i in range(9))
+